@@ -504,6 +504,15 @@ def test_all_team(db_handle):
     assert Tasks.query.filter_by(name="task2").first().team[0].id == 1
     #this works
 
+    #tests for unique violations, adding the same member to the same task twice
+    duplicate = _get_team()
+    duplicate.team_members = member2
+    duplicate.team_tasks = task2
+    db_handle.session.add(duplicate)
+    with pytest.raises(IntegrityError):
+        db_handle.session.commit()
+    #this works
+
 def test_all_hour_tests(db_handle):
     #test all hour tests
     project = _get_project()
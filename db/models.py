@@ -25,12 +25,12 @@ class Project(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(64), nullable=False, unique=True)
     start = db.Column(db.DateTime, default=datetime.datetime.today().date(), nullable=True)
-    end = db.Column(db.DateTime, db.CheckConstraint("start <= end"), nullable=True)
+    end = db.Column(db.DateTime, db.CheckConstraint('start <= "end"'), nullable=True)
     budget = db.Column(db.Float, db.CheckConstraint("budget >= 0"), nullable=True)
     avg_hourly_cost = db.Column(db.Float, db.CheckConstraint("avg_hourly_cost >= 0"), nullable=True)
     total_hours = db.Column(db.Float, db.CheckConstraint("total_hours >= 0"), nullable=True)
     total_costs = db.Column(db.Float, db.CheckConstraint("total_costs >= 0"), nullable=True)
-    project_manager_id = db.Column(db.Integer, db.ForeignKey("members.id", ondelete="SET NULL", onupdate="CASCADE"))
+    project_manager_id = db.Column(db.Integer, db.ForeignKey("members.id", ondelete="SET NULL", onupdate="CASCADE"), index=True)
     '''status = db.Column(db.String(16),
                        db.CheckConstraint("status == 'not started' OR status == 'started' OR status == 'finished'"),
                        default="not started", nullable=False)'''
@@ -43,6 +43,8 @@ class Project(db.Model):
 
 
 class Phase(db.Model):
+    __table_args__ = (db.Index("ix_phase_project_id_name", "project_id", "name"),)
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(64), default="hankesuunnittelu", nullable=False)
  
@@ -59,8 +61,8 @@ class Phase(db.Model):
 
 class Costs(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    project_id = db.Column(db.Integer, db.ForeignKey("project.id", ondelete="SET NULL", onupdate="CASCADE"))
-    phase_id = db.Column(db.Integer, db.ForeignKey("phase.id", ondelete="SET NULL", onupdate="CASCADE"))
+    project_id = db.Column(db.Integer, db.ForeignKey("project.id", ondelete="SET NULL", onupdate="CASCADE"), index=True)
+    phase_id = db.Column(db.Integer, db.ForeignKey("phase.id", ondelete="SET NULL", onupdate="CASCADE"), index=True)
     name = db.Column(db.String(64), nullable=False)
     description = db.Column(db.String(64), nullable=True)
     hourly_price = db.Column(db.Float, db.CheckConstraint("hourly_price >= 0"), nullable=True)
@@ -82,14 +84,16 @@ class Members(db.Model):
 
 
 class Tasks(db.Model):
+    __table_args__ = (db.Index("ix_tasks_project_id_phase_id", "project_id", "phase_id"),)
+
     id = db.Column(db.Integer, primary_key=True)
     project_id = db.Column(db.Integer, db.ForeignKey("project.id", ondelete="SET NULL", onupdate="CASCADE"))
-    phase_id = db.Column(db.Integer, db.ForeignKey("phase.id", ondelete="SET NULL", onupdate="CASCADE"))
+    phase_id = db.Column(db.Integer, db.ForeignKey("phase.id", ondelete="SET NULL", onupdate="CASCADE"), index=True)
     name = db.Column(db.String(64), nullable=False, unique=True)
     total_hours = db.Column(db.Float, db.CheckConstraint("total_hours >= 0"), nullable=True)
     total_cost = db.Column(db.Float, db.CheckConstraint("total_cost >= 0"), nullable=True)
     start = db.Column(db.DateTime, default=datetime.datetime.today().date(), nullable=True)
-    end = db.Column(db.DateTime, db.CheckConstraint("start <= end"), nullable=True)
+    end = db.Column(db.DateTime, db.CheckConstraint('start <= "end"'), nullable=True)
     '''status = db.Column(db.String(16),
                        db.CheckConstraint("status == 'not started' OR status == 'started' OR status == 'finished'"),
                        default="not started", nullable=False)'''
@@ -101,19 +105,21 @@ class Tasks(db.Model):
 
 
 class Teams(db.Model):
+    __table_args__ = (db.Index("ix_teams_task_id_member_id", "task_id", "member_id", unique=True),)
+
     id = db.Column(db.Integer, primary_key=True)
 
     task_id = db.Column(db.Integer, db.ForeignKey("tasks.id", ondelete="SET NULL", onupdate="CASCADE"))
-    member_id = db.Column(db.Integer, db.ForeignKey("members.id", ondelete="SET NULL", onupdate="CASCADE"))
+    member_id = db.Column(db.Integer, db.ForeignKey("members.id", ondelete="SET NULL", onupdate="CASCADE"), index=True)
 
     team_members = db.relationship("Members", back_populates="membership")
     team_tasks = db.relationship("Tasks", back_populates="team")
 
 class Hours(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    task_id = db.Column(db.Integer, db.ForeignKey("tasks.id", ondelete="SET NULL", onupdate="CASCADE"))
-    project_id = db.Column(db.Integer, db.ForeignKey("project.id", ondelete="SET NULL", onupdate="CASCADE"))
-    employee_id = db.Column(db.Integer, db.ForeignKey("members.id", ondelete="SET NULL", onupdate="CASCADE"))
+    task_id = db.Column(db.Integer, db.ForeignKey("tasks.id", ondelete="SET NULL", onupdate="CASCADE"), index=True)
+    project_id = db.Column(db.Integer, db.ForeignKey("project.id", ondelete="SET NULL", onupdate="CASCADE"), index=True)
+    employee_id = db.Column(db.Integer, db.ForeignKey("members.id", ondelete="SET NULL", onupdate="CASCADE"), index=True)
     date = db.Column(db.DateTime, default=datetime.datetime.today().date(), nullable=True)
     time = db.Column(db.Float, db.CheckConstraint("time >= 0") , nullable=True)
 
@@ -0,0 +1,160 @@
+"""
+Budget burn-down of a project at /api/projects/<project>/analytics/. The
+response has the daily series of logged hours, the cumulative cost and the
+remaining budget, and a forecast from the recent burn rate.
+
+The series come from one aggregated query, the hours and costs of the
+project summed per day on the (project_id, date) index of the hours
+together with the total of its other costs, so the work done does not
+grow with the number of hour entries. The cost of an hour entry is the
+cost stored with it when it was logged, the same cost that is in the
+totals of the project, and an entry without a cost counts as zero. The
+other costs have no date and count from the start.
+
+The cumulative sums and the lookups in them are vectorized with NumPy when
+it is installed, with the same results from plain Python otherwise.
+"""
+import bisect
+import datetime
+import functools
+import itertools
+import math
+
+from flask import Blueprint
+from flask_restful import Api, Resource
+from sqlalchemy import DateTime, cast, func, null, select, union_all
+
+from app import api, db, conditional, ProjectItem
+from models import *
+from utils import MasonBuilder, LINK_RELATIONS_URL, create_error_response, mason_response
+
+# the number of days before the last logged day that the burn rate is
+# averaged over
+BURN_RATE_DAYS = 30
+
+@functools.lru_cache(maxsize=None)
+def _numpy():
+    # imported on first use, it takes longer to import than the whole app
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+def _cumsum(values, initial=0):
+    """
+    Returns the cumulative sums of the values, starting from initial.
+    """
+    numpy = _numpy()
+    if numpy is not None:
+        return (numpy.cumsum(numpy.asarray(values, dtype=float)) + initial).tolist()
+    return list(itertools.accumulate(values, initial=initial))[1:]
+
+def _count_up_to(sorted_values, limit):
+    """
+    Returns the number of values that are <= limit in a sorted sequence.
+    """
+    numpy = _numpy()
+    if numpy is not None:
+        return int(numpy.searchsorted(numpy.asarray(sorted_values), limit, side="right"))
+    return bisect.bisect_right(sorted_values, limit)
+
+def daily_totals(project):
+    """
+    Returns the (date, hours, cost) rows of the project ordered by date and
+    the total of its other costs, read with one query.
+    """
+    hours = select([
+        Hours.date.label("date"),
+        func.sum(Hours.time).label("hours"),
+        func.sum(Hours.cost).label("cost"),
+        ]).where(Hours.project_id == project.id).group_by(Hours.date)
+    costs = select([
+        cast(null(), DateTime).label("date"),
+        func.sum(0).label("hours"),
+        func.sum(Costs.hourly_price * Costs.quantity).label("cost"),
+        ]).where(Costs.project_id == project.id)
+
+    rows, fixed_costs = [], 0
+    for date, hours, cost in db.session.execute(union_all(hours, costs)):
+        if date is None:
+            fixed_costs = cost or 0
+        else:
+            rows.append((date, hours or 0, cost or 0))
+    rows.sort()
+    return rows, fixed_costs
+
+def burn_down(rows, fixed_costs, budget=None, end=None):
+    """
+    Computes the series and the forecast of a burn-down from the daily
+    totals. The forecast continues the average daily cost of the last
+    BURN_RATE_DAYS days until the end of the project.
+    """
+    dates = [date.date() for date, hours, cost in rows]
+    cumulative_hours = _cumsum([hours for date, hours, cost in rows])
+    cumulative_costs = _cumsum([cost for date, hours, cost in rows], fixed_costs)
+    total_costs = cumulative_costs[-1] if rows else fixed_costs
+
+    burn_rate = 0
+    if rows:
+        days = [date.toordinal() for date in dates]
+        window_start = _count_up_to(days, days[-1] - BURN_RATE_DAYS)
+        before = cumulative_costs[window_start - 1] if window_start else fixed_costs
+        burn_rate = (total_costs - before) / BURN_RATE_DAYS
+
+    as_of = dates[-1] if rows else None
+    projected_costs = None
+    if end is not None and as_of is not None:
+        projected_costs = total_costs + burn_rate * max((end.date() - as_of).days, 0)
+
+    exhausted_on = None
+    if budget is not None:
+        over = _count_up_to(cumulative_costs, budget)
+        if over < len(cumulative_costs):
+            exhausted_on = dates[over]
+        elif burn_rate > 0:
+            exhausted_on = as_of + datetime.timedelta(days=math.ceil((budget - total_costs) / burn_rate))
+
+    return {
+        "as_of": as_of,
+        "total_hours": cumulative_hours[-1] if rows else 0,
+        "total_costs": total_costs,
+        "fixed_costs": fixed_costs,
+        "burn_rate": burn_rate,
+        "projected_costs": projected_costs,
+        "projected_overrun": None if budget is None or projected_costs is None else projected_costs - budget,
+        "budget_exhausted_on": exhausted_on,
+        "series": {
+            "dates": dates,
+            "hours": cumulative_hours,
+            "costs": cumulative_costs,
+            "remaining_budget": None if budget is None else [budget - cost for cost in cumulative_costs],
+            },
+        }
+
+
+class ProjectAnalytics(Resource):
+    """
+    class for the budget burn-down of a project
+    """
+    @conditional(Project, Hours, Costs, cached=True)
+    def get(self, project):
+        """
+        get the burn-down and the forecast of the project's budget
+        """
+        db_project = Project.query.filter_by(name=project).first()
+        if db_project is None:
+            return create_error_response(404, "Not found", f"Project with name {project} not found.")
+
+        rows, fixed_costs = daily_totals(db_project)
+        body = MasonBuilder(name=db_project.name, budget=db_project.budget)
+        body.update(burn_down(rows, fixed_costs, db_project.budget, db_project.end))
+        body.add_namespace("promana", LINK_RELATIONS_URL)
+        body.add_control("self", analytics_api.url_for(ProjectAnalytics, project=project))
+        body.add_control("up", api.url_for(ProjectItem, project=project))
+        return mason_response(body)
+
+
+analytics_blueprint = Blueprint("analytics", __name__)
+analytics_api = Api(analytics_blueprint)
+analytics_api.add_resource(ProjectAnalytics, "/api/projects/<project>/analytics/")
@@ -0,0 +1,49 @@
+import datetime
+import pytest
+
+import analytics
+from analytics import burn_down
+
+# ten days of eight hours that cost 400 a day
+ROWS = [(datetime.datetime(2021, 1, day), 8.0, 400.0) for day in range(1, 11)]
+
+# test the series and the forecast with and without NumPy
+@pytest.mark.parametrize("use_numpy", [True, False])
+def test_burn_down(monkeypatch, use_numpy):
+    if use_numpy:
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(analytics, "_numpy", lambda: None)
+    result = burn_down(ROWS, 500.0, budget=3000.0, end=datetime.datetime(2021, 1, 31))
+    assert result["series"]["dates"][0] == datetime.date(2021, 1, 1)
+    assert result["series"]["hours"] == [8.0 * day for day in range(1, 11)]
+    assert result["series"]["costs"] == [500.0 + 400.0 * day for day in range(1, 11)]
+    assert result["series"]["remaining_budget"][-1] == -1500.0
+    assert result["as_of"] == datetime.date(2021, 1, 10)
+    assert result["total_hours"] == 80.0
+    assert result["total_costs"] == 4500.0
+    # all of the ten days are within the burn rate window
+    assert result["burn_rate"] == pytest.approx(4000.0 / 30)
+    assert result["projected_costs"] == pytest.approx(4500.0 + 4000.0 / 30 * 21)
+    assert result["projected_overrun"] == pytest.approx(1500.0 + 4000.0 / 30 * 21)
+    assert result["budget_exhausted_on"] == datetime.date(2021, 1, 7)
+
+# test that the exhaustion date is forecast when the budget is not used up
+def test_burn_down_forecast(monkeypatch):
+    monkeypatch.setattr(analytics, "_numpy", lambda: None)
+    rows = [(datetime.datetime(2021, 1, 1), 1.0, 300.0), (datetime.datetime(2021, 3, 1), 1.0, 300.0)]
+    result = burn_down(rows, 0.0, budget=1000.0)
+    # only the last day is within 30 days of the last day
+    assert result["burn_rate"] == 10.0
+    assert result["budget_exhausted_on"] == datetime.date(2021, 3, 1) + datetime.timedelta(days=40)
+    assert result["projected_costs"] is None
+    assert result["projected_overrun"] is None
+
+# test a project without hours
+def test_burn_down_empty():
+    result = burn_down([], 250.0)
+    assert result["total_costs"] == 250.0
+    assert result["burn_rate"] == 0
+    assert result["as_of"] is None
+    assert result["budget_exhausted_on"] is None
+    assert result["series"] == {"dates": [], "hours": [], "costs": [], "remaining_budget": None}
@@ -1,28 +1,235 @@
-from flask import Flask, Response, request
-from flask_sqlalchemy import SQLAlchemy
+from flask import Blueprint, Flask, Response, current_app, request
 from sqlalchemy.exc import IntegrityError
 from flask_restful import Resource
 from flask_restful import Api
-from utils import MasonBuilder, LINK_RELATIONS_URL, MASON, create_error_response
+from utils import (MasonBuilder, ControlTemplate, LINK_RELATIONS_URL, MASON, SchemaValidator,
+                   ValidationError, create_error_response, dump_json, mason_response)
+from cache import ResponseCache
+from compression import compress_response
+from unit_of_work import end_transaction
 from sqlalchemy.exc import IntegrityError, OperationalError
-from jsonschema import validate, ValidationError
+from sqlalchemy.orm import contains_eager, joinedload
 import datetime
 import enum
-import json
-
-app = Flask(__name__, static_folder="static")
-app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///test.db"
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-api = Api(app)
-db = SQLAlchemy(app)
+import functools
+import hashlib
+import os
 
 from models import *
 
-@event.listens_for(Engine, "connect")
-def set_sqlite_pragma(dbapi_connection, connection_record):
-    cursor = dbapi_connection.cursor()
-    cursor.execute("PRAGMA foreign_keys=ON")
-    cursor.close()
+DEFAULT_CONFIG = {
+    "SQLALCHEMY_DATABASE_URI": "sqlite:///test.db",
+    "SQLALCHEMY_TRACK_MODIFICATIONS": False,
+    "SQLITE_PROFILE": "tuned",
+    "DB_POOL_SIZE": 5,
+    "DB_MAX_OVERFLOW": 10,
+    "DB_POOL_TIMEOUT": 30,
+    "DB_POOL_RECYCLE": 1800,
+    "RESPONSE_CACHE_SIZE": 256,
+    "RESPONSE_CACHE_TTL": 300,
+    "BULK_BATCH_SIZE": 500,
+    "HOURS_MAX_ENTRIES": 10000,
+    "SCHEMA_MAX_AGE": 86400,
+    "COMPRESS_MIN_SIZE": 1024,
+    "COMPRESS_LEVEL": 6,
+    "COMPRESS_BROTLI_QUALITY": 5,
+    }
+
+api_blueprint = Blueprint("api", __name__)
+api = Api(api_blueprint)
+response_cache = ResponseCache()
+
+def create_app(config=None):
+    """
+    Creates the application. The defaults are overridden by the DATABASE_URL
+    environment variable and then by the config mapping.
+    """
+    app = Flask(__name__, static_folder="static")
+    app.config.from_mapping(DEFAULT_CONFIG)
+    if "DATABASE_URL" in os.environ:
+        app.config["SQLALCHEMY_DATABASE_URI"] = os.environ["DATABASE_URL"]
+    app.config.from_mapping(config or {})
+    db.init_app(app)
+    response_cache.max_entries = app.config["RESPONSE_CACHE_SIZE"]
+    response_cache.ttl = app.config["RESPONSE_CACHE_TTL"]
+    app.register_blueprint(api_blueprint)
+    app.after_request(compress_response)
+    # after_request functions run in reverse order, so the transaction is
+    # ended before the response is compressed
+    app.after_request(end_transaction)
+
+    # imported here because they build on the resources of this module
+    from analytics import analytics_blueprint
+    from bulk import bulk_blueprint
+    from export import export_blueprint
+    from hours import hours_blueprint
+    from portfolio import portfolio_blueprint
+    from timeline import timeline_blueprint
+    app.register_blueprint(analytics_blueprint)
+    app.register_blueprint(bulk_blueprint)
+    app.register_blueprint(export_blueprint)
+    app.register_blueprint(hours_blueprint)
+    app.register_blueprint(portfolio_blueprint)
+    app.register_blueprint(timeline_blueprint)
+    return app
+
+@event.listens_for(db.session, "after_commit")
+def invalidate_response_cache(session):
+    changed = session.info.pop("changed_tables", None)
+    if changed:
+        response_cache.invalidate(changed)
+
+DEFAULT_PAGE_LIMIT = 50
+MAX_PAGE_LIMIT = 1000
+MAX_MEMBER_BATCH = 1000
+
+def parse_limit_arg():
+    """
+    Reads the page size from the limit query parameter. Raises ValueError
+    if it is not an integer between 1 and MAX_PAGE_LIMIT.
+    """
+    limit = request.args.get("limit", DEFAULT_PAGE_LIMIT)
+    try:
+        limit = int(limit)
+    except ValueError:
+        raise ValueError(f"limit must be an integer, got '{limit}'")
+    if not 1 <= limit <= MAX_PAGE_LIMIT:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_LIMIT}")
+    return limit
+
+def parse_date_arg(name):
+    """
+    Reads a YYYY-MM-DD date from the query parameter with the given name.
+    Returns None if the parameter is missing and raises ValueError if it
+    is not a valid date.
+    """
+    value = request.args.get(name)
+    if value is None:
+        return None
+    try:
+        return datetime.datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise ValueError(f"{name} must be a date in format YYYY-MM-DD, got '{value}'")
+
+def parse_status_args():
+    """
+    Reads the status query parameters (which can be repeated) and converts
+    them to status_type members. Raises ValueError for unknown statuses.
+    """
+    statuses = []
+    for value in request.args.getlist("status"):
+        try:
+            statuses.append(status_type[value])
+        except KeyError:
+            raise ValueError(f"unknown status '{value}'")
+    return statuses
+
+def parse_fields_arg(fields):
+    """
+    Reads the comma separated field names of the fields query parameter.
+    Returns None if the parameter is missing and raises ValueError for
+    names that are not in fields.
+    """
+    value = request.args.get("fields")
+    if value is None:
+        return None
+    names = [name for name in value.split(",") if name]
+    for name in names:
+        if name not in fields:
+            raise ValueError(f"unknown field '{name}', fields are {', '.join(fields)}")
+    return names
+
+def parse_controls_arg():
+    """
+    Reads the controls query parameter, "all" (the default) or "none".
+    Returns False if the hypermedia controls of the items should be left
+    out.
+    """
+    value = request.args.get("controls", "all")
+    if value not in ("all", "none"):
+        raise ValueError(f"controls must be 'all' or 'none', got '{value}'")
+    return value == "all"
+
+def conditional(*models, cached=False):
+    """
+    Decorator for GET methods that answers 304 Not Modified when the client
+    already has the current representation. The strong ETag is derived from
+    the URL and the version counters of the given models' tables, so every
+    model the method reads must be listed. With cached=True the rendered
+    body is also kept in response_cache under the URL and the versions, so
+    repeated requests skip the handler even without If-None-Match.
+    If-None-Match is compared weakly, so that the weak ETags of compressed
+    responses match as well.
+    """
+    tables = [model.__table__.name for model in models]
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            versions = get_table_versions(*models)
+            etag = hashlib.sha1(f"{request.full_path}{versions}".encode()).hexdigest()
+            key = (request.full_path, versions)
+            body = None
+            if request.if_none_match.contains_weak(etag):
+                resp = Response(status=304)
+            else:
+                if cached:
+                    body = response_cache.get(key)
+                if body is not None:
+                    resp = Response(body, 200, mimetype=MASON)
+                else:
+                    resp = func(*args, **kwargs)
+                    if resp.status_code != 200:
+                        return resp
+                    if cached:
+                        response_cache.set(key, resp.get_data(), tables)
+            resp.set_etag(etag)
+            resp.headers["Cache-Control"] = "no-cache"
+            return resp
+        return wrapper
+    return decorator
+
+def apply_keyset(query, sort_column, key_column, cursor=None, descending=False):
+    """
+    Orders the query by sort_column with the unique key_column as a tie
+    breaker and, if a cursor is given, keeps only the rows that come after
+    it. The cursor is a (sort value, key value) tuple taken from the last
+    row of the previous page. NULL sort values come first in ascending and
+    last in descending order so that both directions page consistently.
+    """
+    if sort_column is key_column:
+        if descending:
+            query = query.order_by(key_column.desc())
+        else:
+            query = query.order_by(key_column.asc())
+        if cursor is not None:
+            if descending:
+                query = query.filter(key_column < cursor[1])
+            else:
+                query = query.filter(key_column > cursor[1])
+        return query
+
+    if descending:
+        query = query.order_by(sort_column.desc().nullslast(), key_column.desc())
+    else:
+        query = query.order_by(sort_column.asc().nullsfirst(), key_column.asc())
+    if cursor is None:
+        return query
+
+    value, key = cursor
+    if descending and value is None:
+        query = query.filter(db.and_(sort_column.is_(None), key_column < key))
+    elif descending:
+        query = query.filter(db.or_(sort_column < value,
+                                    db.and_(sort_column == value, key_column < key),
+                                    sort_column.is_(None)))
+    elif value is None:
+        query = query.filter(db.or_(db.and_(sort_column.is_(None), key_column > key),
+                                    sort_column.isnot(None)))
+    else:
+        query = query.filter(db.or_(sort_column > value,
+                                    db.and_(sort_column == value, key_column > key)))
+    return query
 
 class ProjectBuilder(MasonBuilder):
     """
@@ -64,36 +271,86 @@ class ProjectBuilder(MasonBuilder):
             "type": "string",
             "enum": ["NOT_STARTED", "STARTED", "FINISHED"]
             }
+        props["budget"] = {
+            "description": "Budget of the project",
+            "type": "number",
+            "minimum": 0
+            }
+        props["avg_hourly_cost"] = {
+            "description": "Hourly cost of the hours whose member has no hourly cost",
+            "type": "number",
+            "minimum": 0
+            }
         return schema
 
+    @staticmethod
+    def project_fields(project):
+        """
+        Returns the fields of a project as they are shown in listings. The
+        project manager must be loaded with the project.
+        """
+        try:
+            start=project.start.strftime("%Y-%m-%d")
+        except AttributeError:
+            start = None
+        try:
+            end=project.end.strftime("%Y-%m-%d")
+        except AttributeError:
+            end = None
+        if project.project_manager is None:
+            manager=None
+        else:
+            manager=project.project_manager.name
+        return dict(
+            name=project.name,
+            start=start,
+            end=end,
+            project_manager=manager,
+            status=str(project.status.value)
+            )
+
     def add_control_add_project(self):
-        self.add_control("promana:add-project",
-                         "/api/projects/",
-                         method="POST",
-                         encoding="json",
-                         title="Add new project",
-                         schema=self.project_schema())
+        self.add_control_template(PROJECT_CONTROLS["add"])
+
+    def add_control_project(self, project):
+        self.add_control_template(PROJECT_CONTROLS["self"], project=project)
 
     def add_control_edit_project(self, project):
-        self.add_control("edit",
-                         f"/api/projects/{project}/",
-                         method="PUT",
-                         encoding="json",
-                         title="Edit project",
-                         schema=self.project_schema())
+        self.add_control_template(PROJECT_CONTROLS["edit"], project=project)
 
     def add_control_project_members(self, project):
-        self.add_control("promana:project-members",
-                         f"/api/projects/{project}/members/")
+        self.add_control_template(PROJECT_CONTROLS["members"], project=project)
 
     def add_control_project_phase(self, project):
-        self.add_control("promana:project-phase",
-                         f"/api/projects/{project}/phase/")
+        self.add_control_template(PROJECT_CONTROLS["phase"], project=project)
     
     def add_control_delete_project(self, project):
-        self.add_control("promana:delete",
-                         f"/api/projects/{project}/",
-                         method="DELETE")
+        self.add_control_template(PROJECT_CONTROLS["delete"], project=project)
+
+# controls that are the same for every project apart from the href
+PROJECT_CONTROLS = {
+    "add": ControlTemplate("promana:add-project",
+                           "/api/projects/",
+                           method="POST",
+                           encoding="json",
+                           title="Add new project",
+                           schemaUrl="/api/schemas/project/"),
+    "self": ControlTemplate("self",
+                            "/api/projects/{project}/"),
+    "edit": ControlTemplate("edit",
+                            "/api/projects/{project}/",
+                            method="PUT",
+                            encoding="json",
+                            title="Edit project",
+                            schemaUrl="/api/schemas/project/"),
+    "members": ControlTemplate("promana:project-members",
+                               "/api/projects/{project}/members/"),
+    "phase": ControlTemplate("promana:project-phase",
+                             "/api/projects/{project}/phase/"),
+    "delete": ControlTemplate("promana:delete",
+                              "/api/projects/{project}/",
+                              method="DELETE"),
+    }
 
 class MemberBuilder(MasonBuilder):
     """
@@ -110,62 +367,106 @@ class MemberBuilder(MasonBuilder):
             "description": "Name of the member",
             "type": "string"
             }
+        props["hourly_cost"] = {
+            "description": "Cost of one hour of the member's work",
+            "type": "number",
+            "minimum": 0
+            }
         return schema
 
+    @staticmethod
+    def member_list_schema():
+        return {
+            "type": "array",
+            "minItems": 1,
+            "maxItems": MAX_MEMBER_BATCH,
+            "items": MemberBuilder.member_schema()
+            }
 
     def add_control_add_member(self, project=None, phase=None, task=None):
         if project is None:
-            self.add_control("promana:add-member",
-                             "/api/members/",
-                             method="POST",
-                             encoding="json",
-                             title="Add new member",
-                             schema=self.member_schema())
+            self.add_control_template(MEMBER_CONTROLS["add"])
         elif task is None:
-            self.add_control("promana:add-member",
-                             f"/api/projects/{project}/members/",
-                             method="POST",
-                             encoding="json",
-                             title="Add new member to project",
-                             schema=self.member_schema())
+            self.add_control_template(MEMBER_CONTROLS["add-to-project"], project=project)
         else:
-            self.add_control("promana:add-member",
-                             f"/api/projects/{project}/phases/{phase}/tasks/{task}/members/",
-                             method="POST",
-                             encoding="json",
-                             title="Add new member to task",
-                             schema=self.member_schema())
+            self.add_control_template(MEMBER_CONTROLS["add-to-task"],
+                                      project=project, phase=phase, task=task)
+
+    def add_control_member(self, member, project=None, phase=None, task=None):
+        if project is None:
+            self.add_control_template(MEMBER_CONTROLS["self"], member=member)
+        elif task is None:
+            self.add_control_template(MEMBER_CONTROLS["self-in-project"],
+                                      project=project, member=member)
+        else:
+            self.add_control_template(MEMBER_CONTROLS["self-in-task"],
+                                      project=project, phase=phase, task=task, member=member)
     
     def add_control_edit_member(self, member):
-        self.add_control("edit",
-                         f"/api/members/{member}/",
-                         method="PUT",
-                         encoding="json",
-                         title="Edit member",
-                         schema=self.member_schema())
+        self.add_control_template(MEMBER_CONTROLS["edit"], member=member)
     
     def add_control_up_project(self, project):
-        self.add_control("up",
-                         f"/api/projects/{project}/members/")
+        self.add_control_template(MEMBER_CONTROLS["up-project"], project=project)
     
     def add_control_up_task(self, project, phase, task):
-        self.add_control("up",
-                         f"/api/projects/{project}/phases/{phase}/tasks/{task}/members/")
+        self.add_control_template(MEMBER_CONTROLS["up-task"], project=project, phase=phase, task=task)
     
     def add_control_delete_member(self, member, project=None, phase=None, task=None):
         if project is None:
-            self.add_control("promana:delete",
-                             api.url_for(MemberItem, member=member),
-                             #f"/api/members/{member}/",
-                             method="DELETE")
+            self.add_control_template(MEMBER_CONTROLS["delete"], member=member)
         elif task is None:
-            self.add_control("promana:delete",
-                             f"/api/projects/{project}/members/{member}/",
-                             method="DELETE")
+            self.add_control_template(MEMBER_CONTROLS["delete-from-project"],
+                                      project=project, member=member)
         else:
-            self.add_control("promana:delete",
-                             f"/api/projects/{project}/phases/{phase}/tasks/{task}/members/{member}/",
-                             method="DELETE")
+            self.add_control_template(MEMBER_CONTROLS["delete-from-task"],
+                                      project=project, phase=phase, task=task, member=member)
+
+# controls that are the same for every member apart from the href
+MEMBER_CONTROLS = {
+    "add": ControlTemplate("promana:add-member",
+                           "/api/members/",
+                           method="POST",
+                           encoding="json",
+                           title="Add new member",
+                           schemaUrl="/api/schemas/member/"),
+    "add-to-project": ControlTemplate("promana:add-member",
+                                      "/api/projects/{project}/members/",
+                                      method="POST",
+                                      encoding="json",
+                                      title="Add new member to project",
+                                      schemaUrl="/api/schemas/member/"),
+    "add-to-task": ControlTemplate("promana:add-member",
+                                   "/api/projects/{project}/phases/{phase}/tasks/{task}/members/",
+                                   method="POST",
+                                   encoding="json",
+                                   title="Add new member to task",
+                                   schemaUrl="/api/schemas/member/"),
+    "self": ControlTemplate("self",
+                            "/api/members/{member}/"),
+    "self-in-project": ControlTemplate("self",
+                                       "/api/projects/{project}/members/{member}/"),
+    "self-in-task": ControlTemplate("self",
+                                    "/api/projects/{project}/phases/{phase}/tasks/{task}/members/{member}/"),
+    "edit": ControlTemplate("edit",
+                            "/api/members/{member}/",
+                            method="PUT",
+                            encoding="json",
+                            title="Edit member",
+                            schemaUrl="/api/schemas/member/"),
+    "up-project": ControlTemplate("up",
+                                  "/api/projects/{project}/members/"),
+    "up-task": ControlTemplate("up",
+                               "/api/projects/{project}/phases/{phase}/tasks/{task}/members/"),
+    "delete": ControlTemplate("promana:delete",
+                              "/api/members/{member}/",
+                              method="DELETE"),
+    "delete-from-project": ControlTemplate("promana:delete",
+                                           "/api/projects/{project}/members/{member}/",
+                                           method="DELETE"),
+    "delete-from-task": ControlTemplate("promana:delete",
+                                        "/api/projects/{project}/phases/{phase}/tasks/{task}/members/{member}/",
+                                        method="DELETE"),
+    }
 
 class PhaseBuilder(MasonBuilder):
     @staticmethod
@@ -191,45 +492,76 @@ class PhaseBuilder(MasonBuilder):
         }
         return schema
 
+    @staticmethod
+    def phase_fields(phase):
+        """
+        Returns the fields of a phase as they are shown in listings.
+        """
+        try:
+            deadline=phase.deadline.strftime("%Y-%m-%d")
+        except AttributeError:
+            deadline = None
+        if phase.status is None:
+            status = None
+        else:
+            status = str(phase.status.value)
+        return dict(
+            name = phase.name,
+            deadline = deadline,
+            status = status
+            )
+
     def add_control_add_phase(self, project):
-        self.add_control("promana:add-phase",
-                                f"/api/projects/{project}/phases/",
-                                method="POST",
-                                encoding="json",
-                                title="Add new phase to a project",
-                                schema=self.phase_schema())
+        self.add_control_template(PHASE_CONTROLS["add"], project=project)
+
+    def add_control_phase(self, project, phase):
+        self.add_control_template(PHASE_CONTROLS["self"], project=project, phase=phase)
 
     def add_control_up_project(self, project):
-        self.add_control("up",
-                            f"/api/projects/{project}/"
-                            )
+        self.add_control_template(PHASE_CONTROLS["up"], project=project)
 
     def add_control_phase_tasks(self, project, phase="WHOLE_PROJECT"):
-        self.add_control("phase-tasks",
-                        f"/api/projects/{project}/phases/{phase}/tasks/",
-                        title="Show all tasks in a selected project phase",
-                        encoding="json"
-                        )
+        self.add_control_template(PHASE_CONTROLS["tasks"], project=project, phase=phase)
 
     def add_control_phase_task(self, project, task, phase="WHOLE_PROJECT"):
-        self.add_control("phase-tasks",
-                        f"/api/projects/{project}/phases/{phase}/tasks/{task}/",
-                        title="Show a selected task in a project phase",
-                        encoding="json"
-                        )
+        self.add_control_template(PHASE_CONTROLS["task"], project=project, phase=phase, task=task)
+
     def add_control_edit_phase(self, project, phase):
-        self.add_control("edit",
-                                f"/api/projects/{project}/phases/{phase}/",
-                                method="PUT",
-                                encoding="json",
-                                title="Edit project phase",
-                                schema=self.phase_schema()
-                            )
+        self.add_control_template(PHASE_CONTROLS["edit"], project=project, phase=phase)
 
     def add_control_delete_phase(self, project, phase="WHOLE_PROJECT"):
-        self.add_control("promana:delete",
-                            f"/api/projects/{project}/phases/{phase}/",
-                            method="DELETE")
+        self.add_control_template(PHASE_CONTROLS["delete"], project=project, phase=phase)
+
+# controls that are the same for every phase apart from the href
+PHASE_CONTROLS = {
+    "add": ControlTemplate("promana:add-phase",
+                           "/api/projects/{project}/phases/",
+                           method="POST",
+                           encoding="json",
+                           title="Add new phase to a project",
+                           schemaUrl="/api/schemas/phase/"),
+    "self": ControlTemplate("self",
+                            "/api/projects/{project}/phases/{phase}/"),
+    "up": ControlTemplate("up",
+                          "/api/projects/{project}/"),
+    "tasks": ControlTemplate("phase-tasks",
+                             "/api/projects/{project}/phases/{phase}/tasks/",
+                             title="Show all tasks in a selected project phase",
+                             encoding="json"),
+    "task": ControlTemplate("phase-tasks",
+                            "/api/projects/{project}/phases/{phase}/tasks/{task}/",
+                            title="Show a selected task in a project phase",
+                            encoding="json"),
+    "edit": ControlTemplate("edit",
+                            "/api/projects/{project}/phases/{phase}/",
+                            method="PUT",
+                            encoding="json",
+                            title="Edit project phase",
+                            schemaUrl="/api/schemas/phase/"),
+    "delete": ControlTemplate("promana:delete",
+                              "/api/projects/{project}/phases/{phase}/",
+                              method="DELETE"),
+    }
 
 class TaskBuilder(MasonBuilder):
     @staticmethod
@@ -261,93 +593,220 @@ class TaskBuilder(MasonBuilder):
         return schema
 
 
+    @staticmethod
+    def task_fields(task):
+        """
+        Returns the fields of a task as they are shown in listings. The
+        phase must be loaded with the task.
+        """
+        if task.phase is None:
+            task_phase = task.phase
+        else:
+            task_phase = task.phase.name
+
+        if task.start is None:
+            task_start = task.start
+        else:
+            task_start = task.start.strftime("%Y-%m-%d")
+
+        if task.end is None:
+            task_end = task.end
+        else:
+            task_end = task.end.strftime("%Y-%m-%d")
+
+        return dict(
+            task_name = task.name,
+            task_phase=task_phase,
+            task_start=task_start,
+            task_end=task_end,
+            task_status = str(task.status)
+            )
+
     def add_control_add_task(self, project, phase="WHOLE_PROJECT"):
-        self.add_control("promana:add-task",
-                             f"/api/projects/{project}/phases/{phase}/tasks/",
-                             method="POST",
-                             encoding="json",
-                             title="Add new task to a project phase",
-                             schema=self.task_schema())
+        self.add_control_template(TASK_CONTROLS["add"], project=project, phase=phase)
+
+    def add_control_task(self, project, phase, task):
+        self.add_control_template(TASK_CONTROLS["self"], project=project, phase=phase, task=task)
     
     def add_control_edit_task(self, project, task, phase="WHOLE_PROJECT"):
-        self.add_control("edit",
-                             f"/api/projects/{project}/phases/{phase}/tasks/{task}/",
-                             method="PUT",
-                             encoding="json",
-                             title="Edit project task",
-                             schema=self.task_schema())
+        self.add_control_template(TASK_CONTROLS["edit"], project=project, phase=phase, task=task)
     
     def add_control_task_members(self, project, phase, task):
-        self.add_control("task-members",
-                         f"/api/projects/{project}/phases/{phase}/tasks/{task}/members")
+        self.add_control_template(TASK_CONTROLS["members"], project=project, phase=phase, task=task)
     
     def add_control_task_phase(self, project, phase):
-        self.add_control("task-phase",
-                         f"/api/projects/{project}/phases/{phase}/")
+        self.add_control_template(TASK_CONTROLS["phase"], project=project, phase=phase)
     
     def add_control_delete_task(self, project, task, phase="WHOLE_PROJECT"):
-        self.add_control("promana:delete",
-                         f"/api/projects/{project}/phases/{phase}/tasks/{task}/",
-                         method="DELETE")
+        self.add_control_template(TASK_CONTROLS["delete"], project=project, phase=phase, task=task)
+
+# controls that are the same for every task apart from the href
+TASK_CONTROLS = {
+    "add": ControlTemplate("promana:add-task",
+                           "/api/projects/{project}/phases/{phase}/tasks/",
+                           method="POST",
+                           encoding="json",
+                           title="Add new task to a project phase",
+                           schemaUrl="/api/schemas/task/"),
+    "self": ControlTemplate("self",
+                            "/api/projects/{project}/phases/{phase}/tasks/{task}/"),
+    "edit": ControlTemplate("edit",
+                            "/api/projects/{project}/phases/{phase}/tasks/{task}/",
+                            method="PUT",
+                            encoding="json",
+                            title="Edit project task",
+                            schemaUrl="/api/schemas/task/"),
+    "members": ControlTemplate("task-members",
+                               "/api/projects/{project}/phases/{phase}/tasks/{task}/members"),
+    "phase": ControlTemplate("task-phase",
+                             "/api/projects/{project}/phases/{phase}/"),
+    "delete": ControlTemplate("promana:delete",
+                              "/api/projects/{project}/phases/{phase}/tasks/{task}/",
+                              method="DELETE"),
+    }
+
+# the request body schemas that controls refer to with schemaUrl
+SCHEMAS = {
+    "project": ProjectBuilder.project_schema,
+    "member": MemberBuilder.member_schema,
+    "member-list": MemberBuilder.member_list_schema,
+    "phase": PhaseBuilder.phase_schema,
+    "task": TaskBuilder.task_schema,
+    }
+
+# request body validators, compiled on first use
+PROJECT_VALIDATOR = SchemaValidator(ProjectBuilder.project_schema)
+PROJECT_PUT_VALIDATOR = SchemaValidator(functools.partial(ProjectBuilder.project_schema, "put"))
+MEMBER_VALIDATOR = SchemaValidator(MemberBuilder.member_schema)
+MEMBER_LIST_VALIDATOR = SchemaValidator(MemberBuilder.member_list_schema)
+PHASE_VALIDATOR = SchemaValidator(PhaseBuilder.phase_schema)
+TASK_VALIDATOR = SchemaValidator(TaskBuilder.task_schema)
 
 class ProjectCollection(Resource):
     """
     class for project collection
     """
+
+    # the columns of the fields that the fields query parameter can select
+    FIELDS = {
+        "name": Project.name,
+        "start": Project.start,
+        "end": Project.end,
+        "project_manager": Members.name,
+        "status": Project.status,
+        }
+
+    @conditional(Project, Members, cached=True)
     def get(self):
         """
-        this method gets all the project in the database
+        this method gets one page of projects from the database. Projects
+        are ordered by name and paged with the limit, after and before query
+        parameters. They can be filtered with status, start_from, start_to,
+        end_from, end_to and project_manager. fields selects the fields of
+        the items (the name is always included) and controls=none leaves
+        out the hypermedia controls apart from the page links.
         """
-        # get all projects
-        db_projects = Project.query.all()
+        try:
+            limit = parse_limit_arg()
+            statuses = parse_status_args()
+            start_from = parse_date_arg("start_from")
+            start_to = parse_date_arg("start_to")
+            end_from = parse_date_arg("end_from")
+            end_to = parse_date_arg("end_to")
+            fields = parse_fields_arg(self.FIELDS)
+            controls = parse_controls_arg()
+        except ValueError as e:
+            return create_error_response(400, "Invalid query parameter", str(e))
+        after = request.args.get("after")
+        before = request.args.get("before")
+        manager = request.args.get("project_manager")
+
+        if fields is not None:
+            # only the selected columns are read, the manager table is
+            # joined only when it is needed
+            fields = ["name"] + [field for field in fields if field != "name"]
+            query = db.session.query(*[self.FIELDS[field].label(field) for field in fields])
+            query = query.select_from(Project)
+            if manager is not None:
+                query = query.join(Project.project_manager).filter(Members.name == manager)
+            elif "project_manager" in fields:
+                query = query.outerjoin(Project.project_manager)
+        # managers are loaded in the same query to avoid one lazy load per row
+        elif manager is not None:
+            query = Project.query.join(Project.project_manager).filter(Members.name == manager)
+            query = query.options(contains_eager(Project.project_manager))
+        else:
+            query = Project.query.options(joinedload(Project.project_manager))
+        if statuses:
+            query = query.filter(Project.status.in_(statuses))
+        if start_from is not None:
+            query = query.filter(Project.start >= start_from)
+        if start_to is not None:
+            query = query.filter(Project.start <= start_to)
+        if end_from is not None:
+            query = query.filter(Project.end >= end_from)
+        if end_to is not None:
+            query = query.filter(Project.end <= end_to)
+
+        # keyset pagination on the unique project name, one extra row tells
+        # whether there is another page in the direction we are going
+        if before is not None:
+            query = query.filter(Project.name < before).order_by(Project.name.desc())
+        else:
+            if after is not None:
+                query = query.filter(Project.name > after)
+            query = query.order_by(Project.name)
+        db_projects = query.limit(limit + 1).all()
+        has_more = len(db_projects) > limit
+        db_projects = db_projects[:limit]
+        if before is not None:
+            db_projects.reverse()
+            has_next, has_prev = True, has_more
+        else:
+            has_next, has_prev = has_more, after is not None
 
-        if db_projects is None:
-            return Response(status=501)
+        query_args = {key: values for key, values in request.args.lists()
+                      if key not in ("after", "before")}
+        query_args["limit"] = limit
 
         body = ProjectBuilder()
-        body.add_namespace("promana", LINK_RELATIONS_URL)
-        body.add_control("self", api.url_for(ProjectCollection))
-        body.add_control_add_project()
+        if controls:
+            body.add_namespace("promana", LINK_RELATIONS_URL)
+            body.add_control("self", api.url_for(ProjectCollection))
+            body.add_control_add_project()
+        if has_next and db_projects:
+            body.add_control("next", api.url_for(ProjectCollection,
+                                                 after=db_projects[-1].name,
+                                                 **query_args))
+        if has_prev and db_projects:
+            body.add_control("prev", api.url_for(ProjectCollection,
+                                                 before=db_projects[0].name,
+                                                 **query_args))
         body["items"] = []
 
         for project in db_projects:
-            try:
-                start=project.start.strftime("%Y-%m-%d")
-            except AttributeError:
-                start = None
-            try:
-                end=project.end.strftime("%Y-%m-%d")
-            except AttributeError:
-                end = None
-            if project.project_manager is None:
-                manager=None
+            if fields is None:
+                item = ProjectBuilder(**ProjectBuilder.project_fields(project))
             else:
-                manager=project.project_manager.name
-            item = ProjectBuilder(
-                name=project.name,
-                start=start,
-                end=end,
-                project_manager=manager,
-                status=str(project.status.value)
-                )
-            item.add_control("self", api.url_for(ProjectItem, project=project.name))
-            item.add_control_delete_project(project.name)
+                # dates and statuses are formatted by the serializer
+                item = ProjectBuilder(project._asdict())
+            if controls:
+                item.add_control_project(project.name)
+                item.add_control_delete_project(project.name)
             body["items"].append(item)
 
-        return Response(json.dumps(body), 200, mimetype=MASON)
+        return mason_response(body)
 
     def post(self):
         """
         this function adds new project to the database
         """
-        # add new project
-        db.session.rollback()
         if not request.json:
             return create_error_response(415,
                                          "Unsupported media type",
                                          "Requests must be JSON")
         try:
-            validate(request.json, ProjectBuilder.project_schema())
+            PROJECT_VALIDATOR.validate(request.json)
         except ValidationError as e:
             return create_error_response(400,
                                          "Invalid JSON document",
@@ -372,9 +831,11 @@ class ProjectCollection(Resource):
             pass
         if manager is not None:
             new_project.project_manager = manager
+        new_project.budget = request.json.get("budget")
+        new_project.avg_hourly_cost = request.json.get("avg_hourly_cost")
         try:
             db.session.add(new_project)
-            db.session.commit()
+            db.session.flush()
         except IntegrityError:
             return create_error_response(409,
                                          "Already exists",
@@ -388,11 +849,14 @@ class ProjectItem(Resource):
     class for single project
     """
     #get project
+    @conditional(Project, Members)
     def get(self, project):
         """
         get single project details
         """
-        db_project = Project.query.filter_by(name=project).first()
+        db_project = Project.query.options(
+            joinedload(Project.project_manager)
+            ).filter_by(name=project).first()
         if db_project is None:
             return create_error_response(404, "Not found", f"Project with name {project} not found.")
 
@@ -415,7 +879,10 @@ class ProjectItem(Resource):
                               start=str(db_project.start),
                               end=str(db_project.end),
                               project_manager=str(manager),
-                              status=str(db_project.status.value))
+                              status=str(db_project.status.value),
+                              budget=db_project.budget,
+                              total_hours=db_project.total_hours or 0,
+                              total_costs=db_project.total_costs or 0)
 
         body.add_namespace("promana", LINK_RELATIONS_URL)
         body.add_control("self", api.url_for(ProjectItem, project=project))
@@ -423,22 +890,20 @@ class ProjectItem(Resource):
         body.add_control_edit_project(project)
         body.add_control_delete_project(project)
 
-        return Response(json.dumps(body), 200, mimetype=MASON)
+        return mason_response(body)
 
     #edit project
     def put(self, project):
         """
         edit project details
         """
-        db.session.rollback()
-
         if not request.json:
             return create_error_response(415,
                                          "Unsupported media type",
                                          "Requests must be JSON")
 
         try:
-            validate(request.json, ProjectBuilder.project_schema("put"))
+            PROJECT_PUT_VALIDATOR.validate(request.json)
         except ValidationError as e:
             return create_error_response(400,
                                          "Invalid JSON document",
@@ -479,8 +944,12 @@ class ProjectItem(Resource):
         except (KeyError, TypeError):
             pass
 
+        for name in ("budget", "avg_hourly_cost"):
+            if name in request.json:
+                setattr(db_project, name, request.json[name])
+
         try:
-            db.session.commit()
+            db.session.flush()
         except IntegrityError:
             return create_error_response(409,
                                          "already exists",
@@ -499,14 +968,14 @@ class ProjectItem(Resource):
                                          "Not found", 
                                          "No project was found with the name {}".format(project))
         db.session.delete(db_project)
-        db.session.commit()
-        
+
         return Response(status=204)
 
 class MemberCollection(Resource):
     """
     class for members collection
     """
+    @conditional(Members, cached=True)
     def get(self):
         """
         get all the members from the database
@@ -525,10 +994,10 @@ class MemberCollection(Resource):
 
         for member in db_members:
             item = MemberBuilder(name=member.name)
-            item.add_control("self", api.url_for(MemberItem, member=member.name))
+            item.add_control_member(member.name)
             body["items"].append(item)
 
-        return Response(json.dumps(body), 200, mimetype=MASON)
+        return mason_response(body)
 
     def post(self):
         """
@@ -541,17 +1010,18 @@ class MemberCollection(Resource):
                                          "Requests must be JSON")
 
         try:
-            validate(request.json, MemberBuilder.member_schema())
+            MEMBER_VALIDATOR.validate(request.json)
         except ValidationError as e:
             return create_error_response(400,
                                          "Invalid JSON document",
                                          str(e))
 
-        new_member = Members(name=request.json["name"])
+        new_member = Members(name=request.json["name"],
+                             hourly_cost=request.json.get("hourly_cost"))
         
         try:
             db.session.add(new_member)
-            db.session.commit()
+            db.session.flush()
         except IntegrityError:
             return create_error_response(409,
                                          "Already exists", 
@@ -564,6 +1034,7 @@ class MemberItem(Resource):
     class for single member
     """
     #get member
+    @conditional(Members)
     def get(self, member):
         """
         get member details
@@ -574,14 +1045,14 @@ class MemberItem(Resource):
                                          "Not found", 
                                          "No member was found with the name {}".format(member))
 
-        body = MemberBuilder(name=db_member.name)
+        body = MemberBuilder(name=db_member.name, hourly_cost=db_member.hourly_cost)
         body.add_namespace("promana", LINK_RELATIONS_URL)
         body.add_control("self", api.url_for(MemberItem, member=member))
         body.add_control("collection", api.url_for(MemberCollection))
         body.add_control_edit_member(member)
         body.add_control_delete_member(member)
 
-        return Response(json.dumps(body), 200, mimetype=MASON)
+        return mason_response(body)
 
     #edit member
     def put(self, member):
@@ -595,7 +1066,7 @@ class MemberItem(Resource):
                                          "Requests must be JSON")
 
         try:
-            validate(request.json, MemberBuilder.member_schema())
+            MEMBER_VALIDATOR.validate(request.json)
         except ValidationError as e:
             return create_error_response(400, "Invalid JSON document", str(e))
 
@@ -606,9 +1077,11 @@ class MemberItem(Resource):
                                          "No member was found with the name {}".format(member))
 
         db_member.name = request.json["name"]
+        if "hourly_cost" in request.json:
+            db_member.hourly_cost = request.json["hourly_cost"]
 
         try:
-            db.session.commit()
+            db.session.flush()
         except IntegrityError:
             return create_error_response(409,
                                          "Already exists", 
@@ -628,15 +1101,106 @@ class MemberItem(Resource):
                                          "No member was found with the name {}".format(member))
 
         db.session.delete(db_member)
-        db.session.commit()
-        
+
         return Response(status=204)
 
+def read_member_names():
+    """
+    Reads the member names from the body of a membership request, which is
+    one member or an array of members. Returns the names and whether the
+    body was an array. Raises ValidationError if the body is not valid.
+    """
+    if isinstance(request.json, list):
+        MEMBER_LIST_VALIDATOR.validate(request.json)
+        return [doc["name"] for doc in request.json], True
+    MEMBER_VALIDATOR.validate(request.json)
+    return [request.json["name"]], False
+
+def find_members(names):
+    """
+    Maps the member names to ids with one IN query. Returns the ids and an
+    error response naming the members that do not exist, or None.
+    """
+    members = dict(db.session.query(Members.name, Members.id).filter(Members.name.in_(set(names))))
+    missing = sorted(set(names) - members.keys())
+    if missing:
+        return members, create_error_response(404, "not found",
+                                              f"members not in database: {', '.join(missing)}")
+    return members, None
+
+def add_members(db_task, names):
+    """
+    Adds the named members to a task in the current transaction. The
+    members that already are in the task are found with one query and the
+    rest are inserted with one executemany. Returns an error response, or
+    None if the members were added.
+    """
+    members, error = find_members(names)
+    if error is not None:
+        return error
+    existing = sorted(name for name, in db.session.query(Members.name).join(
+        Teams, Teams.member_id == Members.id
+        ).filter(
+        Teams.task_id == db_task.id, Members.id.in_(members.values())
+        ))
+    if existing:
+        return create_error_response(409, "Already exists",
+                                     f"Members already in task '{db_task.name}': {', '.join(existing)}")
+    db.session.execute(Teams.__table__.insert(),
+                       [{"task_id": db_task.id, "member_id": member_id} for member_id in members.values()])
+    mark_tables_changed(db.session, [Teams.__table__.name])
+    return None
+
+def remove_members(teams, names, where):
+    """
+    Removes the named members from the tasks of the teams query with one
+    DELETE in the current transaction. Returns an error response if a
+    member does not exist or is not in the tasks, or None.
+    """
+    members, error = find_members(names)
+    if error is not None:
+        return error
+    teams = teams.filter(Teams.member_id.in_(members.values()))
+    present = {member_id for member_id, in teams.with_entities(Teams.member_id)}
+    absent = sorted(name for name, member_id in members.items() if member_id not in present)
+    if absent:
+        return create_error_response(404, "not found", f"members not in {where}: {', '.join(absent)}")
+    teams.delete(synchronize_session=False)
+    return None
+
+def members_added(names, batch, resource, **kwargs):
+    """
+    Returns the 201 response of a membership request. The response to one
+    member has its location, the response to an array lists the members.
+    """
+    if not batch:
+        return Response(status=201, headers={"Location": api.url_for(resource, member=names[0], **kwargs)})
+    body = MemberBuilder(items=[])
+    for name in sorted(set(names)):
+        item = MemberBuilder(name=name)
+        item.add_control_member(name, **kwargs)
+        body["items"].append(item)
+    return mason_response(body, 201)
+
+def project_default_task(db_project):
+    """
+    Returns the task that holds the members added to the project itself,
+    creating it if the project has none yet.
+    """
+    db_task = Tasks.query.filter_by(name=f"{db_project.name}-default").first()
+    if db_task is None:
+        db_task = Tasks(project=db_project, name=f"{db_project.name}-default",
+                        status=status_type["NOT_STARTED"])
+        db.session.add(db_task)
+        db.session.flush()
+    return db_task
+
 class ProjectMembers(Resource):
     """
     class for project members
     """
     # get all project members
+    @conditional(Project, Tasks, Teams, Members)
     def get(self, project):
         """
         get all project members
@@ -655,69 +1219,77 @@ class ProjectMembers(Resource):
         body.add_control_add_member(project=project)
         body["items"] = []
 
-        db_tasks = Tasks.query.filter_by(project_id=db_project.id)
+        # members of every task in the project in one query, a member
+        # working on several tasks is listed only once
+        db_members = db.session.query(Members.name).join(
+            Teams, Teams.member_id == Members.id
+            ).join(
+            Tasks, Tasks.id == Teams.task_id
+            ).filter(
+            Tasks.project_id == db_project.id
+            ).distinct().order_by(Members.name)
+
+        for member_name, in db_members:
+            item = MemberBuilder(name=member_name)
+            item.add_control_member(member_name, project=project)
+            body["items"].append(item)
 
-        for task in db_tasks:
-            db_teams = Teams.query.filter_by(team_tasks=task)
-            for team in db_teams:
-                member = team.team_members
-                if member is not None:
-                    try:
-                        if member.name not in body["items"]:
-                            item = MemberBuilder(name=member.name)
-                            item.add_control("self", api.url_for(ProjectMemberItem, project=project, member=member.name))
-                            body["items"].append(item)
-                    except AttributeError:
-                        return create_error_response(404, "not found", "user not found")
-
-        return Response(json.dumps(body), 200, mimetype=MASON)
+        return mason_response(body)
 
     def post(self, project):
         """
-        add new member to project
+        add one member, or an array of members, to the project
         """
-        if not request.json:
+        if request.json is None:
             return create_error_response(415, "Unsupported media type",
                 "Requests must be JSON"
             )
         try:
-            validate(request.json, MemberBuilder.member_schema())
+            names, batch = read_member_names()
         except ValidationError as e:
             return create_error_response(400, "Invalid JSON document", str(e))
-        # add new member to task
-        db_member = Members.query.filter_by(name=request.json["name"]).first()
-        db_task = Tasks.query.filter_by(name=f"{project}-default").first()
         db_project = Project.query.filter_by(name=project).first()
+        if db_project is None:
+            return create_error_response(404, "Project not found", f"Project with name {project} not found")
 
-        if db_member is None:
-            return create_error_response(404, "not found", f"member {request.json['name']} not in database")
-        if db_task is None:
-            new_task = Tasks(project=db_project, name=f"{project}-default", status=status_type["NOT_STARTED"])
-            db.session.add(new_task)
-            db.session.commit()
-
-        db_task = Tasks.query.filter_by(name=f"{project}-default").first()
-        db_team = Teams.query.filter_by(task_id=db_task.id, member_id=db_member.id).first()
-        if db_team is not None:
-            return create_error_response(409, "Already exists", 
-                "Member already in task '{}'.".format(db_task.name)
-            )
-        new_team = Teams(team_tasks=db_task,
-                         team_members=db_member)
-
+        # the unique index on (task_id, member_id) rejects duplicates that
+        # are added at the same time
         try:
-            db.session.add(new_team)
-            db.session.commit()
+            error = add_members(project_default_task(db_project), names)
+            if error is not None:
+                return error
         except IntegrityError:
-            return create_error_response(409, "Already exists", 
-                "Member already in task '{}'.".format(task)
+            return create_error_response(409, "Already exists",
+                                         f"Members already in project '{project}'.")
+        return members_added(names, batch, ProjectMemberItem, project=project)
+
+    def delete(self, project):
+        """
+        remove an array of members from every task of the project
+        """
+        if request.json is None:
+            return create_error_response(415, "Unsupported media type",
+                "Requests must be JSON"
             )
-        return Response(status=201, headers={"Location": api.url_for(ProjectMemberItem, project=project, member=db_member.name)})
+        try:
+            names, batch = read_member_names()
+        except ValidationError as e:
+            return create_error_response(400, "Invalid JSON document", str(e))
+        db_project = Project.query.filter_by(name=project).first()
+        if db_project is None:
+            return create_error_response(404, "Project not found", f"Project with name {project} not found")
+
+        tasks = db.session.query(Tasks.id).filter(Tasks.project_id == db_project.id)
+        error = remove_members(Teams.query.filter(Teams.task_id.in_(tasks)), names, f"project {project}")
+        if error is not None:
+            return error
+        return Response(status=204)
 
 class ProjectMemberItem(Resource):
     """
     class for single project member
     """
+    @conditional(Members)
     def get(self, project, member):
         """
         get member details
@@ -732,7 +1304,7 @@ class ProjectMemberItem(Resource):
         body.add_control("self", api.url_for(ProjectMemberItem, project=project, member=member))
         body.add_control("up", api.url_for(ProjectMembers, project=project))
 
-        return Response(json.dumps(body), 200, mimetype=MASON)
+        return mason_response(body)
 
     # delete member from project
     def delete(self, project, member):
@@ -742,28 +1314,19 @@ class ProjectMemberItem(Resource):
         db_project = Project.query.filter_by(name=project).first()
         if db_project is None:
             return create_error_response(404, "Project not found", f"Project with name {project} not found")
-        
-
-        db_tasks = Tasks.query.filter_by(project_id=db_project.id)
-        if db_tasks is []:
-            return create_error_response(404, "not found", f"no tasks for this project")
 
-        db_member = Members.query.filter_by(name=member).first()
-        if db_member is None:
-            return create_error_response(404, "not found", f"member {member} not in database")
-
-        for task in db_tasks:
-            db_team = Teams.query.filter_by(task_id=task.id, member_id=db_member.id).first()
-            if db_team is not None:
-                db.session.delete(db_team)
-                db.session.commit()
-                return Response(status=204)
-        return create_error_response(404, "not found", f"member {member} not in project {project}")
+        # the member is removed from every task of the project at once
+        tasks = db.session.query(Tasks.id).filter(Tasks.project_id == db_project.id)
+        error = remove_members(Teams.query.filter(Teams.task_id.in_(tasks)), [member], f"project {project}")
+        if error is not None:
+            return error
+        return Response(status=204)
 
 class TaskMembers(Resource):
     """
     class for all task member
     """
+    @conditional(Tasks, Teams, Members)
     def get(self, project, phase, task):
         """
         get all task members
@@ -786,50 +1349,61 @@ class TaskMembers(Resource):
             try:
                 if member.name not in body["items"]:
                     item = MemberBuilder(name=member.name)
-                    item.add_control("self", api.url_for(TaskMemberItem, project=project, phase=phase, task=task, member=member.name))
+                    item.add_control_member(member.name, project=project, phase=phase, task=task)
                     body["items"].append(item)
             except AttributeError:
                 return create_error_response(404, "not found", "user not found")
 
-        return Response(json.dumps(body), 200, mimetype=MASON)
+        return mason_response(body)
 
     def post(self, project, phase, task):
         """
-        add new members to a task
+        add one member, or an array of members, to a task
         """
-        if not request.json:
+        if request.json is None:
             return create_error_response(415, "Unsupported media type",
                 "Requests must be JSON"
             )
         try:
-            validate(request.json, MemberBuilder.member_schema())
+            names, batch = read_member_names()
         except ValidationError as e:
             return create_error_response(400, "Invalid JSON document", str(e))
-        # add new member to task
-        db_member = Members.query.filter_by(name=request.json["name"]).first()
         db_task = Tasks.query.filter_by(name=task).first()
-
-        if db_member is None:
-            return create_error_response(404, "not found", f"member {request.json['name']} not in database")
         if db_task is None:
             return create_error_response(404, "Task not found", f"Task with name {task} not found")
-        
-        db_team = Teams.query.filter_by(task_id=db_task.id, member_id=db_member.id).first()
-        if db_team is not None:
-            return create_error_response(409, "Already exists", 
-                "Member already in task '{}'.".format(task)
-            )
-        new_team = Teams(team_tasks=db_task,
-                         team_members=db_member)
 
+        # the unique index on (task_id, member_id) rejects duplicates that
+        # are added at the same time
         try:
-            db.session.add(new_team)
-            db.session.commit()
+            error = add_members(db_task, names)
+            if error is not None:
+                return error
         except IntegrityError:
             return create_error_response(409, "Already exists", 
                 "Member already in task '{}'.".format(task)
             )
-        return Response(status=201, headers={"location": api.url_for(TaskMemberItem, project=project, phase=phase, task=task, member=db_member.name)})
+        return members_added(names, batch, TaskMemberItem, project=project, phase=phase, task=task)
+
+    def delete(self, project, phase, task):
+        """
+        remove an array of members from a task
+        """
+        if request.json is None:
+            return create_error_response(415, "Unsupported media type",
+                "Requests must be JSON"
+            )
+        try:
+            names, batch = read_member_names()
+        except ValidationError as e:
+            return create_error_response(400, "Invalid JSON document", str(e))
+        db_task = Tasks.query.filter_by(name=task).first()
+        if db_task is None:
+            return create_error_response(404, "Task not found", f"Task with name {task} not found")
+
+        error = remove_members(Teams.query.filter(Teams.task_id == db_task.id), names, f"task {task}")
+        if error is not None:
+            return error
+        return Response(status=204)
 
 
 class TaskMemberItem(Resource):
@@ -852,12 +1426,12 @@ class TaskMemberItem(Resource):
             return create_error_response(404, "not found", f"member {member} not in project {project}")
         else:
             db.session.delete(db_team)
-            db.session.commit()
-        
+
         return Response(status=204)
 
 class PhaseCollection(Resource):
 
+    @conditional(Project, Phase, cached=True)
     def get(self, project):
         db_project = Project.query.filter_by(name=project).first()
         db_phases = Phase.query.filter_by(project_id=db_project.id)
@@ -873,36 +1447,20 @@ class PhaseCollection(Resource):
         body["items"] = []
 
         for phase in db_phases:
-
-            if phase.task is None:
-                phase_task = phase.task
-            else:
-                phase_task = phase.task
-
-            try:
-                deadline=phase.deadline.strftime("%Y-%m-%d")
-            except AttributeError:
-                deadline = None
-
-            item = PhaseBuilder(
-                name = phase.name,
-                deadline = deadline,
-                status = str(phase.status.value)
-                )
-            item.add_control("self", api.url_for(PhaseItem, project=project, phase=phase.name))
+            item = PhaseBuilder(**PhaseBuilder.phase_fields(phase))
+            item.add_control_phase(project, phase.name)
             body["items"].append(item)
 
-        return Response(json.dumps(body), 200, mimetype=MASON)
+        return mason_response(body)
 
     def post(self, project):
 
-        #db.session.rollback()
         if not request.json:
             return create_error_response(415, "Unsupported media type",
                                          "Requests must be JSON"
                                          )
         try:
-            validate(request.json, PhaseBuilder.phase_schema())
+            PHASE_VALIDATOR.validate(request.json)
         except ValidationError as e:
             return create_error_response(400, "Invalid JSON document", str(e))
 
@@ -930,7 +1488,7 @@ class PhaseCollection(Resource):
             new_phase.deadline = new_phase.deadline
         try:
             db.session.add(new_phase)
-            db.session.commit()
+            db.session.flush()
         except IntegrityError:
             return create_error_response(409, "Already exists",
                 "Phase with name '{}' already exists.".format(request.json["name"])
@@ -943,6 +1501,7 @@ class PhaseCollection(Resource):
 
 
 class PhaseItem(Resource):
+    @conditional(Phase)
     def get(self, project, phase):
         db_phase = Phase.query.filter_by(name=phase).first()
         if db_phase == None:
@@ -967,19 +1526,17 @@ class PhaseItem(Resource):
         body.add_control_edit_phase(project, phase)
         body.add_control_delete_phase(project, phase)
 
-        return Response(json.dumps(body), 200, mimetype=MASON)
+        return mason_response(body)
 
     def put(self, project, phase):
         """
         Modify existing phase.
         """
-        db.session.rollback()
-
         if not request.json:
             return create_error_response(415, "Unsupported media type", "Requests must be JSON")
         
         try:
-            validate(request.json, PhaseBuilder.phase_schema())
+            PHASE_VALIDATOR.validate(request.json)
         except ValidationError as e:
             return create_error_response(400, "Invalid JSON document", str(e))
 
@@ -1002,7 +1559,7 @@ class PhaseItem(Resource):
             pass
 
         try:
-            db.session.commit()
+            db.session.flush()
         except IntegrityError:
             return create_error_response(409, "Already exists", "Phase with name '{}' already exists.".format(request.json["name"]))
 
@@ -1019,64 +1576,122 @@ class PhaseItem(Resource):
         for db_phase in db_phases:
             if db_phase.project == db_project:
                 db.session.delete(db_phase)
-                db.session.commit()
-        
+
         return Response(status=204)
 
 
 class TaskCollection(Resource):
 
-    def get(self, project, phase):
+    SORT_COLUMNS = {
+        "name": Tasks.name,
+        "start": Tasks.start,
+        "end": Tasks.end,
+        "status": Tasks.status,
+        }
 
-        db_tasks = Tasks.query.all()
+    # the columns of the fields that the fields query parameter can select
+    FIELDS = {
+        "task_name": Tasks.name,
+        "task_phase": Phase.name,
+        "task_start": Tasks.start,
+        "task_end": Tasks.end,
+        "task_status": Tasks.status,
+        }
 
-        if db_tasks is None:
-            return Response(status=501)
+    @conditional(Project, Phase, Tasks)
+    def get(self, project, phase):
+        """
+        get one page of the tasks in a project phase, or in the whole
+        project if phase is WHOLE_PROJECT. Supports the limit, after,
+        sort (name, start, end or status, prefixed with - for descending
+        order), status, fields (task_name is always included) and controls
+        (all or none) query parameters.
+        """
+        db_project = Project.query.filter_by(name=project).first()
+        if db_project is None:
+            return create_error_response(404, "Not found", f"Project with name {project} not found.")
+
+        try:
+            limit = parse_limit_arg()
+            statuses = parse_status_args()
+            fields = parse_fields_arg(self.FIELDS)
+            controls = parse_controls_arg()
+        except ValueError as e:
+            return create_error_response(400, "Invalid query parameter", str(e))
+
+        if fields is None:
+            query = Tasks.query.options(joinedload(Tasks.phase))
+        else:
+            fields = ["task_name"] + [field for field in fields if field != "task_name"]
+            query = db.session.query(*[self.FIELDS[field].label(field) for field in fields])
+            query = query.select_from(Tasks)
+            if "task_phase" in fields:
+                query = query.outerjoin(Tasks.phase)
+        query = query.filter(Tasks.project_id == db_project.id)
+        if phase != "WHOLE_PROJECT":
+            db_phase = Phase.query.filter_by(project_id=db_project.id, name=phase).first()
+            if db_phase is None:
+                return create_error_response(404, "Not found", f"Phase with name {phase} not found.")
+            query = query.filter(Tasks.phase_id == db_phase.id)
+
+        sort = request.args.get("sort", "name")
+        descending = sort.startswith("-")
+        sort_column = self.SORT_COLUMNS.get(sort.lstrip("-"))
+        if sort_column is None:
+            return create_error_response(400, "Invalid query parameter",
+                                         f"cannot sort by '{sort}'")
+
+        cursor = None
+        after = request.args.get("after")
+        if after is not None:
+            cursor = db.session.query(sort_column, Tasks.name).filter(Tasks.name == after).first()
+            if cursor is None:
+                return create_error_response(400, "Invalid query parameter",
+                                             f"no task with name '{after}' to continue from")
+
+        if statuses:
+            query = query.filter(Tasks.status.in_(statuses))
+        query = apply_keyset(query, sort_column, Tasks.name, cursor, descending)
+        db_tasks = query.limit(limit + 1).all()
+        has_next = len(db_tasks) > limit
+        db_tasks = db_tasks[:limit]
 
         body = TaskBuilder()
-        body.add_namespace("promana", LINK_RELATIONS_URL)
-        body.add_control("self", api.url_for(TaskCollection, project=project, phase=phase))
-        body.add_control_add_task(project, phase)
-        body.add_control("up", api.url_for(PhaseItem, project=project, phase=phase))
+        if controls:
+            body.add_namespace("promana", LINK_RELATIONS_URL)
+            body.add_control("self", api.url_for(TaskCollection, project=project, phase=phase))
+            body.add_control_add_task(project, phase)
+            body.add_control("up", api.url_for(PhaseItem, project=project, phase=phase))
+        if has_next:
+            last = db_tasks[-1].name if fields is None else db_tasks[-1].task_name
+            query_args = {key: values for key, values in request.args.lists() if key != "after"}
+            query_args["limit"] = limit
+            body.add_control("next", api.url_for(TaskCollection, project=project, phase=phase,
+                                                 after=last, **query_args))
         body["items"] = []
 
         for task in db_tasks:
-
-            if task.phase is None:
-                task_phase = task.phase
+            if fields is None:
+                item = TaskBuilder(**TaskBuilder.task_fields(task))
+                name = task.name
             else:
-                task_phase = task.phase.name
-
-            if task.start is None:
-                task_start = task.start
-            else:
-                task_start = task.start.strftime("%Y-%m-%d")
-
-            if task.end is None:
-                task_end = task.end
-            else:
-                task_end = task.end.strftime("%Y-%m-%d")
-
-            item = TaskBuilder(
-                task_name = task.name,
-                task_phase=task_phase,
-                task_start=task_start,
-                task_end=task_end,
-                task_status = str(task.status)
-                )
-            item.add_control("self", api.url_for(TaskItem, project=project, phase=phase,
-                                                 task=task.name))
+                item = TaskBuilder(task._asdict())
+                name = task.task_name
+                # same format as in task_fields
+                if "task_status" in item:
+                    item["task_status"] = str(item["task_status"])
+            if controls:
+                item.add_control_task(project, phase, name)
             body["items"].append(item)
 
-        return Response(json.dumps(body), 200, mimetype=MASON)
+        return mason_response(body)
 
     def post(self, project, phase):
 
-        db.session.rollback()
         if not request.json:
             return create_error_response(415, "Unsupported media type", "Requests must be JSON")
         try:
-            validate(request.json, TaskBuilder.task_schema())
+            TASK_VALIDATOR.validate(request.json)
         except ValidationError as e:
             return create_error_response(400, "Invalid JSON document", str(e))
 
@@ -1117,7 +1732,7 @@ class TaskCollection(Resource):
             new_task.end=datetime.datetime.strptime(new_task.end, "%Y-%m-%d")
         try:
             db.session.add(new_task)
-            db.session.commit()
+            db.session.flush()
         except IntegrityError:
             return create_error_response(409, "Already exists",
                 "Project with name '{}' already exists.".format(request.json["task_name"])
@@ -1129,6 +1744,7 @@ class TaskCollection(Resource):
             )
 
 class TaskItem(Resource):
+    @conditional(Tasks)
     def get(self, project, phase, task):
         db_task = Tasks.query.filter_by(name=task).first()
         if db_task == None:
@@ -1144,7 +1760,9 @@ class TaskItem(Resource):
             name=db_task.name,
             task_start=str(db_task.start),
             task_end=str(db_task.end),
-            status=str(db_task.status.value)
+            status=str(db_task.status.value),
+            total_hours=db_task.total_hours or 0,
+            total_cost=db_task.total_cost or 0
         )
 
         body.add_namespace("promana", LINK_RELATIONS_URL)
@@ -1155,18 +1773,16 @@ class TaskItem(Resource):
         body.add_control_edit_task(project, phase, task)
         body.add_control_delete_task(project, phase, task)
 
-        return Response(json.dumps(body), 200, mimetype=MASON)
+        return mason_response(body)
 
     def put(self, project, phase, task):
         """
         Modify existing task.
         """
-        db.session.rollback()
-
         if not request.json:
             return create_error_response(415, "Unsupported media type", "Requests must be JSON")
         try:
-            validate(request.json, TaskBuilder.task_schema())
+            TASK_VALIDATOR.validate(request.json)
         except ValidationError as e:
             return create_error_response(400, "Invalid JSON document", str(e))
 
@@ -1192,7 +1808,7 @@ class TaskItem(Resource):
             pass
 
         try:
-            db.session.commit()
+            db.session.flush()
         except IntegrityError:
             return create_error_response(409, "Already exists", "Phase with name '{}' already exists.".format(request.json["name"]))
 
@@ -1208,11 +1824,37 @@ class TaskItem(Resource):
             return create_error_response(404, "Not found", "No phase was found with the name {}".format(task))
 
         db.session.delete(db_task)
-        db.session.commit()
-        
+
         return Response(status=204)
 
 
+@functools.lru_cache(maxsize=None)
+def schema_document(name):
+    """
+    Returns the serialized schema and its ETag, built on first use.
+    """
+    body = dump_json(SCHEMAS[name]())
+    return body, hashlib.sha1(body).hexdigest()
+
+class SchemaItem(Resource):
+    """
+    class for request body schemas
+    """
+    def get(self, schema):
+        """
+        get a schema, which clients and proxies may cache for SCHEMA_MAX_AGE
+        seconds and revalidate with the ETag after that
+        """
+        if schema not in SCHEMAS:
+            return create_error_response(404, "Not found", f"No schema was found with the name {schema}")
+        body, etag = schema_document(schema)
+        resp = Response(body, 200, mimetype="application/schema+json")
+        resp.set_etag(etag)
+        resp.cache_control.public = True
+        resp.cache_control.max_age = current_app.config["SCHEMA_MAX_AGE"]
+        return resp.make_conditional(request)
+
+
 api.add_resource(ProjectCollection, "/api/projects/")
 api.add_resource(ProjectItem, "/api/projects/<project>/")
 api.add_resource(MemberCollection, "/api/members/")
@@ -1225,21 +1867,30 @@ api.add_resource(PhaseCollection, "/api/projects/<project>/phases/")
 api.add_resource(PhaseItem, "/api/projects/<project>/phases/<phase>/")
 api.add_resource(TaskCollection, "/api/projects/<project>/phases/<phase>/tasks/")
 api.add_resource(TaskItem, "/api/projects/<project>/phases/<phase>/tasks/<task>/")
+api.add_resource(SchemaItem, "/api/schemas/<schema>/")
 
 
-@app.route(LINK_RELATIONS_URL)
+@api_blueprint.route(LINK_RELATIONS_URL)
 def send_link_relations():
     """
     function for link relations
     """
     return "link relations"
 
-@app.route("/admin/")
+@api_blueprint.route("/api/cache/")
+def cache_stats():
+    """
+    function for response cache counters
+    """
+    return Response(dump_json(response_cache.stats()), 200, mimetype="application/json")
+
+@api_blueprint.route("/admin/")
 def admin_site():
     """
     function for admin site
     """
-    return app.send_static_file("html/admin.html")
+    return current_app.send_static_file("html/admin.html")
 
 if __name__ == "__main__":
-    db.create_all()
+    with create_app().app_context():
+        db.create_all()
@@ -0,0 +1,377 @@
+"""
+Micro-benchmarks for the API. Run with "python benchmark.py [name ...]",
+without names every benchmark is run.
+"""
+import contextlib
+import datetime
+import json
+import multiprocessing
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+import types
+
+from jsonschema import validate
+
+from app import (create_app, db, response_cache, ProjectBuilder, TaskBuilder,
+                 PROJECT_VALIDATOR, TASK_VALIDATOR)
+from models import status_type
+from utils import LINK_RELATIONS_URL, dump_json
+import compression
+import utils
+
+BENCHMARKS = {}
+app = create_app()
+
+def benchmark(func):
+    BENCHMARKS[func.__name__[len("bench_"):]] = func
+    return func
+
+def report(label, seconds, number):
+    print(f"{label:<40} {seconds / number * 1e6:10.2f} us/call")
+
+@contextlib.contextmanager
+def temporary_database():
+    """
+    Points the app to an empty database in a temporary file.
+    """
+    db_fd, db_fname = tempfile.mkstemp()
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///" + db_fname
+    with app.app_context():
+        db.create_all()
+    try:
+        yield
+    finally:
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        os.close(db_fd)
+        os.unlink(db_fname)
+
+@benchmark
+def bench_validation(number=20000):
+    """
+    Validation cost per request body, building the schema and validating
+    with jsonschema.validate versus the validators compiled at startup.
+    """
+    project = {"name": "project", "start": "2021-01-01", "end": "2021-12-31",
+               "project_manager": "manager", "status": "STARTED"}
+    task = {"task_name": "task", "task_start": "2021-01-01",
+            "task_end": "2021-02-01", "task_status": "NOT_STARTED"}
+    report("project, jsonschema.validate",
+           timeit.timeit(lambda: validate(project, ProjectBuilder.project_schema()), number=number),
+           number)
+    report("project, compiled validator",
+           timeit.timeit(lambda: PROJECT_VALIDATOR.validate(project), number=number),
+           number)
+    report("task, jsonschema.validate",
+           timeit.timeit(lambda: validate(task, TaskBuilder.task_schema()), number=number),
+           number)
+    report("task, compiled validator",
+           timeit.timeit(lambda: TASK_VALIDATOR.validate(task), number=number),
+           number)
+
+def plan_lines(tasks, projects=1):
+    """
+    Returns the NDJSON lines of a project plan for /api/bulk/ with the
+    given number of tasks spread over the projects, each task with one
+    member.
+    """
+    lines = [{"type": "member", "name": f"member-{i}"} for i in range(100)]
+    for p in range(projects):
+        lines.append({"type": "project", "name": f"plan-{p}", "status": "STARTED"})
+        lines.extend({"type": "phase", "project": f"plan-{p}", "name": f"phase-{i}"} for i in range(10))
+    for i in range(tasks):
+        lines.append({"type": "task", "project": f"plan-{i % projects}", "phase": f"phase-{i % 10}",
+                      "task_name": f"task-{i}", "task_start": "2021-01-01",
+                      "task_status": "NOT_STARTED"})
+        lines.append({"type": "team", "task": f"task-{i}", "member": f"member-{i % 100}"})
+    return lines
+
+@benchmark
+def bench_bulk_import(tasks=50000):
+    """
+    Time to import a project plan of 50k tasks, each with one member,
+    through /api/bulk/.
+    """
+    lines = plan_lines(tasks)
+    doc = "".join(json.dumps(line) + "\n" for line in lines)
+
+    with temporary_database():
+        client = app.test_client()
+        start = time.perf_counter()
+        resp = client.post("/api/bulk/", data=doc, content_type="application/x-ndjson")
+        seconds = time.perf_counter() - start
+        assert resp.status_code == 200
+        assert resp.data.count(b'"status":201') == len(lines)
+    print(f"{len(lines)} lines ({tasks} tasks) imported in {seconds:.2f} s")
+
+@benchmark
+def bench_export(tasks=50000, projects=500):
+    """
+    Time and peak Python memory of streaming /api/export/ for 50k tasks
+    in 500 projects.
+    """
+    doc = "".join(json.dumps(line) + "\n" for line in plan_lines(tasks, projects))
+    with temporary_database():
+        client = app.test_client()
+        client.post("/api/bulk/", data=doc, content_type="application/x-ndjson")
+        tracemalloc.start()
+        start = time.perf_counter()
+        resp = client.get("/api/export/", buffered=False)
+        size = 0
+        for chunk in resp.response:
+            size += len(chunk)
+        resp.close()
+        seconds = time.perf_counter() - start
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    print(f"{projects} projects ({tasks} tasks, {size / 1e6:.1f} MB) exported in {seconds:.2f} s, "
+          f"peak memory {peak / 1e6:.1f} MB")
+
+def listing_pages(items):
+    """
+    Returns (label, NDJSON plan, url, compact query) for a page of projects
+    and a page of tasks with the given number of items. The compact query
+    asks for the names and statuses only, without controls.
+    """
+    pages = (("projects", plan_lines(0, items), f"/api/projects/?limit={items}",
+              "&fields=status&controls=none"),
+             ("tasks", plan_lines(items), f"/api/projects/plan-0/phases/WHOLE_PROJECT/tasks/?limit={items}",
+              "&fields=task_status&controls=none"))
+    for label, lines, url, compact in pages:
+        yield label, "".join(json.dumps(line) + "\n" for line in lines), url, compact
+
+@benchmark
+def bench_listing(items=1000, number=20):
+    """
+    Time and size of a page of 1000 projects and one of 1000 tasks, full
+    and compact, with the response cache cleared before every request.
+    """
+    for label, doc, url, compact in listing_pages(items):
+        with temporary_database():
+            client = app.test_client()
+            client.post("/api/bulk/", data=doc, content_type="application/x-ndjson")
+            for variant, query in (("full", ""), ("compact", compact)):
+
+                def render():
+                    response_cache.clear()
+                    resp = client.get(url + query)
+                    assert resp.status_code == 200
+                    return len(resp.data)
+
+                size = render()
+                seconds = timeit.timeit(render, number=number)
+                print(f"{items} {label}, {variant:<9} {size:10d} bytes "
+                      f"{seconds / number * 1e3:10.2f} ms/request")
+
+@benchmark
+def bench_compression(items=1000, number=20):
+    """
+    Bytes on the wire and time per request of a page of 1000 projects and
+    one of 1000 tasks for every content encoding. The project page comes
+    from the response cache, so its time is mostly the compression.
+    """
+    encodings = ["identity", "gzip"] + (["br"] if compression.brotli is not None else [])
+    for label, doc, url, compact in listing_pages(items):
+        with temporary_database():
+            client = app.test_client()
+            client.post("/api/bulk/", data=doc, content_type="application/x-ndjson")
+            for encoding in encodings:
+                headers = {"Accept-Encoding": encoding}
+                size = len(client.get(url, headers=headers).data)
+                seconds = timeit.timeit(lambda: client.get(url, headers=headers), number=number)
+                print(f"{items} {label}, {encoding:<10} {size:10d} bytes "
+                      f"{seconds / number * 1e3:10.2f} ms/request")
+
+def timeline_lines(tasks, projects, years=4):
+    """
+    Returns the NDJSON lines of projects whose tasks start on every day of
+    the given number of years and last from one to 60 days, with a phase
+    deadline on every day.
+    """
+    first = datetime.date(2021, 1, 1)
+    days = 365 * years
+    lines = []
+    for p in range(projects):
+        lines.append({"type": "project", "name": f"plan-{p}", "status": "STARTED"})
+    for i in range(days):
+        lines.append({"type": "phase", "project": f"plan-{i % projects}", "name": f"phase-{i}",
+                      "deadline": (first + datetime.timedelta(days=i)).isoformat()})
+    for i in range(tasks):
+        start = first + datetime.timedelta(days=i % days)
+        lines.append({"type": "task", "project": f"plan-{i % projects}", "task_name": f"task-{i}",
+                      "task_start": start.isoformat(),
+                      "task_end": (start + datetime.timedelta(days=i % 60)).isoformat(),
+                      "task_status": "NOT_STARTED"})
+    return lines
+
+@benchmark
+def bench_timeline(tasks=100000, projects=500, number=20):
+    """
+    Time and size of the timeline of a 30 day window over 100k tasks in
+    500 projects, with the response cache cleared before every request.
+    """
+    doc = "".join(json.dumps(line) + "\n" for line in timeline_lines(tasks, projects))
+    url = "/api/timeline/?from=2023-06-01&to=2023-06-30"
+    with temporary_database():
+        client = app.test_client()
+        client.post("/api/bulk/", data=doc, content_type="application/x-ndjson")
+        for variant, query in (("full", ""), ("compact", "&controls=none")):
+
+            def render():
+                response_cache.clear()
+                resp = client.get(url + query)
+                assert resp.status_code == 200
+                return resp.data
+
+            data = render()
+            seconds = timeit.timeit(render, number=number)
+            count = data.count(b'"task_name"')
+            print(f"{count} of {tasks} tasks, {variant:<9} {len(data):10d} bytes "
+                  f"{seconds / number * 1e3:10.2f} ms/request")
+
+def collection_bodies(items=10000):
+    """
+    Builds the Mason bodies of a project and a task collection with the
+    given number of items the same way as the collection resources.
+    """
+    start = datetime.datetime(2021, 1, 1)
+    manager = types.SimpleNamespace(name="manager")
+    projects = ProjectBuilder()
+    projects.add_namespace("promana", LINK_RELATIONS_URL)
+    projects.add_control_add_project()
+    projects["items"] = []
+    for i in range(items):
+        project = types.SimpleNamespace(name=f"project-{i}", start=start, end=None,
+                                        project_manager=manager, status=status_type.STARTED)
+        item = ProjectBuilder(**ProjectBuilder.project_fields(project))
+        item.add_control_project(project.name)
+        item.add_control_delete_project(project.name)
+        projects["items"].append(item)
+    tasks = TaskBuilder()
+    tasks.add_namespace("promana", LINK_RELATIONS_URL)
+    tasks.add_control_add_task("project")
+    tasks["items"] = []
+    for i in range(items):
+        task = types.SimpleNamespace(name=f"task-{i}", phase=None, start=start, end=start,
+                                     status=status_type.NOT_STARTED)
+        item = TaskBuilder(**TaskBuilder.task_fields(task))
+        item.add_control_task("project", "WHOLE_PROJECT", task.name)
+        tasks["items"].append(item)
+    return {"projects": projects, "tasks": tasks}
+
+@benchmark
+def bench_serialization(items=10000, number=20):
+    """
+    Serialization cost of 10k item project and task collections, with
+    json.dumps and with dump_json on the json module and on orjson.
+    """
+    orjson = utils.orjson
+    for label, body in collection_bodies(items).items():
+        report(f"{items} {label}, json.dumps",
+               timeit.timeit(lambda: json.dumps(body).encode(), number=number), number)
+        utils.orjson = None
+        report(f"{items} {label}, dump_json (json)",
+               timeit.timeit(lambda: dump_json(body), number=number), number)
+        utils.orjson = orjson
+        if orjson is not None:
+            report(f"{items} {label}, dump_json (orjson)",
+                   timeit.timeit(lambda: dump_json(body), number=number), number)
+
+def _mixed_worker(worker, uri, profile, seconds, write_ratio, results):
+    """
+    One worker process of bench_concurrency. Like a gunicorn sync worker
+    it has its own engine and serves one request at a time.
+    """
+    app.config["SQLALCHEMY_DATABASE_URI"] = uri
+    app.config["SQLITE_PROFILE"] = profile
+    with app.app_context():
+        db.engine.dispose()
+    client = app.test_client()
+    reads = writes = errors = 0
+    deadline = time.perf_counter() + seconds
+    i = 0
+    while time.perf_counter() < deadline:
+        i += 1
+        if i % 100 < write_ratio * 100:
+            resp = client.post("/api/members/", json={"name": f"worker-{worker}-{i}"})
+            writes += 1
+        else:
+            resp = client.get(f"/api/projects/plan-{i % 10}/phases/WHOLE_PROJECT/tasks/?limit=20")
+            reads += 1
+        if resp.status_code >= 500:
+            errors += 1
+    results.put((reads, writes, errors))
+
+@benchmark
+def bench_concurrency(seconds=3, write_ratio=0.2):
+    """
+    Mixed read/write throughput of several worker processes sharing one
+    database file, for the safe and the tuned SQLite profile.
+    """
+    app.config["PROPAGATE_EXCEPTIONS"] = False
+    doc = "".join(json.dumps(line) + "\n" for line in plan_lines(2000, 10))
+    context = multiprocessing.get_context("fork")
+    for profile in ("safe", "tuned"):
+        for workers in (1, 4, 8):
+            app.config["SQLITE_PROFILE"] = profile
+            with temporary_database():
+                app.test_client().post("/api/bulk/", data=doc, content_type="application/x-ndjson")
+                uri = app.config["SQLALCHEMY_DATABASE_URI"]
+                with app.app_context():
+                    db.session.remove()
+                    db.engine.dispose()
+                results = context.Queue()
+                procs = [context.Process(target=_mixed_worker,
+                                         args=(n, uri, profile, seconds, write_ratio, results))
+                         for n in range(workers)]
+                for proc in procs:
+                    proc.start()
+                totals = [sum(values) for values in zip(*[results.get() for proc in procs])]
+                for proc in procs:
+                    proc.join()
+            reads, writes, errors = totals
+            print(f"{profile:<6} {workers} workers: {reads / seconds:8.0f} reads/s "
+                  f"{writes / seconds:7.0f} writes/s {errors:5d} errors")
+
+def import_times(statement="import app"):
+    """
+    Runs the statement in a new interpreter with "python -X importtime" and
+    returns a dict that maps every imported module to its cumulative import
+    time in seconds.
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", statement],
+                            cwd=os.path.dirname(os.path.abspath(__file__)),
+                            capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        times[module.strip()] = int(cumulative_us) / 1e6
+    return times
+
+@benchmark
+def bench_startup(runs=5):
+    """
+    Cold start of a worker, the time to import the app module in a new
+    interpreter. Reports the median over the runs for app and for the
+    largest modules it imports.
+    """
+    samples = [import_times() for run in range(runs)]
+    medians = {module: statistics.median(times.get(module, 0) for times in samples)
+               for module in samples[0]}
+    print(f"{'app':<40} {medians['app'] * 1e3:10.1f} ms")
+    for module in sorted(medians, key=medians.get, reverse=True)[1:11]:
+        print(f"  {module:<38} {medians[module] * 1e3:10.1f} ms")
+
+if __name__ == "__main__":
+    for name in sys.argv[1:] or list(BENCHMARKS):
+        print(f"== {name}")
+        BENCHMARKS[name]()
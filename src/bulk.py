@@ -0,0 +1,355 @@
+"""
+Bulk import of members, projects, phases, tasks and task memberships from
+a newline delimited JSON (NDJSON) document. Every line is one entity with
+a "type" field and the same fields as the POST body of its resource, plus
+name references to the entities it belongs to:
+
+    {"type": "member", "name": "..."}
+    {"type": "project", "name": "...", "status": "...", "project_manager": "..."}
+    {"type": "phase", "project": "...", "name": "...", ...}
+    {"type": "task", "project": "...", "phase": "...", "task_name": "...", ...}
+    {"type": "team", "task": "...", "member": "..."}
+
+Lines are read from the request stream and imported in batches, each batch
+in its own transaction with one executemany insert per entity type. The
+response has one NDJSON result line for every input line.
+"""
+import datetime
+import json
+
+from flask import Blueprint, Response, current_app, request
+from flask_restful import Api, Resource
+from sqlalchemy.exc import IntegrityError
+
+from app import (api, db, ProjectBuilder, MemberBuilder, PhaseBuilder, TaskBuilder,
+                 ProjectItem, MemberItem, PhaseItem, TaskItem, TaskMemberItem)
+from models import *
+from utils import SchemaValidator, ValidationError, create_error_response, dump_json
+
+NDJSON = "application/x-ndjson"
+NDJSON_TYPES = (NDJSON, "application/jsonl", "application/x-jsonlines")
+
+# the order in which the entities of a batch are inserted, so that every
+# entity can refer to the ones before it
+ENTITY_TYPES = ("member", "project", "phase", "task", "team")
+
+# the date fields of every entity type, parsed while the lines are validated
+DATE_FIELDS = {
+    "project": ("start", "end"),
+    "phase": ("deadline",),
+    "task": ("task_start", "task_end"),
+    }
+
+def _with_references(schema, required=(), optional=()):
+    """
+    Extends a resource schema with the string fields that refer to other
+    entities by name.
+    """
+    references = {
+        "type": "object",
+        "required": list(required),
+        "properties": {
+            name: {"description": f"Name of the {name}", "type": "string"}
+            for name in list(required) + list(optional)
+            }
+        }
+    return {"allOf": [schema, references]}
+
+# the schemas are built and compiled on first use
+BULK_VALIDATORS = {
+    "member": SchemaValidator(MemberBuilder.member_schema),
+    "project": SchemaValidator(ProjectBuilder.project_schema),
+    "phase": SchemaValidator(lambda: _with_references(PhaseBuilder.phase_schema(), required=["project"])),
+    "task": SchemaValidator(lambda: _with_references(TaskBuilder.task_schema(), required=["project"],
+                                                     optional=["phase"])),
+    "team": SchemaValidator(lambda: _with_references({"type": "object"}, required=["task", "member"])),
+    }
+
+def _parse_date(value):
+    if value is None:
+        return None
+    return datetime.datetime.strptime(value, "%Y-%m-%d")
+
+def _ids_by_name(name_column, id_column, names):
+    """
+    Maps names to ids with one IN query.
+    """
+    names = set(names)
+    if not names:
+        return {}
+    return dict(db.session.query(name_column, id_column).filter(name_column.in_(names)))
+
+def _insert_many(model, rows):
+    """
+    Inserts the rows with executemany. Rows are grouped by the columns they
+    set so that the column defaults still apply to the missing ones.
+    """
+    groups = {}
+    for row in rows:
+        groups.setdefault(tuple(sorted(row)), []).append(row)
+    for group in groups.values():
+        db.session.execute(model.__table__.insert(), group)
+
+
+class BulkImporter(object):
+    """
+    Imports the lines of one batch. The results are collected in a dict
+    that maps line numbers to result dicts.
+    """
+
+    def __init__(self, entries):
+        self.entries = entries
+        self.results = {}
+
+    def ok(self, line, location):
+        self.results[line] = {"line": line, "status": 201, "location": location}
+
+    def error(self, line, status, message):
+        self.results[line] = {"line": line, "status": status, "message": message}
+
+    def run(self):
+        by_type = {entity_type: [] for entity_type in ENTITY_TYPES}
+        for line, entity_type, doc in self.entries:
+            by_type[entity_type].append((line, doc))
+        changed = set()
+        for entity_type in ENTITY_TYPES:
+            if by_type[entity_type]:
+                getattr(self, f"import_{entity_type}s")(by_type[entity_type])
+                changed.add(entity_type)
+        return changed
+
+    def import_members(self, docs):
+        existing = _ids_by_name(Members.name, Members.id, [doc["name"] for line, doc in docs])
+        rows = []
+        for line, doc in docs:
+            if doc["name"] in existing:
+                self.error(line, 409, f"Member with name '{doc['name']}' already exists.")
+                continue
+            existing[doc["name"]] = None
+            row = {"name": doc["name"]}
+            if "hourly_cost" in doc:
+                row["hourly_cost"] = doc["hourly_cost"]
+            rows.append(row)
+            self.ok(line, api.url_for(MemberItem, member=doc["name"]))
+        _insert_many(Members, rows)
+
+    def import_projects(self, docs):
+        existing = _ids_by_name(Project.name, Project.id, [doc["name"] for line, doc in docs])
+        managers = _ids_by_name(Members.name, Members.id,
+                                [doc["project_manager"] for line, doc in docs if "project_manager" in doc])
+        rows = []
+        for line, doc in docs:
+            if doc["name"] in existing:
+                self.error(line, 409, f"Project with name '{doc['name']}' already exists.")
+                continue
+            row = {"name": doc["name"], "status": status_type[doc["status"]]}
+            if "project_manager" in doc:
+                if doc["project_manager"] not in managers:
+                    self.error(line, 404, f"member {doc['project_manager']} not in database")
+                    continue
+                row["project_manager_id"] = managers[doc["project_manager"]]
+            if "start" in doc:
+                row["start"] = doc["start"]
+            if "end" in doc:
+                row["end"] = doc["end"]
+            for name in ("budget", "avg_hourly_cost"):
+                if name in doc:
+                    row[name] = doc[name]
+            existing[doc["name"]] = None
+            rows.append(row)
+            self.ok(line, api.url_for(ProjectItem, project=doc["name"]))
+        _insert_many(Project, rows)
+        mark_projects_changed(db.session, _ids_by_name(Project.name, Project.id,
+                                                       [row["name"] for row in rows]).values())
+
+    def import_phases(self, docs):
+        projects = _ids_by_name(Project.name, Project.id, [doc["project"] for line, doc in docs])
+        existing = set(db.session.query(Phase.project_id, Phase.name).filter(
+            Phase.project_id.in_(projects.values()),
+            Phase.name.in_({doc["name"] for line, doc in docs})
+            ))
+        rows = []
+        for line, doc in docs:
+            project_id = projects.get(doc["project"])
+            if project_id is None:
+                self.error(line, 404, f"Project with name {doc['project']} not found")
+                continue
+            if (project_id, doc["name"]) in existing:
+                self.error(line, 409, f"Phase with name '{doc['name']}' already exists.")
+                continue
+            row = {"project_id": project_id, "name": doc["name"]}
+            if "status" in doc:
+                row["status"] = status_type[doc["status"]]
+            if "deadline" in doc:
+                row["deadline"] = doc["deadline"]
+            existing.add((project_id, doc["name"]))
+            rows.append(row)
+            self.ok(line, api.url_for(PhaseItem, project=doc["project"], phase=doc["name"]))
+        _insert_many(Phase, rows)
+        mark_projects_changed(db.session, [row["project_id"] for row in rows])
+
+    def import_tasks(self, docs):
+        projects = _ids_by_name(Project.name, Project.id, [doc["project"] for line, doc in docs])
+        existing = _ids_by_name(Tasks.name, Tasks.id, [doc["task_name"] for line, doc in docs])
+        phases = dict(
+            ((project_id, name), phase_id) for project_id, name, phase_id in
+            db.session.query(Phase.project_id, Phase.name, Phase.id).filter(
+                Phase.project_id.in_(projects.values()),
+                Phase.name.in_({doc["phase"] for line, doc in docs if "phase" in doc})
+                )
+            )
+        rows = []
+        for line, doc in docs:
+            project_id = projects.get(doc["project"])
+            if project_id is None:
+                self.error(line, 404, f"Project with name {doc['project']} not found")
+                continue
+            if doc["task_name"] in existing:
+                self.error(line, 409, f"Task with name '{doc['task_name']}' already exists.")
+                continue
+            row = {"project_id": project_id, "name": doc["task_name"]}
+            phase = doc.get("phase", "WHOLE_PROJECT")
+            if "phase" in doc:
+                row["phase_id"] = phases.get((project_id, doc["phase"]))
+                if row["phase_id"] is None:
+                    self.error(line, 404, f"Phase with name {doc['phase']} not found")
+                    continue
+            if "task_status" in doc:
+                row["status"] = status_type[doc["task_status"]]
+            if "task_start" in doc:
+                row["start"] = doc["task_start"]
+            if "task_end" in doc:
+                row["end"] = doc["task_end"]
+            existing[doc["task_name"]] = None
+            rows.append(row)
+            self.ok(line, api.url_for(TaskItem, project=doc["project"], phase=phase,
+                                      task=doc["task_name"]))
+        _insert_many(Tasks, rows)
+        mark_projects_changed(db.session, [row["project_id"] for row in rows])
+
+    def import_teams(self, docs):
+        tasks = dict(
+            (name, (task_id, project, phase)) for name, task_id, project, phase in
+            db.session.query(Tasks.name, Tasks.id, Project.name, Phase.name).outerjoin(
+                Project, Tasks.project_id == Project.id
+                ).outerjoin(
+                Phase, Tasks.phase_id == Phase.id
+                ).filter(Tasks.name.in_({doc["task"] for line, doc in docs}))
+            )
+        members = _ids_by_name(Members.name, Members.id, [doc["member"] for line, doc in docs])
+        existing = set(db.session.query(Teams.task_id, Teams.member_id).filter(
+            Teams.task_id.in_([task_id for task_id, project, phase in tasks.values()]),
+            Teams.member_id.in_(members.values())
+            ))
+        rows = []
+        for line, doc in docs:
+            if doc["task"] not in tasks:
+                self.error(line, 404, f"Task with name {doc['task']} not found")
+                continue
+            if doc["member"] not in members:
+                self.error(line, 404, f"member {doc['member']} not in database")
+                continue
+            task_id, project, phase = tasks[doc["task"]]
+            key = (task_id, members[doc["member"]])
+            if key in existing:
+                self.error(line, 409, f"Member already in task '{doc['task']}'.")
+                continue
+            existing.add(key)
+            rows.append({"task_id": key[0], "member_id": key[1]})
+            self.ok(line, api.url_for(TaskMemberItem, project=project, phase=phase or "WHOLE_PROJECT",
+                                      task=doc["task"], member=doc["member"]))
+        _insert_many(Teams, rows)
+
+
+TABLES = {
+    "member": Members.__table__.name,
+    "project": Project.__table__.name,
+    "phase": Phase.__table__.name,
+    "task": Tasks.__table__.name,
+    "team": Teams.__table__.name,
+    }
+
+def _import_batch(entries):
+    """
+    Imports one batch of validated entries in a single transaction and
+    returns the results of its lines.
+    """
+    importer = BulkImporter(entries)
+    try:
+        changed = importer.run()
+        mark_tables_changed(db.session, [TABLES[entity_type] for entity_type in changed])
+        db.session.commit()
+    except IntegrityError as e:
+        db.session.rollback()
+        for line, result in importer.results.items():
+            if result["status"] == 201:
+                importer.error(line, 409, f"Batch rolled back: {e.orig}")
+    return importer.results
+
+def _parse_lines(stream):
+    """
+    Yields (line number, entity type, document, error) for every non-empty
+    line of the stream, with the dates of the document parsed. Lines that
+    cannot be imported have an error result instead of a document.
+    """
+    for number, raw in enumerate(stream, start=1):
+        raw = raw.strip()
+        if not raw:
+            continue
+        try:
+            doc = json.loads(raw)
+        except ValueError as e:
+            yield number, None, None, {"line": number, "status": 400, "message": f"Invalid JSON: {e}"}
+            continue
+        entity_type = doc.get("type") if isinstance(doc, dict) else None
+        if entity_type not in BULK_VALIDATORS:
+            yield number, None, None, {"line": number, "status": 400,
+                                       "message": f"type must be one of {', '.join(ENTITY_TYPES)}"}
+            continue
+        try:
+            BULK_VALIDATORS[entity_type].validate(doc)
+        except ValidationError as e:
+            yield number, None, None, {"line": number, "status": 400, "message": str(e.message)}
+            continue
+        try:
+            for field in DATE_FIELDS.get(entity_type, ()):
+                if field in doc:
+                    doc[field] = _parse_date(doc[field])
+        except ValueError as e:
+            yield number, None, None, {"line": number, "status": 400, "message": str(e)}
+            continue
+        yield number, entity_type, doc, None
+
+
+class BulkImport(Resource):
+    """
+    class for bulk import
+    """
+    def post(self):
+        """
+        import the entities of an NDJSON document
+        """
+        if request.mimetype not in NDJSON_TYPES:
+            return create_error_response(415, "Unsupported media type",
+                                         f"Requests must be {NDJSON}")
+        batch_size = current_app.config["BULK_BATCH_SIZE"]
+        results = []
+        batch = []
+        for line, entity_type, doc, error in _parse_lines(request.stream):
+            if error is not None:
+                results.append(error)
+                continue
+            batch.append((line, entity_type, doc))
+            if len(batch) >= batch_size:
+                results.extend(_import_batch(batch).values())
+                batch = []
+        if batch:
+            results.extend(_import_batch(batch).values())
+
+        results.sort(key=lambda result: result["line"])
+        body = b"".join(dump_json(result) + b"\n" for result in results)
+        return Response(body, 200, mimetype=NDJSON)
+
+
+bulk_blueprint = Blueprint("bulk", __name__)
+Api(bulk_blueprint).add_resource(BulkImport, "/api/bulk/")
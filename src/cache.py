@@ -0,0 +1,82 @@
+from collections import OrderedDict
+import threading
+import time
+
+class ResponseCache(object):
+    """
+    A bounded least recently used cache with a time to live for rendered
+    response bodies. Every entry is tagged with the names of the tables it
+    was built from so that writes to a table can drop the entries that
+    depend on it. Keeps hit, miss, eviction and invalidation counters.
+    """
+
+    def __init__(self, max_entries=256, ttl=300, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        """
+        Returns the cached value for the key or None if there is no fresh
+        entry for it.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires, tags, value = entry
+            if expires <= self._clock():
+                del self._entries[key]
+                self.evictions += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, tags=()):
+        """
+        Stores a value with the names of the tables it depends on. The least
+        recently used entry is evicted when the cache is full.
+        """
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl, frozenset(tags), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, tags):
+        """
+        Drops every entry that depends on any of the given table names.
+        """
+        tags = set(tags)
+        with self._lock:
+            stale = [key for key, (expires, entry_tags, value) in self._entries.items()
+                     if entry_tags & tags]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+            }
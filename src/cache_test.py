@@ -0,0 +1,49 @@
+from cache import ResponseCache
+
+# a clock that the tests can move forward
+class _Clock(object):
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+# test that the least recently used entry is evicted
+def test_lru_eviction():
+    cache = ResponseCache(max_entries=2)
+    cache.set("a", b"1")
+    cache.set("b", b"2")
+    assert cache.get("a") == b"1"
+    cache.set("c", b"3")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1"
+    assert cache.get("c") == b"3"
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["size"] == 2
+
+# test that entries expire after the time to live
+def test_ttl():
+    clock = _Clock()
+    cache = ResponseCache(ttl=10, clock=clock)
+    cache.set("a", b"1")
+    clock.now = 9
+    assert cache.get("a") == b"1"
+    clock.now = 10
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["evictions"] == 1
+
+# test that invalidation drops only the entries of the given tables
+def test_invalidate():
+    cache = ResponseCache()
+    cache.set("projects", b"1", ["project", "members"])
+    cache.set("phases", b"2", ["project", "phase"])
+    cache.set("members", b"3", ["members"])
+    cache.invalidate(["members"])
+    assert cache.get("projects") is None
+    assert cache.get("members") is None
+    assert cache.get("phases") == b"2"
+    assert cache.stats()["invalidations"] == 2
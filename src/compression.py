@@ -0,0 +1,97 @@
+"""
+Response compression negotiated with Accept-Encoding. Brotli is used when
+the brotli package is installed and the client prefers it, gzip
+otherwise. Bodies smaller than COMPRESS_MIN_SIZE bytes are sent as they
+are, and streamed responses such as the export are compressed chunk by
+chunk while they are sent.
+
+Compressed responses get a weak ETag, so that a client revalidating a
+compressed copy still matches the ETag of the uncompressed one.
+"""
+import zlib
+
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = (
+    "application/vnd.mason+json",
+    "application/json",
+    "application/schema+json",
+    "application/x-ndjson",
+    )
+
+def _encodings():
+    if brotli is not None:
+        return ["br", "gzip"]
+    return ["gzip"]
+
+def _gzip_compressor(level):
+    # wbits 31 writes the gzip header and trailer
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress, compressor.flush
+
+def _brotli_compressor(quality):
+    compressor = brotli.Compressor(quality=quality)
+    return compressor.process, compressor.finish
+
+def _compressor(encoding):
+    """
+    Returns the (compress, finish) functions of a new compressor.
+    """
+    if encoding == "br":
+        return _brotli_compressor(current_app.config["COMPRESS_BROTLI_QUALITY"])
+    return _gzip_compressor(current_app.config["COMPRESS_LEVEL"])
+
+def _compress_chunks(chunks, compress, finish):
+    """
+    Yields the compressed chunks of a streamed body and closes the
+    original body when done.
+    """
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            data = compress(chunk)
+            if data:
+                yield data
+        yield finish()
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+
+def compress_response(response):
+    """
+    after_request function that compresses the response if the client
+    accepts a supported encoding.
+    """
+    if (response.status_code != 200
+            or response.direct_passthrough
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    encoding = request.accept_encodings.best_match(_encodings())
+    if encoding is None:
+        return response
+
+    compress, finish = _compressor(encoding)
+    if response.is_streamed:
+        response.response = _compress_chunks(response.response, compress, finish)
+        response.headers.pop("Content-Length", None)
+    else:
+        data = response.get_data()
+        if len(data) < current_app.config["COMPRESS_MIN_SIZE"]:
+            return response
+        response.set_data(compress(data) + finish())
+
+    response.headers["Content-Encoding"] = encoding
+    etag, weak = response.get_etag()
+    if etag is not None and not weak:
+        response.set_etag(etag, weak=True)
+    return response
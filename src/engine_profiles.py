@@ -0,0 +1,96 @@
+"""
+Dialect specific engine setup. The database is chosen with the URL in
+SQLALCHEMY_DATABASE_URI, and the connection pool is sized with
+DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT and DB_POOL_RECYCLE.
+
+SQLite file databases get a profile of PRAGMAs that is run on every new
+connection, selected with the SQLITE_PROFILE config key. PostgreSQL
+connections are checked with a ping before they are handed out.
+"""
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+SQLITE_PROFILES = {
+    # the old behaviour, rollback journal with a full fsync per commit
+    "safe": {
+        "foreign_keys": "ON",
+    },
+    # WAL lets readers continue while a writer commits and with
+    # synchronous=NORMAL fsyncs only happen at checkpoints. Writers wait
+    # for the lock for busy_timeout ms instead of failing right away.
+    "tuned": {
+        "foreign_keys": "ON",
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 5000,
+        "cache_size": -64000,
+        "mmap_size": 268435456,
+        "temp_store": "MEMORY",
+    },
+}
+
+def sqlite_engine_options(pool_size=5, max_overflow=10, pool_timeout=30):
+    """
+    Returns the create_engine options for a pooled SQLite file database.
+    Without a pool every checkout would open the database file again and
+    rerun the PRAGMAs. Connections are handed between threads by the pool,
+    so the same thread check of sqlite3 is turned off.
+    """
+    return {
+        "poolclass": QueuePool,
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": pool_timeout,
+        "connect_args": {"check_same_thread": False},
+    }
+
+def postgresql_engine_options(pool_size=5, max_overflow=10, pool_timeout=30, pool_recycle=1800):
+    """
+    Returns the create_engine options for PostgreSQL. Connections that the
+    server or a proxy closed are replaced before use.
+    """
+    return {
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": pool_timeout,
+        "pool_recycle": pool_recycle,
+        "pool_pre_ping": True,
+    }
+
+def apply_sqlite_pragmas(dbapi_connection, pragmas):
+    """
+    Runs the PRAGMAs of a profile on a new DBAPI connection.
+    """
+    cursor = dbapi_connection.cursor()
+    for name, value in pragmas.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+class ProfiledSQLAlchemy(SQLAlchemy):
+    """
+    Flask-SQLAlchemy with the engine set up for the dialect of the database
+    URL, instead of one connect listener for every Engine.
+    """
+
+    def apply_driver_hacks(self, app, sa_url, options):
+        pool = (app.config["DB_POOL_SIZE"], app.config["DB_MAX_OVERFLOW"], app.config["DB_POOL_TIMEOUT"])
+        if sa_url.drivername.startswith("sqlite"):
+            # in memory databases keep the single connection pool that
+            # Flask-SQLAlchemy gives them
+            if sa_url.database not in (None, "", ":memory:"):
+                options.update(sqlite_engine_options(*pool))
+        elif sa_url.drivername.startswith("postgres"):
+            options.update(postgresql_engine_options(*pool, app.config["DB_POOL_RECYCLE"]))
+        super().apply_driver_hacks(app, sa_url, options)
+
+    def create_engine(self, sa_url, engine_opts):
+        engine = super().create_engine(sa_url, engine_opts)
+        if engine.dialect.name == "sqlite":
+            pragmas = SQLITE_PROFILES[self.get_app().config["SQLITE_PROFILE"]]
+
+            @event.listens_for(engine, "connect")
+            def set_sqlite_pragma(dbapi_connection, connection_record):
+                apply_sqlite_pragmas(dbapi_connection, pragmas)
+
+        return engine
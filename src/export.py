@@ -0,0 +1,102 @@
+"""
+Streaming export of the whole project graph as newline delimited JSON. Every
+line is one project with its phases and its tasks, and every task lists the
+names of its members. The fields are formatted the same way as in the
+project, phase and task collections.
+
+The export runs four queries that are all ordered by project id and read
+with yield_per, which streams the rows from a server side cursor on
+PostgreSQL, and merges them project by project while the response is
+being sent. Only one project is kept in memory at a time.
+"""
+import itertools
+
+from flask import Blueprint, Response, stream_with_context
+from flask_restful import Api, Resource
+from sqlalchemy.orm import joinedload
+
+from app import db, ProjectBuilder, PhaseBuilder, TaskBuilder
+from models import *
+from utils import dump_json
+
+NDJSON = "application/x-ndjson"
+EXPORT_BATCH_SIZE = 1000
+
+class _ProjectGroups(object):
+    """
+    Reads rows that are ordered by project id and hands them out one
+    project at a time. Rows without a project are skipped.
+    """
+
+    def __init__(self, rows, project_id):
+        self._groups = itertools.groupby(rows, key=project_id)
+        self._current = next(self._groups, None)
+
+    def take(self, project_id):
+        """
+        Returns the rows of the given project. Projects must be asked for
+        in increasing id order.
+        """
+        while self._current is not None and (self._current[0] is None
+                                             or self._current[0] < project_id):
+            self._current = next(self._groups, None)
+        if self._current is None or self._current[0] != project_id:
+            return []
+        rows = list(self._current[1])
+        self._current = next(self._groups, None)
+        return rows
+
+def export_projects():
+    """
+    Yields the NDJSON lines of the export.
+    """
+    projects = Project.query.options(
+        joinedload(Project.project_manager)
+        ).order_by(Project.id).yield_per(EXPORT_BATCH_SIZE)
+    phases = _ProjectGroups(
+        Phase.query.order_by(Phase.project_id, Phase.name).yield_per(EXPORT_BATCH_SIZE),
+        lambda phase: phase.project_id
+        )
+    tasks = _ProjectGroups(
+        Tasks.query.options(
+            joinedload(Tasks.phase)
+            ).order_by(Tasks.project_id, Tasks.id).yield_per(EXPORT_BATCH_SIZE),
+        lambda task: task.project_id
+        )
+    members = _ProjectGroups(
+        db.session.query(Tasks.project_id, Teams.task_id, Members.name).join(
+            Teams, Teams.task_id == Tasks.id
+            ).join(
+            Members, Members.id == Teams.member_id
+            ).order_by(Tasks.project_id).yield_per(EXPORT_BATCH_SIZE),
+        lambda row: row[0]
+        )
+
+    for project in projects:
+        task_members = {}
+        for project_id, task_id, name in members.take(project.id):
+            task_members.setdefault(task_id, []).append(name)
+
+        line = ProjectBuilder.project_fields(project)
+        line["phases"] = [PhaseBuilder.phase_fields(phase) for phase in phases.take(project.id)]
+        line["tasks"] = []
+        for task in tasks.take(project.id):
+            fields = TaskBuilder.task_fields(task)
+            fields["members"] = sorted(task_members.get(task.id, []))
+            line["tasks"].append(fields)
+        yield dump_json(line) + b"\n"
+
+
+class Export(Resource):
+    """
+    class for exporting all projects
+    """
+    def get(self):
+        """
+        stream all projects with their phases, tasks and members
+        """
+        return Response(stream_with_context(export_projects()), 200, mimetype=NDJSON)
+
+
+export_blueprint = Blueprint("export", __name__)
+Api(export_blueprint).add_resource(Export, "/api/export/")
@@ -0,0 +1,180 @@
+"""
+Batched ingestion of hour entries. The body of a POST to /api/hours/ is a
+JSON array of entries:
+
+    [{"task": "...", "member": "...", "date": "YYYY-MM-DD", "time": 7.5}, ...]
+
+The whole array is checked against the compiled schema of the batch first,
+and the entries are only validated one by one when it fails. The task and
+member names of the batch are resolved with one IN query each, and the
+valid entries are inserted with one executemany in the transaction of the
+request. The project of an entry is the project of its task, and its cost
+is its time times the current hourly cost of the member, or the average
+hourly cost of the project if the member has none. The cost is stored with
+the entry, so the totals, the portfolio and the analytics all count the
+same cost. The entries are added to the hour and cost totals of their tasks
+and projects in the same transaction.
+
+The response has the status of every entry in the order they were sent.
+An entry that fails does not stop the others.
+"""
+import datetime
+
+from flask import Blueprint, current_app, request
+from flask_restful import Api, Resource
+
+from app import db
+from models import *
+from utils import (MasonBuilder, SchemaValidator, ValidationError, create_error_response,
+                   mason_response)
+
+
+class HoursBuilder(MasonBuilder):
+
+    @staticmethod
+    def hours_schema():
+        schema = {
+            "type": "object",
+            "required": ["task", "member", "date", "time"]
+            }
+        props = schema["properties"] = {}
+        props["task"] = {
+            "description": "Name of the task",
+            "type": "string"
+            }
+        props["member"] = {
+            "description": "Name of the member who did the work",
+            "type": "string"
+            }
+        props["date"] = {
+            "description": "Date of the work",
+            "type": "string",
+            "pattern": "^[0-9]{4}-[01][0-9]-[0-3][0-9]$"
+            }
+        props["time"] = {
+            "description": "Hours worked",
+            "type": "number",
+            "minimum": 0,
+            "maximum": 24
+            }
+        return schema
+
+    @staticmethod
+    def hours_list_schema():
+        return {
+            "type": "array",
+            "items": HoursBuilder.hours_schema()
+            }
+
+
+HOURS_VALIDATOR = SchemaValidator(HoursBuilder.hours_schema)
+HOURS_LIST_VALIDATOR = SchemaValidator(HoursBuilder.hours_list_schema)
+
+def _validate_entries(entries):
+    """
+    Returns the validation error message of every entry that is not valid
+    as a dict keyed by the index of the entry.
+    """
+    try:
+        HOURS_LIST_VALIDATOR.validate(entries)
+        return {}
+    except ValidationError:
+        pass
+    errors = {}
+    for index, entry in enumerate(entries):
+        try:
+            HOURS_VALIDATOR.validate(entry)
+        except ValidationError as e:
+            errors[index] = str(e.message)
+    return errors
+
+def ingest_hours(entries):
+    """
+    Inserts the valid entries in the current transaction and returns the
+    result of every entry.
+    """
+    results = [{"index": index, "status": 201} for index in range(len(entries))]
+    errors = _validate_entries(entries)
+    for index, message in errors.items():
+        results[index].update(status=400, message=message)
+    valid = [(index, entry) for index, entry in enumerate(entries) if index not in errors]
+
+    task_names = {entry["task"] for index, entry in valid}
+    member_names = {entry["member"] for index, entry in valid}
+    tasks = {}
+    if task_names:
+        rows = db.session.query(
+            Tasks.name, Tasks.id, Tasks.project_id, Project.avg_hourly_cost
+            ).outerjoin(
+            Project, Project.id == Tasks.project_id
+            ).filter(Tasks.name.in_(task_names))
+        tasks = {name: (task_id, project_id, avg_hourly_cost)
+                 for name, task_id, project_id, avg_hourly_cost in rows}
+    members = {}
+    if member_names:
+        members = {name: (member_id, hourly_cost) for name, member_id, hourly_cost in db.session.query(
+            Members.name, Members.id, Members.hourly_cost
+            ).filter(Members.name.in_(member_names))}
+
+    rows = []
+    for index, entry in valid:
+        if entry["task"] not in tasks:
+            results[index].update(status=404, message=f"Task with name {entry['task']} not found")
+            continue
+        if entry["member"] not in members:
+            results[index].update(status=404, message=f"member {entry['member']} not in database")
+            continue
+        try:
+            date = datetime.datetime.strptime(entry["date"], "%Y-%m-%d")
+        except ValueError as e:
+            results[index].update(status=400, message=str(e))
+            continue
+        task_id, project_id, avg_hourly_cost = tasks[entry["task"]]
+        member_id, hourly_cost = members[entry["member"]]
+        if hourly_cost is None:
+            hourly_cost = avg_hourly_cost
+        rows.append({
+            "task_id": task_id,
+            "project_id": project_id,
+            "employee_id": member_id,
+            "date": date,
+            "time": entry["time"],
+            "cost": None if hourly_cost is None else entry["time"] * hourly_cost,
+            })
+
+    if rows:
+        db.session.execute(Hours.__table__.insert(), rows)
+        mark_tables_changed(db.session, [Hours.__table__.name])
+        add_to_totals(db.session, [(row["task_id"], row["project_id"], row["time"], row["cost"])
+                                   for row in rows])
+    return results
+
+
+class HoursCollection(Resource):
+    """
+    class for ingesting hour entries
+    """
+    def post(self):
+        """
+        add a batch of hour entries
+        """
+        if request.json is None:
+            return create_error_response(415, "Unsupported media type",
+                                         "Requests must be JSON")
+        if not isinstance(request.json, list):
+            return create_error_response(400, "Invalid JSON document",
+                                         "The body must be an array of hour entries")
+        max_entries = current_app.config["HOURS_MAX_ENTRIES"]
+        if len(request.json) > max_entries:
+            return create_error_response(413, "Too many entries",
+                                         f"A batch can have at most {max_entries} entries")
+
+        results = ingest_hours(request.json)
+        body = HoursBuilder(items=results)
+        body.add_control("self", api.url_for(HoursCollection))
+        return mason_response(body)
+
+
+hours_blueprint = Blueprint("hours", __name__)
+api = Api(hours_blueprint)
+api.add_resource(HoursCollection, "/api/hours/")
@@ -0,0 +1,74 @@
+"""
+Brings an existing database up to date with the columns and indexes
+defined in models.py. db.create_all() only creates missing tables, so
+databases that were created before the columns or indexes were added need
+this once:
+
+    python migrate.py
+
+The database is taken from the DATABASE_URL environment variable or the
+default configuration in app.py.
+"""
+from sqlalchemy import inspect
+from sqlalchemy.schema import CreateColumn
+
+from app import create_app, db
+from models import *
+
+def remove_duplicate_teams():
+    """
+    Removes duplicate task memberships so that the unique index on
+    (task_id, member_id) can be created. The oldest row is kept.
+    """
+    keep = db.session.query(db.func.min(Teams.id)).filter(
+        Teams.task_id.isnot(None),
+        Teams.member_id.isnot(None)
+        ).group_by(Teams.task_id, Teams.member_id)
+    removed = Teams.query.filter(
+        Teams.task_id.isnot(None),
+        Teams.member_id.isnot(None),
+        ~Teams.id.in_(keep)
+        ).delete(synchronize_session=False)
+    db.session.commit()
+    return removed
+
+def add_missing_columns():
+    """
+    Adds the nullable columns defined in the models that are missing from
+    their tables. Returns the names of the added columns as table.column.
+    """
+    inspector = inspect(db.engine)
+    added = []
+    for table in db.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing and column.nullable:
+                ddl = CreateColumn(column).compile(dialect=db.engine.dialect)
+                db.engine.execute(f"ALTER TABLE {table.name} ADD COLUMN {ddl}")
+                added.append(f"{table.name}.{column.name}")
+    return added
+
+def upgrade():
+    """
+    Adds the missing columns and creates every index defined in the models
+    that is missing from the database, and seeds the missing table version
+    rows. Returns the names of the created columns and indexes.
+    """
+    created = add_missing_columns()
+    remove_duplicate_teams()
+    with db.engine.begin() as connection:
+        seed_table_versions(connection)
+    inspector = inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(db.engine)
+                created.append(index.name)
+    return created
+
+if __name__ == "__main__":
+    with create_app().app_context():
+        db.create_all()
+        for name in upgrade():
+            print(f"created {name}")
@@ -1,10 +1,11 @@
-from flask import Flask
-from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy.engine import Engine
-from sqlalchemy import event
+from sqlalchemy import Float, and_, bindparam, case, cast, event, func, inspect, select
+from sqlalchemy.dialects import postgresql
 import datetime
 import enum
-from app import db
+from engine_profiles import ProfiledSQLAlchemy
+
+# bound to an application by create_app() in app.py
+db = ProfiledSQLAlchemy()
 
 class status_type(enum.Enum):
     NOT_STARTED = "not started"
@@ -15,16 +16,29 @@ class Project(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(64), nullable=False, unique=True)
     start = db.Column(db.DateTime, default=datetime.datetime.today().date(), nullable=True)
-    end = db.Column(db.DateTime, db.CheckConstraint("start <= end"), nullable=True)
-    project_manager_id = db.Column(db.Integer, db.ForeignKey("members.id", ondelete="SET NULL", onupdate="CASCADE"), nullable=True)
+    end = db.Column(db.DateTime, db.CheckConstraint('start <= "end"'), nullable=True)
+    budget = db.Column(db.Float, db.CheckConstraint("budget >= 0"), nullable=True)
+    avg_hourly_cost = db.Column(db.Float, db.CheckConstraint("avg_hourly_cost >= 0"), nullable=True)
+    # kept up to date by add_to_totals() and rebuilt by rollups.py
+    total_hours = db.Column(db.Float, default=0, nullable=True)
+    total_costs = db.Column(db.Float, default=0, nullable=True)
+    project_manager_id = db.Column(db.Integer, db.ForeignKey("members.id", ondelete="SET NULL", onupdate="CASCADE"), nullable=True, index=True)
 
     status = db.Column(db.Enum(status_type), default=status_type.NOT_STARTED, nullable=False)
     tasks = db.relationship("Tasks", back_populates="project")
     phases = db.relationship("Phase", back_populates="project")
     project_manager = db.relationship("Members", back_populates="managed_project")
+    # the foreign keys of the hours are set to NULL by the database
+    hours = db.relationship("Hours", back_populates="project", passive_deletes=True)
+    costs = db.relationship("Costs", back_populates="project", passive_deletes=True)
 
 
 class Phase(db.Model):
+    __table_args__ = (
+        db.Index("ix_phase_project_id_name", "project_id", "name"),
+        db.Index("ix_phase_deadline", "deadline"),
+        )
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(64), default="hankesuunnittelu", nullable=False)
  
@@ -35,34 +49,376 @@ class Phase(db.Model):
 
     project = db.relationship("Project", back_populates="phases")
     task = db.relationship("Tasks", back_populates="phase")
+    costs = db.relationship("Costs", back_populates="phase", passive_deletes=True)
+
+class Costs(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    project_id = db.Column(db.Integer, db.ForeignKey("project.id", ondelete="SET NULL", onupdate="CASCADE"), index=True)
+    phase_id = db.Column(db.Integer, db.ForeignKey("phase.id", ondelete="SET NULL", onupdate="CASCADE"), index=True)
+    name = db.Column(db.String(64), nullable=False)
+    description = db.Column(db.String(64), nullable=True)
+    hourly_price = db.Column(db.Float, db.CheckConstraint("hourly_price >= 0"), nullable=True)
+    quantity = db.Column(db.Float, db.CheckConstraint("quantity >= 0"), nullable=True)
+    total_costs = db.column_property(hourly_price * quantity)
+
+    project = db.relationship("Project", back_populates="costs")
+    phase = db.relationship("Phase", back_populates="costs")
 
 class Members(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(64), nullable=False, unique=True)
+    hourly_cost = db.Column(db.Float, db.CheckConstraint("hourly_cost >= 0"), nullable=True)
 
     managed_project = db.relationship("Project", back_populates="project_manager")
     membership = db.relationship("Teams", back_populates="team_members")
+    hours = db.relationship("Hours", back_populates="employee", passive_deletes=True)
 
 
 class Tasks(db.Model):
+    __table_args__ = (
+        db.Index("ix_tasks_project_id_phase_id", "project_id", "phase_id"),
+        # date range overlap queries scan the tasks that end after the
+        # start of the range and check the start from the index
+        db.Index("ix_tasks_end_start", "end", "start"),
+        )
+
     id = db.Column(db.Integer, primary_key=True)
     project_id = db.Column(db.Integer, db.ForeignKey("project.id", ondelete="SET NULL", onupdate="CASCADE"))
-    phase_id = db.Column(db.Integer, db.ForeignKey("phase.id", ondelete="SET NULL", onupdate="CASCADE"))
+    phase_id = db.Column(db.Integer, db.ForeignKey("phase.id", ondelete="SET NULL", onupdate="CASCADE"), index=True)
     name = db.Column(db.String(64), nullable=False, unique=True)
+    total_hours = db.Column(db.Float, default=0, nullable=True)
+    total_cost = db.Column(db.Float, default=0, nullable=True)
     start = db.Column(db.DateTime, default=datetime.datetime.today().date(), nullable=True)
-    end = db.Column(db.DateTime, db.CheckConstraint("start <= end"), nullable=True)
+    end = db.Column(db.DateTime, db.CheckConstraint('start <= "end"'), nullable=True)
 
     status = db.Column(db.Enum(status_type))
     project = db.relationship("Project", back_populates="tasks")
     team = db.relationship("Teams", back_populates="team_tasks")
     phase = db.relationship("Phase", back_populates="task")
+    hours = db.relationship("Hours", back_populates="task", passive_deletes=True)
 
 
 class Teams(db.Model):
+    __table_args__ = (db.Index("ix_teams_task_id_member_id", "task_id", "member_id", unique=True),)
+
     id = db.Column(db.Integer, primary_key=True)
 
     task_id = db.Column(db.Integer, db.ForeignKey("tasks.id", ondelete="SET NULL", onupdate="CASCADE"))
-    member_id = db.Column(db.Integer, db.ForeignKey("members.id", ondelete="SET NULL", onupdate="CASCADE"))
+    member_id = db.Column(db.Integer, db.ForeignKey("members.id", ondelete="SET NULL", onupdate="CASCADE"), index=True)
 
     team_members = db.relationship("Members", back_populates="membership")
     team_tasks = db.relationship("Tasks", back_populates="team")
+
+
+class Hours(db.Model):
+    __table_args__ = (db.Index("ix_hours_project_id_date", "project_id", "date"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    task_id = db.Column(db.Integer, db.ForeignKey("tasks.id", ondelete="SET NULL", onupdate="CASCADE"), index=True)
+    project_id = db.Column(db.Integer, db.ForeignKey("project.id", ondelete="SET NULL", onupdate="CASCADE"))
+    employee_id = db.Column(db.Integer, db.ForeignKey("members.id", ondelete="SET NULL", onupdate="CASCADE"), index=True)
+    date = db.Column(db.DateTime, nullable=False)
+    time = db.Column(db.Float, db.CheckConstraint("time >= 0"), nullable=False)
+    # time times the hourly cost of the member when the hours were logged
+    cost = db.Column(db.Float, db.CheckConstraint("cost >= 0"), nullable=True)
+
+    project = db.relationship("Project", back_populates="hours")
+    task = db.relationship("Tasks", back_populates="hours")
+    employee = db.relationship("Members", back_populates="hours")
+
+
+class ProjectSummary(db.Model):
+    """
+    The fields of the portfolio report, one row per project. The rows of
+    the projects that a transaction changed are rebuilt when it commits,
+    see refresh_project_summaries().
+    """
+    __tablename__ = "project_summary"
+    __table_args__ = (
+        db.Index("ix_project_summary_status_name", "status", "name"),
+        db.Index("ix_project_summary_completion_name", "completion", "name"),
+        db.Index("ix_project_summary_total_hours_name", "total_hours", "name"),
+        db.Index("ix_project_summary_total_costs_name", "total_costs", "name"),
+        )
+
+    project_id = db.Column(db.Integer, db.ForeignKey("project.id", ondelete="CASCADE"), primary_key=True)
+    name = db.Column(db.String(64), nullable=False, unique=True)
+    status = db.Column(db.Enum(status_type), nullable=False)
+    project_manager_id = db.Column(db.Integer, nullable=True)
+    budget = db.Column(db.Float, nullable=True)
+    phase_count = db.Column(db.Integer, nullable=False)
+    task_count = db.Column(db.Integer, nullable=False)
+    finished_tasks = db.Column(db.Integer, nullable=False)
+    # finished_tasks / task_count, NULL for projects without tasks
+    completion = db.Column(db.Float, nullable=True)
+    total_hours = db.Column(db.Float, nullable=False)
+    total_costs = db.Column(db.Float, nullable=False)
+
+
+class TableVersion(db.Model):
+    name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+def seed_table_versions(connection):
+    """
+    Adds the missing version rows of every table with version 0, so that a
+    bump is a plain UPDATE and concurrent first writers do not race to
+    insert the same row. Called when the table is created and by
+    migrate.py.
+    """
+    table = TableVersion.__table__
+    existing = {name for name, in connection.execute(select([table.c.name]))}
+    rows = [{"name": name, "version": 0} for name in db.metadata.tables
+            if name != table.name and name not in existing]
+    if rows:
+        connection.execute(table.insert(), rows)
+
+
+@event.listens_for(TableVersion.__table__, "after_create")
+def _seed_created_table_versions(target, connection, **kw):
+    seed_table_versions(connection)
+
+
+def bump_table_versions(connection, names):
+    """
+    Increases the version counter of the given tables by one. Runs on the
+    connection of the current transaction so that the new versions become
+    visible together with the changes. The rows are updated in name order
+    so that concurrent transactions lock them in the same order.
+    """
+    table = TableVersion.__table__
+    for name in sorted(names):
+        result = connection.execute(
+            table.update().where(table.c.name == name).values(version=table.c.version + 1)
+            )
+        if result.rowcount == 0:
+            # a table that was not seeded, e.g. before migrate.py was run
+            if connection.dialect.name == "postgresql":
+                connection.execute(postgresql.insert(table).values(name=name, version=1).on_conflict_do_update(
+                    index_elements=[table.c.name], set_={"version": table.c.version + 1}
+                    ))
+            else:
+                connection.execute(table.insert().values(name=name, version=1))
+
+
+def get_table_versions(*models):
+    """
+    Returns the current version counters of the tables of the given models
+    as a tuple in the same order. Tables that were never written have
+    version 0.
+    """
+    names = [model.__table__.name for model in models]
+    versions = dict(
+        db.session.query(TableVersion.name, TableVersion.version).filter(
+            TableVersion.name.in_(names)
+            )
+        )
+    return tuple(versions.get(name, 0) for name in names)
+
+
+def mark_tables_changed(session, names):
+    """
+    Remembers the given tables as changed in the session's transaction.
+    Their version counters are bumped once when the transaction commits,
+    and cached responses built from them are dropped after the commit.
+    Flushes and bulk query updates call this automatically, Core
+    statements executed directly must call it.
+
+    Bumping at commit instead of at every flush keeps the row locks of the
+    version counters only for the commit itself. Writers to the same table
+    still take turns on its counter row while they commit, which is the
+    price of versions that change together with the data.
+    """
+    names = set(names) - {TableVersion.__table__.name}
+    if names:
+        session.info.setdefault("changed_tables", set()).update(names)
+
+
+@event.listens_for(db.session, "after_flush")
+def _bump_flushed_tables(session, flush_context):
+    objects = list(session.new) + list(session.deleted) + [
+        obj for obj in session.dirty if session.is_modified(obj)
+        ]
+    mark_tables_changed(session, {type(obj).__table__.name for obj in objects})
+
+
+@event.listens_for(db.session, "after_bulk_update")
+@event.listens_for(db.session, "after_bulk_delete")
+def _bump_bulk_tables(context):
+    mark_tables_changed(context.session, [context.primary_table.name])
+
+
+@event.listens_for(db.session, "after_rollback")
+def _forget_changed_tables(session):
+    session.info.pop("changed_tables", None)
+    session.info.pop("changed_projects", None)
+
+
+def _add_statement(table, hours_column, cost_column):
+    return table.update().where(table.c.id == bindparam("key")).values({
+        hours_column: func.coalesce(table.c[hours_column], 0) + bindparam("hours"),
+        cost_column: func.coalesce(table.c[cost_column], 0) + bindparam("cost"),
+        })
+
+
+def add_to_totals(session, changes):
+    """
+    Adds hour and cost changes to the totals of their tasks and projects in
+    the session's transaction, with one executemany per table. The changes
+    are (task_id, project_id, hours, cost) tuples with negative values for
+    removed rows. Flushed Hours and Costs objects are added automatically,
+    rows written with Core statements must be passed here.
+    """
+    tasks, projects = {}, {}
+    for task_id, project_id, hours, cost in changes:
+        for totals, key in ((tasks, task_id), (projects, project_id)):
+            if key is not None:
+                total = totals.setdefault(key, [0.0, 0.0])
+                total[0] += hours or 0
+                total[1] += cost or 0
+
+    changed = []
+    for table, totals, hours_column, cost_column in (
+            (Tasks.__table__, tasks, "total_hours", "total_cost"),
+            (Project.__table__, projects, "total_hours", "total_costs")):
+        rows = [{"key": key, "hours": hours, "cost": cost}
+                for key, (hours, cost) in sorted(totals.items()) if hours or cost]
+        if rows:
+            session.connection().execute(_add_statement(table, hours_column, cost_column), rows)
+            changed.append(table.name)
+    mark_tables_changed(session, changed)
+    mark_projects_changed(session, projects)
+
+
+def _value(obj, name, old):
+    if old:
+        history = inspect(obj).attrs[name].history
+        if history.has_changes():
+            return history.deleted[0] if history.deleted else None
+    return getattr(obj, name)
+
+
+def _totals_change(obj, sign, old=False):
+    """
+    Returns the change that an Hours or Costs object makes to the totals,
+    with its values from before the flush if old is true.
+    """
+    if isinstance(obj, Hours):
+        task_id = _value(obj, "task_id", old)
+        hours, cost = _value(obj, "time", old), _value(obj, "cost", old)
+    else:
+        task_id, hours = None, 0
+        price, quantity = _value(obj, "hourly_price", old), _value(obj, "quantity", old)
+        cost = (price or 0) * (quantity or 0)
+    return task_id, _value(obj, "project_id", old), sign * (hours or 0), sign * (cost or 0)
+
+
+@event.listens_for(db.session, "after_flush")
+def _add_flushed_totals(session, flush_context):
+    changes = []
+    for obj in session.new:
+        if isinstance(obj, (Hours, Costs)):
+            changes.append(_totals_change(obj, 1))
+    for obj in session.deleted:
+        if isinstance(obj, (Hours, Costs)):
+            changes.append(_totals_change(obj, -1))
+    for obj in session.dirty:
+        if isinstance(obj, (Hours, Costs)) and session.is_modified(obj):
+            changes.append(_totals_change(obj, -1, old=True))
+            changes.append(_totals_change(obj, 1))
+    if changes:
+        add_to_totals(session, changes)
+
+
+# the number of project ids in one IN list of a summary refresh
+SUMMARY_REFRESH_BATCH = 500
+
+def mark_projects_changed(session, project_ids):
+    """
+    Remembers the projects whose summaries are rebuilt when the session's
+    transaction is committed. Flushes and add_to_totals() call this
+    automatically, Core statements that write projects, phases or tasks
+    must call it.
+    """
+    project_ids = {project_id for project_id in project_ids if project_id is not None}
+    if project_ids:
+        session.info.setdefault("changed_projects", set()).update(project_ids)
+
+
+def _summary_select():
+    phase_count = select([func.count(Phase.id)]).where(Phase.project_id == Project.id).as_scalar()
+    task_count = select([func.count(Tasks.id)]).where(Tasks.project_id == Project.id).as_scalar()
+    finished_tasks = select([func.count(Tasks.id)]).where(
+        and_(Tasks.project_id == Project.id, Tasks.status == status_type.FINISHED)
+        ).as_scalar()
+    return select([
+        Project.id,
+        Project.name,
+        Project.status,
+        Project.project_manager_id,
+        Project.budget,
+        phase_count,
+        task_count,
+        finished_tasks,
+        case([(task_count > 0, cast(finished_tasks, Float) / task_count)], else_=None),
+        func.coalesce(Project.total_hours, 0),
+        func.coalesce(Project.total_costs, 0),
+        ])
+
+
+def refresh_project_summaries(session, project_ids=None):
+    """
+    Rebuilds the summary rows of the given projects, or of every project,
+    with one DELETE and one INSERT ... SELECT per batch of ids. The phase
+    and task counts are read on the project_id indexes of the phases and
+    tasks.
+    """
+    summary = ProjectSummary.__table__
+    columns = [column.name for column in summary.columns]
+    connection = session.connection()
+    if project_ids is None:
+        connection.execute(summary.delete())
+        connection.execute(summary.insert().from_select(columns, _summary_select()))
+    else:
+        project_ids = sorted(project_ids)
+        for first in range(0, len(project_ids), SUMMARY_REFRESH_BATCH):
+            batch = project_ids[first:first + SUMMARY_REFRESH_BATCH]
+            connection.execute(summary.delete().where(summary.c.project_id.in_(batch)))
+            connection.execute(summary.insert().from_select(
+                columns, _summary_select().where(Project.id.in_(batch))
+                ))
+    mark_tables_changed(session, [summary.name])
+
+
+@event.listens_for(db.session, "after_flush")
+def _mark_flushed_projects(session, flush_context):
+    project_ids = []
+    objects = list(session.new) + list(session.deleted) + [
+        obj for obj in session.dirty if session.is_modified(obj)
+        ]
+    for obj in objects:
+        if isinstance(obj, Project):
+            project_ids.append(obj.id)
+        elif isinstance(obj, (Phase, Tasks)):
+            project_ids.append(_value(obj, "project_id", False))
+            project_ids.append(_value(obj, "project_id", True))
+    mark_projects_changed(session, project_ids)
+
+
+@event.listens_for(db.session, "before_commit")
+def _refresh_changed_summaries(session):
+    # the last flush runs after before_commit, so it is done here first
+    session.flush()
+    project_ids = session.info.pop("changed_projects", None)
+    if project_ids:
+        refresh_project_summaries(session, project_ids)
+
+
+# registered after _refresh_changed_summaries so that it also bumps the
+# tables written by the last flush and the summary refresh
+@event.listens_for(db.session, "before_commit")
+def _bump_changed_tables(session):
+    changed = session.info.get("changed_tables")
+    if changed:
+        bump_table_versions(session.connection(), changed)
@@ -0,0 +1,104 @@
+"""
+Portfolio report of every project at /api/portfolio/. The items have the
+status, manager, budget, phase and task counts, task completion ratio and
+the hour and cost totals of the projects.
+
+The report is read from the project_summary table, whose rows are rebuilt
+when a transaction that changed a project or its phases, tasks, hours or
+costs commits. A page is one indexed read of that table joined with the
+managers, instead of reading the phases and tasks of every project.
+"""
+from flask import Blueprint, request
+from flask_restful import Api, Resource
+
+from app import (api, db, conditional, apply_keyset, parse_limit_arg, parse_status_args,
+                 ProjectBuilder, ProjectCollection)
+from models import *
+from utils import MasonBuilder, LINK_RELATIONS_URL, create_error_response, mason_response
+
+
+class Portfolio(Resource):
+    """
+    class for the portfolio report
+    """
+
+    SORT_COLUMNS = {
+        "name": ProjectSummary.name,
+        "status": ProjectSummary.status,
+        "completion": ProjectSummary.completion,
+        "total_hours": ProjectSummary.total_hours,
+        "total_costs": ProjectSummary.total_costs,
+        }
+
+    @conditional(ProjectSummary, Members, cached=True)
+    def get(self):
+        """
+        get one page of the portfolio report. Supports the limit, after,
+        sort (name, status, completion, total_hours or total_costs,
+        prefixed with - for descending order) and status query parameters.
+        """
+        try:
+            limit = parse_limit_arg()
+            statuses = parse_status_args()
+        except ValueError as e:
+            return create_error_response(400, "Invalid query parameter", str(e))
+
+        sort = request.args.get("sort", "name")
+        descending = sort.startswith("-")
+        sort_column = self.SORT_COLUMNS.get(sort.lstrip("-"))
+        if sort_column is None:
+            return create_error_response(400, "Invalid query parameter",
+                                         f"cannot sort by '{sort}'")
+
+        cursor = None
+        after = request.args.get("after")
+        if after is not None:
+            cursor = db.session.query(sort_column, ProjectSummary.name).filter(
+                ProjectSummary.name == after
+                ).first()
+            if cursor is None:
+                return create_error_response(400, "Invalid query parameter",
+                                             f"no project with name '{after}' to continue from")
+
+        query = db.session.query(ProjectSummary, Members.name).outerjoin(
+            Members, Members.id == ProjectSummary.project_manager_id
+            )
+        if statuses:
+            query = query.filter(ProjectSummary.status.in_(statuses))
+        query = apply_keyset(query, sort_column, ProjectSummary.name, cursor, descending)
+        rows = query.limit(limit + 1).all()
+        has_next = len(rows) > limit
+        rows = rows[:limit]
+
+        body = MasonBuilder()
+        body.add_namespace("promana", LINK_RELATIONS_URL)
+        body.add_control("self", portfolio_api.url_for(Portfolio))
+        body.add_control("collection", api.url_for(ProjectCollection))
+        if has_next:
+            query_args = {key: values for key, values in request.args.lists() if key != "after"}
+            query_args["limit"] = limit
+            body.add_control("next", portfolio_api.url_for(Portfolio, after=rows[-1][0].name, **query_args))
+        body["items"] = []
+
+        for summary, manager in rows:
+            item = ProjectBuilder(
+                name=summary.name,
+                status=str(summary.status.value),
+                project_manager=manager,
+                budget=summary.budget,
+                phase_count=summary.phase_count,
+                task_count=summary.task_count,
+                finished_tasks=summary.finished_tasks,
+                completion=summary.completion,
+                total_hours=summary.total_hours,
+                total_costs=summary.total_costs,
+                )
+            item.add_control_project(summary.name)
+            body["items"].append(item)
+
+        return mason_response(body)
+
+
+portfolio_blueprint = Blueprint("portfolio", __name__)
+portfolio_api = Api(portfolio_blueprint)
+portfolio_api.add_resource(Portfolio, "/api/portfolio/")
@@ -0,0 +1,116 @@
+import re
+import pytest
+from sqlalchemy import event
+
+import migrate
+from app import db
+from models import *
+from resource_test import app, client, TEST_DATABASE_URL
+
+# the plans are read with EXPLAIN QUERY PLAN
+pytestmark = pytest.mark.skipif(TEST_DATABASE_URL is not None, reason="SQLite only")
+
+# a plan step that reads the whole table without an index
+FULL_SCAN = re.compile(r"^SCAN (\w+)$")
+
+# records the statements and parameters sent to the database
+class _StatementRecorder(object):
+
+    def __enter__(self):
+        self.statements = []
+        event.listen(db.engine, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *args):
+        event.remove(db.engine, "before_cursor_execute", self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            self.statements.append((statement, parameters))
+
+# get the query plan details of a statement
+def _explain(statement, parameters):
+    conn = db.engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+        return [row[-1] for row in cursor.fetchall()]
+    finally:
+        conn.close()
+
+# get the full table scans of every query made during a request
+def _full_scans(client, method, url):
+    with _StatementRecorder() as recorder:
+        resp = client.open(url, method=method)
+    assert resp.status_code < 400
+    assert recorder.statements
+    scans = []
+    for statement, parameters in recorder.statements:
+        for detail in _explain(statement, parameters):
+            match = FULL_SCAN.match(detail)
+            if match:
+                scans.append((match.group(1), statement))
+    return scans
+
+@pytest.mark.parametrize("method, url", [
+    ("GET", "/api/projects/"),
+    ("GET", "/api/projects/?project_manager=test-member-1"),
+    ("GET", "/api/projects/projekti1/"),
+    ("GET", "/api/projects/projekti1/members/"),
+    ("GET", "/api/projects/projekti1/members/test-member-1/"),
+    ("GET", "/api/projects/projekti1/phases/"),
+    ("GET", "/api/projects/projekti1/phases/phase2/tasks/"),
+    ("GET", "/api/projects/projekti1/phases/WHOLE_PROJECT/tasks/"),
+    ("GET", "/api/projects/projekti1/phases/phase1/tasks/task1/members/"),
+    ("DELETE", "/api/projects/projekti1/phases/phase1/tasks/task1/members/test-member-1/"),
+    ("DELETE", "/api/projects/projekti1/members/test-member-1/"),
+    ("GET", "/api/members/test-member-1/"),
+    ("GET", "/api/projects/projekti1/analytics/"),
+    ("GET", "/api/portfolio/"),
+    ("GET", "/api/portfolio/?sort=-total_costs&after=projekti1"),
+    ("GET", "/api/timeline/?from=2021-06-01&to=2021-07-01"),
+])
+def test_hot_lookups_use_indexes(client, method, url):
+    assert _full_scans(client, method, url) == []
+
+# test that the timeline reads the tasks that end in the range and the open-ended ones on the (end, start) index
+def test_timeline_uses_task_date_index(client):
+    with _StatementRecorder() as recorder:
+        resp = client.get("/api/timeline/?from=2021-06-01&to=2021-07-01")
+    assert resp.status_code == 200
+    plans = [_explain(statement, parameters) for statement, parameters in recorder.statements
+             if "FROM tasks" in statement]
+    assert len(plans) == 1
+    searches = [detail for detail in plans[0] if detail.startswith("SEARCH tasks")]
+    assert len(searches) == 2
+    assert all("USING INDEX ix_tasks_end_start" in detail for detail in searches)
+
+# test that the migration restores missing indexes on an existing database
+def test_migration(client):
+    db.engine.execute("DROP INDEX ix_teams_task_id_member_id")
+    db.engine.execute("DROP INDEX ix_tasks_project_id_phase_id")
+    team = Teams.query.first()
+    db.engine.execute("INSERT INTO teams (task_id, member_id) VALUES (?, ?)",
+                      team.task_id, team.member_id)
+    teams = Teams.query.count()
+
+    created = migrate.upgrade()
+    assert sorted(created) == ["ix_tasks_project_id_phase_id", "ix_teams_task_id_member_id"]
+    assert Teams.query.count() == teams - 1
+    assert migrate.upgrade() == []
+
+# test that the migration seeds the missing table version rows
+def test_migration_table_versions(client):
+    TableVersion.query.filter_by(name=Hours.__table__.name).delete()
+    db.session.commit()
+    assert migrate.upgrade() == []
+    assert TableVersion.query.filter_by(name=Hours.__table__.name).first().version == 0
+
+# test that the migration adds the columns that are missing from a table
+def test_migration_columns(client):
+    db.engine.execute("ALTER TABLE members DROP COLUMN hourly_cost")
+    assert migrate.upgrade() == ["members.hourly_cost"]
+    Members.query.filter_by(name="test-member-1").update({"hourly_cost": 50.0})
+    db.session.commit()
+    assert Members.query.filter_by(name="test-member-1").first().hourly_cost == 50.0
+    assert migrate.upgrade() == []
@@ -3,30 +3,48 @@ import os
 import pytest
 import tempfile
 import time
+import zlib
 from datetime import datetime
 from jsonschema import validate
 from sqlalchemy.engine import Engine
 from sqlalchemy import event
 from sqlalchemy.exc import IntegrityError, StatementError
 
-from app import app, db
+import rollups
+from app import create_app, db, response_cache
 from models import *
 
+# run the tests against another database, e.g. a local PostgreSQL server,
+# instead of a temporary SQLite file
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+
+app = create_app({"TESTING": True})
+# lets the tests use the models outside of a request
+db.app = app
+
 
 @pytest.fixture
 def client():
-    db_fd, db_fname = tempfile.mkstemp()
-    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///" + db_fname
-    app.config["TESTING"] = True
+    if TEST_DATABASE_URL:
+        app.config["SQLALCHEMY_DATABASE_URI"] = TEST_DATABASE_URL
+        db.drop_all()
+    else:
+        db_fd, db_fname = tempfile.mkstemp()
+        app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///" + db_fname
 
     db.create_all()
     _populate_db()
+    response_cache.clear()
 
     yield app.test_client()
 
     db.session.remove()
-    os.close(db_fd)
-    os.unlink(db_fname)
+    if TEST_DATABASE_URL:
+        db.drop_all()
+    db.engine.dispose()
+    if not TEST_DATABASE_URL:
+        os.close(db_fd)
+        os.unlink(db_fname)
 
 # function to populate the database
 def _populate_db():
@@ -139,6 +157,33 @@ def _get_task_json(number=1):
         "task_status": "NOT_STARTED"
     }
 
+# context manager that counts the SQL statements sent to the database
+class _QueryCounter(object):
+
+    def __enter__(self):
+        self.count = 0
+        self.statements = []
+        event.listen(db.engine, "before_cursor_execute", self._count)
+        return self
+
+    def __exit__(self, *args):
+        event.remove(db.engine, "before_cursor_execute", self._count)
+
+    def _count(self, conn, cursor, statement, *args):
+        self.count += 1
+        self.statements.append(statement)
+
+# add projects that all have their own manager
+def _add_managed_projects(count, first=0):
+    for i in range(first, first + count):
+        m = Members(name=f"manager-{i}")
+        pr = Project(name=f"managed-project-{i}",
+                     status=status_type.STARTED,
+                     project_manager=m)
+        db.session.add(m)
+        db.session.add(pr)
+    db.session.commit()
+
 # test to check the namespace
 def _check_namespace(client, response):
     namespace = response["@namespaces"]["promana"]["name"]
@@ -160,6 +205,129 @@ class TestProjectCollection(object):
             assert "name" in item
             assert "status" in item
 
+    # test keyset pagination with next and prev controls
+    def test_get_paginated(self, client):
+        resp = client.get(self.RESOURCE_URL + "?limit=2")
+        assert resp.status_code == 200
+        body = json.loads(resp.data)
+        assert [item["name"] for item in body["items"]] == ["projekti1", "projekti2"]
+        assert "prev" not in body["@controls"]
+
+        resp = client.get(body["@controls"]["next"]["href"])
+        body = json.loads(resp.data)
+        assert [item["name"] for item in body["items"]] == ["test-project-1", "test-project-2"]
+        assert "prev" in body["@controls"]
+
+        resp = client.get(body["@controls"]["next"]["href"])
+        body = json.loads(resp.data)
+        assert [item["name"] for item in body["items"]] == ["test-project-3"]
+        assert "next" not in body["@controls"]
+
+        resp = client.get(body["@controls"]["prev"]["href"])
+        body = json.loads(resp.data)
+        assert [item["name"] for item in body["items"]] == ["test-project-1", "test-project-2"]
+        assert "next" in body["@controls"]
+
+        # test with invalid limits
+        resp = client.get(self.RESOURCE_URL + "?limit=0")
+        assert resp.status_code == 400
+        resp = client.get(self.RESOURCE_URL + "?limit=x")
+        assert resp.status_code == 400
+
+    # test filtering with query parameters
+    def test_get_filtered(self, client):
+        client.put("/api/projects/projekti1/", json={
+            "name": "projekti1",
+            "start": "2021-01-01",
+            "end": "2021-06-01",
+            "project_manager": "test-member-1",
+            "status": "STARTED"
+        })
+
+        resp = client.get(self.RESOURCE_URL + "?status=STARTED")
+        body = json.loads(resp.data)
+        assert [item["name"] for item in body["items"]] == ["projekti1"]
+
+        resp = client.get(self.RESOURCE_URL + "?status=STARTED&status=NOT_STARTED")
+        body = json.loads(resp.data)
+        assert len(body["items"]) == 5
+
+        resp = client.get(self.RESOURCE_URL + "?project_manager=test-member-1")
+        body = json.loads(resp.data)
+        assert [item["name"] for item in body["items"]] == ["projekti1"]
+        assert body["items"][0]["project_manager"] == "test-member-1"
+
+        resp = client.get(self.RESOURCE_URL + "?start_from=2020-12-01&start_to=2021-02-01&end_to=2021-12-31")
+        body = json.loads(resp.data)
+        assert [item["name"] for item in body["items"]] == ["projekti1"]
+
+        resp = client.get(self.RESOURCE_URL + "?end_from=2022-01-01")
+        body = json.loads(resp.data)
+        assert len(body["items"]) == 0
+
+        # filters are kept in the paging controls
+        resp = client.get(self.RESOURCE_URL + "?status=NOT_STARTED&limit=1")
+        body = json.loads(resp.data)
+        assert "status=NOT_STARTED" in body["@controls"]["next"]["href"]
+
+        # test with invalid filters
+        resp = client.get(self.RESOURCE_URL + "?status=DONE")
+        assert resp.status_code == 400
+        resp = client.get(self.RESOURCE_URL + "?start_from=01-01-2021")
+        assert resp.status_code == 400
+
+    # test that the managers do not cause one query per project
+    def test_get_query_count(self, client):
+        _add_managed_projects(2)
+        with _QueryCounter() as few:
+            resp = client.get(self.RESOURCE_URL)
+        assert resp.status_code == 200
+
+        _add_managed_projects(20, first=2)
+        with _QueryCounter() as many:
+            resp = client.get(self.RESOURCE_URL)
+        body = json.loads(resp.data)
+        assert len(body["items"]) == 27
+        assert many.count == few.count
+
+        with _QueryCounter() as filtered:
+            resp = client.get(self.RESOURCE_URL + "?project_manager=manager-3")
+        body = json.loads(resp.data)
+        assert body["items"][0]["project_manager"] == "manager-3"
+        assert filtered.count == few.count
+
+    # test that fields selects the columns in SQL and controls=none leaves
+    # out the hypermedia
+    def test_get_sparse(self, client):
+        _add_managed_projects(3)
+        with _QueryCounter() as counter:
+            resp = client.get(self.RESOURCE_URL + "?fields=status&controls=none&limit=2")
+        assert resp.status_code == 200
+        body = json.loads(resp.data)
+        assert "@namespaces" not in body
+        assert list(body["@controls"]) == ["next"]
+        assert body["items"] == [{"name": "managed-project-0", "status": "started"},
+                                 {"name": "managed-project-1", "status": "started"}]
+        select = counter.statements[-1]
+        assert "project.start" not in select
+        assert "members" not in select
+
+        resp = client.get(body["@controls"]["next"]["href"])
+        body = json.loads(resp.data)
+        assert body["items"][0] == {"name": "managed-project-2", "status": "started"}
+
+        resp = client.get(self.RESOURCE_URL + "?fields=project_manager,start&project_manager=manager-1")
+        body = json.loads(resp.data)
+        assert body["items"] == [{"name": "managed-project-1", "project_manager": "manager-1",
+                                  "start": body["items"][0]["start"],
+                                  "@controls": body["items"][0]["@controls"]}]
+        assert "self" in body["items"][0]["@controls"]
+
+        resp = client.get(self.RESOURCE_URL + "?fields=name,budget")
+        assert resp.status_code == 400
+        resp = client.get(self.RESOURCE_URL + "?controls=some")
+        assert resp.status_code == 400
+
     # test post request
     def test_post(self, client):
         valid = _get_project_json()
@@ -204,6 +372,16 @@ class TestProjectItem(object):
         resp = client.get(self.INVALID_URL)
         assert resp.status_code == 404
 
+    # test that the manager is loaded with the project
+    def test_get_query_count(self, client):
+        _add_managed_projects(1)
+        with _QueryCounter() as counter:
+            resp = client.get("/api/projects/managed-project-0/")
+        body = json.loads(resp.data)
+        assert body["project_manager"] == "manager-0"
+        # table versions for the ETag and the project with its manager
+        assert counter.count == 2
+
     # test put request
     def test_put(self, client):
         valid = _get_project_json()
@@ -369,6 +547,29 @@ class TestProjectMemberCollection(object):
         for item in body["items"]:
             assert "name" in item
 
+    # test that members in several tasks are listed once with a fixed number of queries
+    def test_get_distinct(self, client):
+        with _QueryCounter() as few:
+            client.get(self.RESOURCE_URL)
+
+        resp = client.post("/api/projects/projekti1/phases/phase2/tasks/task3/members/",
+                           json={"name": "test-member-1"})
+        assert resp.status_code == 201
+        for i in range(10):
+            task = Tasks(name=f"many-task-{i}",
+                         project=Project.query.filter_by(name="projekti1").first(),
+                         status=status_type.NOT_STARTED)
+            db.session.add(task)
+            db.session.add(Teams(team_tasks=task,
+                                 team_members=Members.query.filter_by(name="test-member-2").first()))
+        db.session.commit()
+
+        with _QueryCounter() as many:
+            resp = client.get(self.RESOURCE_URL)
+        body = json.loads(resp.data)
+        assert [item["name"] for item in body["items"]] == ["test-member-1", "test-member-2", "test-member-3"]
+        assert many.count == few.count
+
     # test post
     def test_post(self, client):
         valid = _get_member_json()
@@ -386,6 +587,52 @@ class TestProjectMemberCollection(object):
         resp = client.post(self.RESOURCE_URL, json=invalid)
         assert resp.status_code == 400
 
+    # test adding and removing an array of members with a fixed number of queries
+    def test_batch(self, client):
+        for i in range(200):
+            db.session.add(Members(name=f"staff-{i}"))
+        db.session.commit()
+        staff = [{"name": f"staff-{i}"} for i in range(200)]
+
+        with _QueryCounter() as many:
+            resp = client.post(self.RESOURCE_URL, json=staff)
+        assert resp.status_code == 201
+        body = json.loads(resp.data)
+        assert len(body["items"]) == 200
+        assert body["items"][0]["@controls"]["self"]["href"] == self.RESOURCE_URL + "staff-0/"
+        resp = client.get(self.RESOURCE_URL)
+        assert len(json.loads(resp.data)["items"]) == 203
+
+        # members that are already in the project are all reported and
+        # nothing is added
+        resp = client.post(self.RESOURCE_URL, json=[{"name": "staff-1"}, {"name": "staff-2"},
+                                                    {"name": "extra-x"}])
+        assert resp.status_code == 404
+        assert "extra-x" in json.loads(resp.data)["@error"]["@messages"][0]
+        resp = client.post(self.RESOURCE_URL, json=[{"name": "staff-1"}, {"name": "staff-2"}])
+        assert resp.status_code == 409
+        assert "staff-1, staff-2" in json.loads(resp.data)["@error"]["@messages"][0]
+
+        with _QueryCounter() as few:
+            resp = client.delete(self.RESOURCE_URL, json=staff[:2])
+        assert resp.status_code == 204
+        with _QueryCounter() as removed:
+            resp = client.delete(self.RESOURCE_URL, json=staff[2:])
+        assert resp.status_code == 204
+        assert removed.count == few.count
+        resp = client.get(self.RESOURCE_URL)
+        assert len(json.loads(resp.data)["items"]) == 3
+
+        # an empty array and members that are not in the project are rejected
+        resp = client.delete(self.RESOURCE_URL, json=[])
+        assert resp.status_code == 400
+        resp = client.delete(self.RESOURCE_URL, json=[{"name": "test-member-1"}, {"name": "test-member-4"}])
+        assert resp.status_code == 404
+        resp = client.get(self.RESOURCE_URL)
+        assert len(json.loads(resp.data)["items"]) == 3
+        resp = client.post("/api/projects/projekti-x/members/", json=staff)
+        assert resp.status_code == 404
+
 
 # test project member
 class TestProjectMemberItem(object):
@@ -414,6 +661,17 @@ class TestProjectMemberItem(object):
         resp = client.delete(self.INVALID_URL2)
         assert resp.status_code == 404
 
+    # test that the member is removed from every task of the project
+    def test_delete_all_tasks(self, client):
+        resp = client.post("/api/projects/projekti1/phases/phase2/tasks/task3/members/",
+                           json={"name": "test-member-1"})
+        assert resp.status_code == 201
+        resp = client.delete(self.RESOURCE_URL)
+        assert resp.status_code == 204
+        resp = client.get("/api/projects/projekti1/members/")
+        body = json.loads(resp.data)
+        assert [item["name"] for item in body["items"]] == ["test-member-2", "test-member-3"]
+
 # test task members
 class TestTaskMemberCollection(object):
 
@@ -451,6 +709,30 @@ class TestTaskMemberCollection(object):
         resp = client.post(self.RESOURCE_URL2, json=invalid)
         assert resp.status_code == 400
 
+    # test adding and removing an array of members
+    def test_batch(self, client):
+        members = [{"name": f"test-member-{i}"} for i in range(1, 5)]
+        resp = client.post(self.RESOURCE_URL2, json=members)
+        assert resp.status_code == 201
+        body = json.loads(resp.data)
+        assert [item["name"] for item in body["items"]] == [m["name"] for m in members]
+
+        # the whole array is rejected if one member is already in the task
+        resp = client.post(self.RESOURCE_URL, json=members)
+        assert resp.status_code == 409
+        assert "test-member-4" not in json.loads(resp.data)["@error"]["@messages"][0]
+        resp = client.get(self.RESOURCE_URL)
+        assert len(json.loads(resp.data)["items"]) == 3
+
+        resp = client.delete(self.RESOURCE_URL2, json=members[:3])
+        assert resp.status_code == 204
+        resp = client.get(self.RESOURCE_URL2)
+        assert [item["name"] for item in json.loads(resp.data)["items"]] == ["test-member-4"]
+        resp = client.delete(self.RESOURCE_URL2, json=members)
+        assert resp.status_code == 404
+        resp = client.delete(self.RESOURCE_URL2, data=json.dumps(members))
+        assert resp.status_code == 415
+
 # test task member
 class TestTaskMemberItem(object):
     RESOURCE_URL = "/api/projects/projekti1/phases/phase1/tasks/task1/members/test-member-1/"
@@ -579,3 +861,891 @@ class TestPhaseItem(object):
         # test with invalid url
         resp = client.delete(self.INVALID_URL)
         assert resp.status_code == 404
+
+# test task collection
+class TestTaskCollection(object):
+
+    RESOURCE_URL = "/api/projects/projekti1/phases/phase2/tasks/"
+    PROJECT_URL = "/api/projects/projekti1/phases/WHOLE_PROJECT/tasks/"
+    INVALID_URL = "/api/projects/projekti1/phases/feikki/tasks/"
+
+    # test get request
+    def test_get(self, client):
+        resp = client.get(self.RESOURCE_URL)
+        assert resp.status_code == 200
+        body = json.loads(resp.data)
+        assert [item["task_name"] for item in body["items"]] == ["task3"]
+        assert body["items"][0]["task_phase"] == "phase2"
+
+        resp = client.get(self.PROJECT_URL)
+        assert resp.status_code == 200
+        body = json.loads(resp.data)
+        assert [item["task_name"] for item in body["items"]] == ["task1", "task3"]
+
+        resp = client.get(self.INVALID_URL)
+        assert resp.status_code == 404
+        resp = client.get("/api/projects/feikki/phases/WHOLE_PROJECT/tasks/")
+        assert resp.status_code == 404
+
+    # test that the sparse fields match the full items
+    def test_get_sparse(self, client):
+        full = json.loads(client.get(self.PROJECT_URL).data)["items"]
+        with _QueryCounter() as counter:
+            resp = client.get(self.PROJECT_URL + "?fields=task_status,task_phase&controls=none&limit=1")
+        body = json.loads(resp.data)
+        assert body["items"] == [{key: full[0][key] for key in ("task_name", "task_status", "task_phase")}]
+        assert "tasks.start" not in counter.statements[-1]
+        resp = client.get(body["@controls"]["next"]["href"])
+        body = json.loads(resp.data)
+        assert body["items"][0]["task_name"] == full[1]["task_name"]
+        assert "@controls" not in body["items"][0]
+        resp = client.get(self.PROJECT_URL + "?fields=task_owner")
+        assert resp.status_code == 400
+
+    # test paging, sorting and filtering
+    def test_get_paginated(self, client):
+        task = Tasks(name="early-task",
+                     project=Project.query.filter_by(name="projekti1").first(),
+                     status=status_type.STARTED,
+                     start=datetime.datetime.strptime("2020-01-01", "%Y-%m-%d"))
+        undated = Tasks(name="undated-task",
+                        project=task.project,
+                        status=status_type.STARTED)
+        db.session.add(task)
+        db.session.add(undated)
+        db.session.commit()
+        # the column default fills in a start date on insert
+        Tasks.query.filter_by(name="undated-task").update({"start": None})
+        db.session.commit()
+
+        resp = client.get(self.PROJECT_URL + "?limit=1&sort=-name")
+        body = json.loads(resp.data)
+        names = [item["task_name"] for item in body["items"]]
+        while "next" in body["@controls"]:
+            resp = client.get(body["@controls"]["next"]["href"])
+            body = json.loads(resp.data)
+            names.extend(item["task_name"] for item in body["items"])
+        assert names == ["undated-task", "task3", "task1", "early-task"]
+
+        for sort, expected in (("start", ["undated-task", "early-task", "task1", "task3"]),
+                               ("-start", ["task3", "task1", "early-task", "undated-task"])):
+            resp = client.get(self.PROJECT_URL + f"?limit=1&sort={sort}")
+            body = json.loads(resp.data)
+            names = [item["task_name"] for item in body["items"]]
+            while "next" in body["@controls"]:
+                resp = client.get(body["@controls"]["next"]["href"])
+                body = json.loads(resp.data)
+                names.extend(item["task_name"] for item in body["items"])
+            assert names == expected
+
+        resp = client.get(self.PROJECT_URL + "?status=STARTED")
+        body = json.loads(resp.data)
+        assert [item["task_name"] for item in body["items"]] == ["early-task", "undated-task"]
+
+        # test with invalid parameters
+        resp = client.get(self.PROJECT_URL + "?sort=color")
+        assert resp.status_code == 400
+        resp = client.get(self.PROJECT_URL + "?after=no-such-task")
+        assert resp.status_code == 400
+        resp = client.get(self.PROJECT_URL + "?status=DONE")
+        assert resp.status_code == 400
+
+# test conditional get requests
+class TestConditionalGet(object):
+
+    # test that a matching ETag gives 304 until the data changes
+    def test_etag(self, client):
+        resp = client.get("/api/projects/")
+        assert resp.status_code == 200
+        etag = resp.headers["ETag"]
+
+        resp = client.get("/api/projects/", headers={"If-None-Match": etag})
+        assert resp.status_code == 304
+        assert resp.headers["ETag"] == etag
+        assert resp.data == b""
+
+        # other query parameters give another representation
+        resp = client.get("/api/projects/?limit=1", headers={"If-None-Match": etag})
+        assert resp.status_code == 200
+
+        resp = client.post("/api/projects/", json=_get_project_json())
+        assert resp.status_code == 201
+        resp = client.get("/api/projects/", headers={"If-None-Match": etag})
+        assert resp.status_code == 200
+        assert resp.headers["ETag"] != etag
+
+    # test that writes to related tables change the ETag
+    def test_related_changes(self, client):
+        resp = client.get("/api/projects/projekti1/members/")
+        etag = resp.headers["ETag"]
+        resp = client.put("/api/members/test-member-1/", json={"name": "renamed-member"})
+        assert resp.status_code == 204
+        resp = client.get("/api/projects/projekti1/members/", headers={"If-None-Match": etag})
+        assert resp.status_code == 200
+        assert "renamed-member" in [item["name"] for item in json.loads(resp.data)["items"]]
+
+        resp = client.get("/api/projects/projekti1/phases/WHOLE_PROJECT/tasks/")
+        etag = resp.headers["ETag"]
+        resp = client.get("/api/projects/projekti1/phases/WHOLE_PROJECT/tasks/", headers={"If-None-Match": etag})
+        assert resp.status_code == 304
+        Tasks.query.filter_by(name="task3").update({"status": status_type.FINISHED})
+        db.session.commit()
+        resp = client.get("/api/projects/projekti1/phases/WHOLE_PROJECT/tasks/", headers={"If-None-Match": etag})
+        assert resp.status_code == 200
+
+    # test that errors are not cached
+    def test_not_found(self, client):
+        resp = client.get("/api/projects/non-project-x/")
+        assert resp.status_code == 404
+        assert "ETag" not in resp.headers
+
+# test the version counters of the tables
+class TestTableVersions(object):
+
+    # test that every table has a version row, so that writes only update them
+    def test_seeded(self, client):
+        names = {name for name, in db.session.query(TableVersion.name)}
+        assert names == set(db.metadata.tables) - {TableVersion.__table__.name}
+        with _QueryCounter() as counter:
+            resp = client.post("/api/members/", json={"name": "versioned-member"})
+        assert resp.status_code == 201
+        statements = [statement for statement in counter.statements if "table_version" in statement]
+        assert statements and all(statement.startswith("UPDATE") for statement in statements)
+
+    # test that the versions are bumped once at commit, not at every flush
+    def test_bumped_at_commit(self, client):
+        before = get_table_versions(Members)
+        with _QueryCounter() as counter:
+            for i in range(3):
+                db.session.add(Members(name=f"versioned-member-{i}"))
+                db.session.flush()
+            assert get_table_versions(Members) == before
+            db.session.commit()
+        assert get_table_versions(Members) == (before[0] + 1,)
+        assert len([statement for statement in counter.statements
+                    if statement.startswith("UPDATE table_version")]) == 1
+
+# test the response cache of the collections
+class TestResponseCache(object):
+
+    # test that repeated requests are served from the cache until a write
+    def test_hits_and_invalidation(self, client):
+        stats = json.loads(client.get("/api/cache/").data)
+        resp = client.get("/api/members/")
+        first = resp.data
+        resp = client.get("/api/members/")
+        assert resp.data == first
+        assert "ETag" in resp.headers
+
+        after = json.loads(client.get("/api/cache/").data)
+        assert after["hits"] == stats["hits"] + 1
+        assert after["misses"] == stats["misses"] + 1
+        assert after["size"] == 1
+
+        # the write drops the entry and the next request sees the new member
+        resp = client.post("/api/members/", json=_get_member_json())
+        assert resp.status_code == 201
+        after = json.loads(client.get("/api/cache/").data)
+        assert after["size"] == 0
+        assert after["invalidations"] == stats["invalidations"] + 1
+        resp = client.get("/api/members/")
+        assert len(json.loads(resp.data)["items"]) == 5
+
+    # test that query strings are cached separately
+    def test_query_string(self, client):
+        resp = client.get("/api/projects/?limit=1")
+        assert len(json.loads(resp.data)["items"]) == 1
+        resp = client.get("/api/projects/?limit=2")
+        assert len(json.loads(resp.data)["items"]) == 2
+        assert json.loads(client.get("/api/cache/").data)["size"] == 2
+
+    # test that writes made outside this process are not hidden by the cache
+    def test_other_writer(self, client):
+        client.get("/api/projects/projekti1/phases/")
+        Phase.query.filter_by(name="phase1").update({"name": "renamed-phase"})
+        db.session.commit()
+        resp = client.get("/api/projects/projekti1/phases/")
+        assert "renamed-phase" in [item["name"] for item in json.loads(resp.data)["items"]]
+
+# get an NDJSON document from a list of dicts
+def _get_ndjson(entities):
+    return "".join(json.dumps(entity) + "\n" for entity in entities)
+
+# test bulk import
+class TestBulkImport(object):
+
+    RESOURCE_URL = "/api/bulk/"
+
+    # test importing a project plan
+    def test_post(self, client):
+        doc = _get_ndjson([
+            {"type": "member", "name": "bulk-member"},
+            {"type": "project", "name": "bulk-project", "status": "STARTED",
+             "project_manager": "bulk-member", "start": "2021-01-01"},
+            {"type": "phase", "project": "bulk-project", "name": "bulk-phase",
+             "deadline": "2021-06-01", "status": "NOT_STARTED"},
+            {"type": "task", "project": "bulk-project", "phase": "bulk-phase",
+             "task_name": "bulk-task", "task_status": "STARTED"},
+            {"type": "team", "task": "bulk-task", "member": "bulk-member"},
+            {"type": "team", "task": "bulk-task", "member": "test-member-1"},
+        ]) + "\n"
+
+        # test with wrong content type
+        resp = client.post(self.RESOURCE_URL, data=doc)
+        assert resp.status_code == 415
+
+        resp = client.post(self.RESOURCE_URL, data=doc, content_type="application/x-ndjson")
+        assert resp.status_code == 200
+        results = [json.loads(line) for line in resp.data.decode().splitlines()]
+        assert [result["line"] for result in results] == [1, 2, 3, 4, 5, 6]
+        assert all(result["status"] == 201 for result in results)
+        assert results[3]["location"] == "/api/projects/bulk-project/phases/bulk-phase/tasks/bulk-task/"
+
+        body = json.loads(client.get(results[1]["location"]).data)
+        assert body["project_manager"] == "bulk-member"
+        assert body["status"] == "started"
+        body = json.loads(client.get("/api/projects/bulk-project/phases/bulk-phase/tasks/").data)
+        assert [item["task_name"] for item in body["items"]] == ["bulk-task"]
+        body = json.loads(client.get("/api/projects/bulk-project/members/").data)
+        assert [item["name"] for item in body["items"]] == ["bulk-member", "test-member-1"]
+
+        # the same document again conflicts on every line
+        resp = client.post(self.RESOURCE_URL, data=doc, content_type="application/x-ndjson")
+        results = [json.loads(line) for line in resp.data.decode().splitlines()]
+        assert [result["status"] for result in results] == [409] * 6
+
+    # test per line errors
+    def test_post_errors(self, client):
+        doc = _get_ndjson([
+            {"type": "project", "name": "bulk-project"},
+            {"type": "unknown"},
+            {"type": "phase", "project": "no-such-project", "name": "phase"},
+            {"type": "task", "project": "projekti1", "phase": "no-such-phase", "task_name": "bulk-task"},
+            {"type": "team", "task": "task1", "member": "no-such-member"},
+            {"type": "member", "name": "bulk-member"},
+            {"type": "member", "name": "bulk-member"},
+        ]) + "{not json\n"
+        resp = client.post(self.RESOURCE_URL, data=doc, content_type="application/x-ndjson")
+        assert resp.status_code == 200
+        results = [json.loads(line) for line in resp.data.decode().splitlines()]
+        assert [result["status"] for result in results] == [400, 400, 404, 404, 404, 201, 409, 400]
+        assert Members.query.filter_by(name="bulk-member").count() == 1
+
+    # test that a date that does not exist fails its line without stopping the stream
+    def test_post_invalid_date(self, client, monkeypatch):
+        monkeypatch.setitem(app.config, "BULK_BATCH_SIZE", 2)
+        doc = _get_ndjson([
+            {"type": "project", "name": "bulk-project-1", "status": "STARTED"},
+            {"type": "project", "name": "bulk-project-2", "status": "STARTED"},
+            {"type": "project", "name": "bulk-project-3", "status": "STARTED", "start": "2021-02-30"},
+            {"type": "task", "project": "bulk-project-1", "task_name": "bulk-task", "task_end": "2021-13-01"},
+            {"type": "phase", "project": "bulk-project-2", "name": "bulk-phase", "deadline": "2021-04-31"},
+            {"type": "project", "name": "bulk-project-4", "status": "STARTED", "start": "2021-01-01",
+             "end": "2021-03-01"},
+        ])
+        resp = client.post(self.RESOURCE_URL, data=doc, content_type="application/x-ndjson")
+        assert resp.status_code == 200
+        results = [json.loads(line) for line in resp.data.decode().splitlines()]
+        assert [result["status"] for result in results] == [201, 201, 400, 400, 400, 201]
+        assert "day is out of range" in results[2]["message"]
+        assert Project.query.filter(Project.name.like("bulk-project-%")).count() == 3
+        assert Tasks.query.filter_by(name="bulk-task").count() == 0
+        assert Project.query.filter_by(name="bulk-project-4").first().end == datetime.datetime(2021, 3, 1)
+
+    # test that a large import uses a fixed number of statements per batch
+    def test_post_batched(self, client):
+        entities = [{"type": "project", "name": "big-project", "status": "STARTED"}]
+        for i in range(1200):
+            entities.append({"type": "task", "project": "big-project",
+                             "task_name": f"big-task-{i}", "task_start": "2021-01-01"})
+        with _QueryCounter() as counter:
+            resp = client.post(self.RESOURCE_URL, data=_get_ndjson(entities),
+                               content_type="application/x-ndjson")
+        results = [json.loads(line) for line in resp.data.decode().splitlines()]
+        assert len(results) == 1201
+        assert all(result["status"] == 201 for result in results)
+        assert Tasks.query.filter(Tasks.name.like("big-task-%")).count() == 1200
+        assert counter.count < 40
+
+        # the cached project listing sees the new project
+        body = json.loads(client.get("/api/projects/?status=STARTED").data)
+        assert "big-project" in [item["name"] for item in body["items"]]
+
+# test the NDJSON export
+class TestExport(object):
+
+    RESOURCE_URL = "/api/export/"
+
+    # test that every project is exported with its phases, tasks and members
+    def test_get(self, client):
+        resp = client.get(self.RESOURCE_URL)
+        assert resp.status_code == 200
+        assert resp.mimetype == "application/x-ndjson"
+        lines = [json.loads(line) for line in resp.data.decode().splitlines()]
+        projects = {line["name"]: line for line in lines}
+        assert sorted(projects) == ["projekti1", "projekti2", "test-project-1",
+                                    "test-project-2", "test-project-3"]
+
+        project = projects["projekti1"]
+        assert project["status"] == "not started"
+        assert [phase["name"] for phase in project["phases"]] == ["phase1", "phase2"]
+        assert project["phases"][0]["deadline"] == "2021-01-01"
+        tasks = {task["task_name"]: task for task in project["tasks"]}
+        assert sorted(tasks) == ["task1", "task3"]
+        assert tasks["task1"]["task_phase"] == "phase1"
+        assert tasks["task1"]["task_start"] == "2021-01-01"
+        assert tasks["task1"]["members"] == ["test-member-1", "test-member-2", "test-member-3"]
+        assert tasks["task3"]["members"] == []
+
+        project = projects["projekti2"]
+        assert project["phases"] == []
+        assert project["tasks"][0]["members"] == ["test-member-4"]
+
+    # test that the export uses a fixed number of queries
+    def test_get_query_count(self, client):
+        with _QueryCounter() as few:
+            client.get(self.RESOURCE_URL).data
+        _add_managed_projects(20)
+        with _QueryCounter() as many:
+            resp = client.get(self.RESOURCE_URL)
+            lines = resp.data.decode().splitlines()
+        assert len(lines) == 25
+        assert many.count == few.count
+
+# get valid json for hour entries
+def _get_hours_json(count, task="task1", member="test-member-1"):
+    return [{"task": task, "member": member, "date": f"2021-01-{i % 28 + 1:02}", "time": 7.5}
+            for i in range(count)]
+
+# test the ingestion of hour entries
+class TestHours(object):
+
+    RESOURCE_URL = "/api/hours/"
+
+    # test a batch where some of the entries fail
+    def test_post(self, client):
+        entries = _get_hours_json(2) + [
+            {"task": "task-x", "member": "test-member-1", "date": "2021-01-01", "time": 1},
+            {"task": "task2", "member": "test-member-x", "date": "2021-01-01", "time": 1},
+            {"task": "task2", "member": "test-member-4", "date": "2021-02-30", "time": 1},
+            {"task": "task2", "member": "test-member-4", "date": "2021-01-01", "time": -1},
+            "not an entry",
+            {"task": "task2", "member": "test-member-4", "date": "2021-01-01", "time": 2},
+            ]
+        resp = client.post(self.RESOURCE_URL, json=entries)
+        assert resp.status_code == 200
+        body = json.loads(resp.data)
+        assert [item["index"] for item in body["items"]] == list(range(len(entries)))
+        assert [item["status"] for item in body["items"]] == [201, 201, 404, 404, 400, 400, 400, 201]
+        assert "task-x" in body["items"][2]["message"]
+        # only the error of the entry, without the schema and the instance
+        assert body["items"][5]["message"] == "-1 is less than the minimum of 0"
+        assert body["items"][6]["message"] == "'not an entry' is not of type 'object'"
+
+        hours = Hours.query.order_by(Hours.id).all()
+        assert [hour.time for hour in hours] == [7.5, 7.5, 2]
+        assert hours[0].task.name == "task1"
+        assert hours[0].project.name == "projekti1"
+        assert hours[0].employee.name == "test-member-1"
+        assert hours[2].project.name == "projekti2"
+        assert hours[2].date == datetime.datetime(2021, 1, 1)
+
+    # test that a batch is inserted with a fixed number of queries
+    def test_post_query_count(self, client):
+        with _QueryCounter() as few:
+            resp = client.post(self.RESOURCE_URL, json=_get_hours_json(10))
+        assert resp.status_code == 200
+        with _QueryCounter() as many:
+            resp = client.post(self.RESOURCE_URL, json=_get_hours_json(1000))
+        assert resp.status_code == 200
+        # the first batch also creates the version counter of the table
+        assert many.count <= few.count
+        assert Hours.query.count() == 1010
+
+    # test requests that are rejected as a whole
+    def test_post_errors(self, client):
+        resp = client.post(self.RESOURCE_URL, data=json.dumps(_get_hours_json(1)))
+        assert resp.status_code == 415
+        resp = client.post(self.RESOURCE_URL, json={"task": "task1"})
+        assert resp.status_code == 400
+        app.config["HOURS_MAX_ENTRIES"] = 5
+        try:
+            resp = client.post(self.RESOURCE_URL, json=_get_hours_json(6))
+        finally:
+            app.config["HOURS_MAX_ENTRIES"] = 10000
+        assert resp.status_code == 413
+        assert Hours.query.count() == 0
+
+    # test that the hours are kept when their task is deleted
+    def test_delete_task(self, client):
+        resp = client.post(self.RESOURCE_URL, json=_get_hours_json(3, task="task3"))
+        assert resp.status_code == 200
+        resp = client.delete("/api/projects/projekti1/phases/phase2/tasks/task3/")
+        assert resp.status_code == 204
+        assert [hour.task_id for hour in Hours.query] == [None, None, None]
+
+# get the totals of a task and its project
+def _get_totals(client, task="task1"):
+    task_body = json.loads(client.get(f"/api/projects/projekti1/phases/phase1/tasks/{task}/").data)
+    project_body = json.loads(client.get("/api/projects/projekti1/").data)
+    return (task_body["total_hours"], task_body["total_cost"],
+            project_body["total_hours"], project_body["total_costs"])
+
+# test the hour and cost totals of tasks and projects
+class TestTotals(object):
+
+    # test that ingested hours are added to the totals
+    def test_hours(self, client):
+        assert _get_totals(client) == (0, 0, 0, 0)
+        resp = client.put("/api/members/test-member-1/", json={"name": "test-member-1", "hourly_cost": 40})
+        assert resp.status_code == 204
+        resp = client.post("/api/hours/", json=_get_hours_json(2) + _get_hours_json(1, task="task3",
+                                                                                     member="test-member-2"))
+        assert resp.status_code == 200
+        assert _get_totals(client) == (15, 600, 22.5, 600)
+        assert _get_totals(client, "task3")[:2] == (7.5, 0)
+
+    # test that hours and costs written with the models change the totals
+    def test_models(self, client):
+        task = Tasks.query.filter_by(name="task1").first()
+        hours = Hours(task=task, project=task.project, date=datetime.datetime(2021, 1, 1), time=8, cost=400)
+        costs = Costs(project=task.project, name="licenses", hourly_price=10, quantity=3)
+        db.session.add(hours)
+        db.session.add(costs)
+        db.session.commit()
+        hours_id, costs_id = hours.id, costs.id
+        assert _get_totals(client) == (8, 400, 8, 430)
+
+        # the requests end the session, so the objects are loaded again
+        hours, costs = Hours.query.get(hours_id), Costs.query.get(costs_id)
+        hours.time, hours.cost = 4, 200
+        costs.quantity = 1
+        db.session.commit()
+        assert _get_totals(client) == (4, 200, 4, 210)
+
+        Hours.query.get(hours_id).task = Tasks.query.filter_by(name="task3").first()
+        db.session.commit()
+        assert _get_totals(client) == (0, 0, 4, 210)
+        assert _get_totals(client, "task3")[:2] == (4, 200)
+
+        db.session.delete(Hours.query.get(hours_id))
+        db.session.delete(Costs.query.get(costs_id))
+        db.session.commit()
+        assert _get_totals(client) == (0, 0, 0, 0)
+
+    # test that the totals are rebuilt from the rows
+    def test_rebuild(self, client):
+        resp = client.post("/api/hours/", json=_get_hours_json(3))
+        assert resp.status_code == 200
+        db.session.add(Costs(project=Project.query.filter_by(name="projekti1").first(),
+                             name="travel", hourly_price=100, quantity=2))
+        db.session.commit()
+        expected = _get_totals(client)
+        Tasks.query.update({"total_hours": 0, "total_cost": None})
+        Project.query.update({"total_hours": 1000, "total_costs": 1000})
+        db.session.commit()
+        assert _get_totals(client) != expected
+
+        updated_tasks, updated_projects = rollups.rebuild_totals()
+        assert updated_tasks == Tasks.query.count()
+        assert updated_projects == Project.query.count()
+        assert _get_totals(client) == expected == (22.5, 0, 22.5, 200)
+
+        # the summaries of the portfolio are rebuilt as well
+        ProjectSummary.query.delete()
+        db.session.commit()
+        rollups.rebuild_totals()
+        assert _get_portfolio(client)["projekti1"]["total_costs"] == 200
+        assert ProjectSummary.query.count() == Project.query.count()
+
+# test the budget analytics of a project
+class TestAnalytics(object):
+
+    RESOURCE_URL = "/api/projects/projekti1/analytics/"
+
+    # test the burn-down of hours whose cost comes from the member or the project
+    def test_get(self, client):
+        resp = client.put("/api/projects/projekti1/", json={
+            "name": "projekti1", "start": "2021-01-01", "end": "2021-01-31",
+            "budget": 3000, "avg_hourly_cost": 25
+            })
+        assert resp.status_code == 204
+        resp = client.put("/api/members/test-member-1/", json={"name": "test-member-1", "hourly_cost": 50})
+        assert resp.status_code == 204
+        db.session.add(Costs(project=Project.query.filter_by(name="projekti1").first(),
+                             name="licenses", hourly_price=100, quantity=5))
+        db.session.commit()
+        entries = [{"task": "task1", "member": member, "date": f"2021-01-{day:02}", "time": 4}
+                   for day in range(1, 11) for member in ("test-member-1", "test-member-2")]
+        resp = client.post("/api/hours/", json=entries)
+        assert resp.status_code == 200
+
+        resp = client.get(self.RESOURCE_URL)
+        assert resp.status_code == 200
+        body = json.loads(resp.data)
+        assert body["budget"] == 3000
+        assert body["fixed_costs"] == 500
+        assert body["series"]["dates"][:2] == ["2021-01-01", "2021-01-02"]
+        assert body["series"]["hours"][-1] == body["total_hours"] == 80
+        assert body["series"]["costs"][:2] == [800, 1100]
+        assert body["total_costs"] == 3500
+        assert body["budget_exhausted_on"] == "2021-01-09"
+        assert body["projected_overrun"] == pytest.approx(500 + 3000 / 30 * 21)
+        assert body["@controls"]["up"]["href"] == "/api/projects/projekti1/"
+
+        # the analytics count the same costs as the totals and the portfolio
+        project_body = json.loads(client.get("/api/projects/projekti1/").data)
+        assert project_body["total_costs"] == body["total_costs"]
+        assert Project.query.filter_by(name="projekti1").first().total_costs == body["total_costs"]
+        assert _get_portfolio(client)["projekti1"]["total_costs"] == body["total_costs"]
+
+        resp = client.get("/api/projects/projekti-x/analytics/")
+        assert resp.status_code == 404
+
+    # test that the number of queries does not depend on the number of entries
+    def test_get_query_count(self, client):
+        with _QueryCounter() as few:
+            resp = client.get(self.RESOURCE_URL)
+        assert resp.status_code == 200
+        assert json.loads(resp.data)["series"]["dates"] == []
+        resp = client.post("/api/hours/", json=[
+            {"task": "task1", "member": "test-member-1", "date": f"202{year}-{month:02}-{day:02}", "time": 1}
+            for year in range(3) for month in range(1, 13) for day in range(1, 29)
+            ])
+        assert resp.status_code == 200
+        with _QueryCounter() as many:
+            resp = client.get(self.RESOURCE_URL)
+        assert len(json.loads(resp.data)["series"]["dates"]) == 3 * 12 * 28
+        assert many.count == few.count
+
+# get the portfolio items by project name
+def _get_portfolio(client, url="/api/portfolio/?limit=1000"):
+    resp = client.get(url)
+    assert resp.status_code == 200
+    return {item["name"]: item for item in json.loads(resp.data)["items"]}
+
+# test the portfolio report
+class TestPortfolio(object):
+
+    RESOURCE_URL = "/api/portfolio/"
+
+    # test that the report follows the writes to projects, phases, tasks and hours
+    def test_get(self, client):
+        items = _get_portfolio(client)
+        assert sorted(items) == ["projekti1", "projekti2", "test-project-1", "test-project-2",
+                                 "test-project-3"]
+        assert items["projekti1"]["phase_count"] == 2
+        assert items["projekti1"]["task_count"] == 2
+        assert items["projekti1"]["completion"] == 0
+        assert items["projekti1"]["total_hours"] == 0
+        assert items["projekti1"]["@controls"]["self"]["href"] == "/api/projects/projekti1/"
+
+        resp = client.put("/api/projects/projekti1/phases/phase1/tasks/task1/",
+                          json={"task_name": "task1", "task_status": "FINISHED"})
+        assert resp.status_code == 204
+        resp = client.put("/api/projects/projekti1/", json={"name": "projekti1", "project_manager": "test-member-1",
+                                                            "budget": 1000})
+        assert resp.status_code == 204
+        resp = client.post("/api/hours/", json=_get_hours_json(2))
+        assert resp.status_code == 200
+        resp = client.delete("/api/projects/projekti1/phases/phase2/")
+        assert resp.status_code == 204
+        items = _get_portfolio(client)
+        assert items["projekti1"]["completion"] == 0.5
+        assert items["projekti1"]["project_manager"] == "test-member-1"
+        assert items["projekti1"]["budget"] == 1000
+        assert items["projekti1"]["total_hours"] == 15
+        assert items["projekti1"]["phase_count"] == 1
+
+        # the manager name is read with the report
+        resp = client.put("/api/members/test-member-1/", json={"name": "manager-1"})
+        assert resp.status_code == 204
+        resp = client.delete("/api/projects/test-project-1/")
+        assert resp.status_code == 204
+        items = _get_portfolio(client)
+        assert items["projekti1"]["project_manager"] == "manager-1"
+        assert "test-project-1" not in items
+
+        resp = client.post("/api/bulk/", data=_get_ndjson([
+            {"type": "project", "name": "bulk-project", "status": "STARTED"},
+            {"type": "task", "project": "bulk-project", "task_name": "bulk-task", "task_status": "FINISHED"},
+            ]), content_type="application/x-ndjson")
+        assert resp.status_code == 200
+        assert _get_portfolio(client)["bulk-project"]["completion"] == 1
+
+    # test sorting and paging with the next links
+    def test_get_paginated(self, client):
+        _add_managed_projects(7)
+        resp = client.put("/api/projects/projekti1/phases/phase1/tasks/task1/",
+                          json={"task_name": "task1", "task_status": "FINISHED"})
+        assert resp.status_code == 204
+        for sort in ("name", "-name", "completion", "-completion", "-total_hours", "status"):
+            names = []
+            url = f"{self.RESOURCE_URL}?sort={sort}&limit=3"
+            while url:
+                resp = client.get(url)
+                assert resp.status_code == 200
+                body = json.loads(resp.data)
+                names.extend(item["name"] for item in body["items"])
+                url = body["@controls"].get("next", {}).get("href")
+            assert len(names) == len(set(names)) == Project.query.count()
+            if sort == "-completion":
+                assert names[0] == "projekti1"
+        resp = client.get(self.RESOURCE_URL + "?status=STARTED")
+        assert len(json.loads(resp.data)["items"]) == 7
+
+        resp = client.get(self.RESOURCE_URL + "?sort=budget")
+        assert resp.status_code == 400
+        resp = client.get(self.RESOURCE_URL + "?after=no-project")
+        assert resp.status_code == 400
+
+    # test that a page takes the same number of queries for any number of projects
+    def test_get_query_count(self, client):
+        with _QueryCounter() as few:
+            resp = client.get(self.RESOURCE_URL)
+        assert resp.status_code == 200
+        _add_managed_projects(40)
+        with _QueryCounter() as many:
+            resp = client.get(self.RESOURCE_URL)
+        assert len(json.loads(resp.data)["items"]) == 45
+        assert many.count == few.count
+
+# test the timeline of tasks and phases in a date range
+class TestTimeline(object):
+
+    RESOURCE_URL = "/api/timeline/"
+
+    # test that the tasks overlapping the range and the phases with a deadline in it are grouped by project
+    def test_get(self, client):
+        resp = client.get(self.RESOURCE_URL + "?from=2022-01-15&to=2022-02-15")
+        assert resp.status_code == 200
+        body = json.loads(resp.data)
+        _check_namespace(client, body)
+        assert body["from"] == "2022-01-15"
+        assert body["to"] == "2022-02-15"
+        assert [item["name"] for item in body["items"]] == ["test-project-2", "test-project-3"]
+        project = body["items"][0]
+        assert [task["task_name"] for task in project["tasks"]] == ["extra-task-2"]
+        assert project["tasks"][0]["task_end"] == "2022-02-01"
+        assert [phase["deadline"] for phase in project["phases"]] == ["2022-02-01"]
+        assert project["@controls"]["self"]["href"] == "/api/projects/test-project-2/"
+        assert "self" in project["tasks"][0]["@controls"]
+        assert body["items"][1]["phases"] == []
+
+        # both ends of the range are included
+        resp = client.get(self.RESOURCE_URL + "?from=2022-01-01&to=2022-01-01")
+        items = {item["name"]: item for item in json.loads(resp.data)["items"]}
+        assert [task["task_name"] for task in items["projekti1"]["tasks"]] == ["task1", "task3"]
+        assert [phase["name"] for phase in items["projekti1"]["phases"]] == ["phase2"]
+        assert [task["task_name"] for task in items["projekti2"]["tasks"]] == ["task2"]
+
+        resp = client.get(self.RESOURCE_URL + "?from=2020-01-01&to=2020-12-01")
+        assert json.loads(resp.data)["items"] == []
+
+    # test that a task without an end date is on the timeline of every range after its start
+    def test_get_open_ended(self, client):
+        resp = client.post("/api/projects/projekti1/phases/phase1/tasks/", json={
+            "task_name": "open-task", "task_start": "2021-01-01", "task_status": "STARTED"
+            })
+        assert resp.status_code == 201
+        for query in ("?from=2021-06-01&to=2021-06-30", "?from=2030-01-01&to=2030-01-31",
+                      "?from=2020-12-01&to=2021-01-01"):
+            resp = client.get(self.RESOURCE_URL + query)
+            items = {item["name"]: item for item in json.loads(resp.data)["items"]}
+            tasks = {task["task_name"]: task for task in items["projekti1"]["tasks"]}
+            assert tasks["open-task"]["task_end"] is None
+        resp = client.get(self.RESOURCE_URL + "?from=2020-01-01&to=2020-12-31")
+        assert json.loads(resp.data)["items"] == []
+
+    # test the controls query parameter and the invalid ranges
+    def test_get_query_params(self, client):
+        resp = client.get(self.RESOURCE_URL + "?from=2022-01-15&to=2022-02-15&controls=none")
+        assert resp.status_code == 200
+        project = json.loads(resp.data)["items"][0]
+        assert "@controls" not in project
+        assert "@controls" not in project["tasks"][0]
+
+        for query in ("", "?from=2022-01-01", "?to=2022-01-01", "?from=2022-13-01&to=2022-12-01",
+                      "?from=2022-02-01&to=2022-01-01", "?from=2022-01-01&to=2022-02-01&controls=some"):
+            resp = client.get(self.RESOURCE_URL + query)
+            assert resp.status_code == 400
+
+    # test that the timeline takes the same number of queries for any number of items
+    def test_get_query_count(self, client):
+        url = self.RESOURCE_URL + "?from=2021-06-01&to=2021-07-01"
+        with _QueryCounter() as few:
+            resp = client.get(url)
+        assert resp.status_code == 200
+        resp = client.post("/api/bulk/", data=_get_ndjson(
+            [{"type": "project", "name": "bulk-project", "status": "STARTED"}]
+            + [{"type": "task", "project": "bulk-project", "task_name": f"bulk-task-{i}",
+                "task_start": "2021-06-15", "task_end": "2021-08-01", "task_status": "NOT_STARTED"}
+               for i in range(20)]
+            ), content_type="application/x-ndjson")
+        assert resp.status_code == 200
+        with _QueryCounter() as many:
+            resp = client.get(url)
+        items = {item["name"]: item for item in json.loads(resp.data)["items"]}
+        assert len(items["bulk-project"]["tasks"]) == 20
+        assert many.count == few.count
+
+# context manager that counts the transactions committed on the database
+class _CommitCounter(object):
+
+    def __enter__(self):
+        self.count = 0
+        event.listen(db.engine, "commit", self._count)
+        return self
+
+    def __exit__(self, *args):
+        event.remove(db.engine, "commit", self._count)
+
+    def _count(self, conn):
+        self.count += 1
+
+# test that every request is one transaction
+class TestUnitOfWork(object):
+
+    PROJECT_MEMBERS_URL = "/api/projects/test-project-1/members/"
+
+    # test that a request that writes several tables commits once
+    def test_single_commit(self, client):
+        with _CommitCounter() as counter:
+            resp = client.post(self.PROJECT_MEMBERS_URL, json=[{"name": "test-member-1"},
+                                                               {"name": "test-member-2"}])
+        assert resp.status_code == 201
+        assert counter.count == 1
+        assert Tasks.query.filter_by(name="test-project-1-default").count() == 1
+
+        with _CommitCounter() as counter:
+            resp = client.delete("/api/projects/projekti1/phases/phase2/")
+        assert resp.status_code == 204
+        assert counter.count == 1
+
+        with _CommitCounter() as counter:
+            resp = client.get(self.PROJECT_MEMBERS_URL)
+        assert resp.status_code == 200
+        assert counter.count == 0
+
+    # test that nothing of a failed request is saved
+    def test_rollback(self, client):
+        with _CommitCounter() as counter:
+            resp = client.post(self.PROJECT_MEMBERS_URL, json=[{"name": "test-member-1"},
+                                                               {"name": "non-member"}])
+        assert resp.status_code == 404
+        assert counter.count == 0
+        # the default task was flushed before the members were checked
+        assert Tasks.query.filter_by(name="test-project-1-default").count() == 0
+
+        resp = client.post("/api/members/", json={"name": "test-member-1"})
+        assert resp.status_code == 409
+        resp = client.post("/api/members/", json={"name": "test-member-5"})
+        assert resp.status_code == 201
+        assert Members.query.filter_by(name="test-member-5").count() == 1
+
+# test the request body schemas
+class TestSchemas(object):
+
+    # test that the schemas are served with long lived cache headers
+    def test_get(self, client):
+        resp = client.get("/api/schemas/project/")
+        assert resp.status_code == 200
+        assert resp.mimetype == "application/schema+json"
+        assert json.loads(resp.data)["required"] == ["name", "status"]
+        assert resp.cache_control.public
+        assert resp.cache_control.max_age == app.config["SCHEMA_MAX_AGE"]
+        resp = client.get("/api/schemas/project/", headers={"If-None-Match": resp.headers["ETag"]})
+        assert resp.status_code == 304
+        resp = client.get("/api/schemas/non-schema-x/")
+        assert resp.status_code == 404
+
+    # test that controls refer to the schemas instead of inlining them
+    def test_controls(self, client):
+        for url, ctrl_name in (("/api/projects/", "promana:add-project"),
+                               ("/api/members/", "promana:add-member"),
+                               ("/api/projects/projekti1/phases/", "promana:add-phase"),
+                               ("/api/projects/projekti1/phases/phase1/tasks/", "promana:add-task"),
+                               ("/api/projects/projekti1/", "edit")):
+            ctrl = json.loads(client.get(url).data)["@controls"][ctrl_name]
+            assert "schema" not in ctrl
+            resp = client.get(ctrl["schemaUrl"])
+            assert resp.status_code == 200
+            assert "properties" in json.loads(resp.data)
+
+# test response compression
+class TestCompression(object):
+
+    RESOURCE_URL = "/api/projects/"
+
+    # test that large responses are gzipped when the client accepts it
+    def test_gzip(self, client):
+        _add_managed_projects(20)
+        plain = client.get(self.RESOURCE_URL)
+        assert "Content-Encoding" not in plain.headers
+        assert "Accept-Encoding" in plain.headers["Vary"]
+        resp = client.get(self.RESOURCE_URL, headers={"Accept-Encoding": "gzip, deflate"})
+        assert resp.headers["Content-Encoding"] == "gzip"
+        assert "Accept-Encoding" in resp.headers["Vary"]
+        assert len(resp.data) < len(plain.data)
+        assert zlib.decompress(resp.data, 31) == plain.data
+
+        # the weak ETag of the compressed copy revalidates
+        etag = resp.headers["ETag"]
+        assert etag == "W/" + plain.headers["ETag"]
+        resp = client.get(self.RESOURCE_URL, headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+        assert resp.status_code == 304
+
+    # test that small responses and refused encodings are not compressed
+    def test_not_compressed(self, client):
+        resp = client.get("/api/members/", headers={"Accept-Encoding": "gzip"})
+        assert len(resp.data) < app.config["COMPRESS_MIN_SIZE"]
+        assert "Content-Encoding" not in resp.headers
+        _add_managed_projects(20)
+        resp = client.get(self.RESOURCE_URL, headers={"Accept-Encoding": "gzip;q=0, identity"})
+        assert "Content-Encoding" not in resp.headers
+        resp = client.get("/api/projects/non-project-x/", headers={"Accept-Encoding": "gzip"})
+        assert resp.status_code == 404
+        assert "Content-Encoding" not in resp.headers
+
+    # test that the streamed export is compressed while it is sent
+    def test_streamed(self, client):
+        plain = client.get("/api/export/")
+        resp = client.get("/api/export/", headers={"Accept-Encoding": "gzip"})
+        assert resp.headers["Content-Encoding"] == "gzip"
+        assert "Content-Length" not in resp.headers
+        assert zlib.decompress(resp.data, 31) == plain.data
+
+# test the SQLite engine profile
+@pytest.mark.skipif(TEST_DATABASE_URL is not None, reason="SQLite only")
+class TestEngineProfile(object):
+
+    # test that new connections get the PRAGMAs of the tuned profile
+    def test_pragmas(self, client):
+        assert app.config["SQLITE_PROFILE"] == "tuned"
+        assert db.engine.pool.size() == app.config["DB_POOL_SIZE"]
+        conn = db.engine.raw_connection()
+        try:
+            cursor = conn.cursor()
+            assert cursor.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+            assert cursor.execute("PRAGMA synchronous").fetchone()[0] == 1
+            assert cursor.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+            assert cursor.execute("PRAGMA busy_timeout").fetchone()[0] == 5000
+            assert cursor.execute("PRAGMA temp_store").fetchone()[0] == 2
+        finally:
+            conn.close()
+
+    # test that the engine options follow the dialect of the database URL
+    def test_dialect_options(self):
+        from sqlalchemy.engine.url import make_url
+        sqlite = {}
+        db.apply_driver_hacks(app, make_url("sqlite:///file.db"), sqlite)
+        assert sqlite["pool_size"] == app.config["DB_POOL_SIZE"]
+        assert "pool_pre_ping" not in sqlite
+        memory = {}
+        db.apply_driver_hacks(app, make_url("sqlite://"), memory)
+        assert "pool_size" not in memory
+        postgres = {}
+        db.apply_driver_hacks(app, make_url("postgresql://api@localhost/api"), postgres)
+        assert postgres["pool_pre_ping"] is True
+        assert postgres["pool_recycle"] == app.config["DB_POOL_RECYCLE"]
+        assert "connect_args" not in postgres
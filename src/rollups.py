@@ -0,0 +1,50 @@
+"""
+Rebuilds the hour and cost totals of every task and project from the
+Hours and Costs rows, and then the portfolio summaries of every project.
+Both are kept up to date while the API writes (see add_to_totals() and
+refresh_project_summaries() in models.py), so this is only needed after
+the columns or the summary table were added to an existing database,
+after rows were changed outside the API, or to correct rounding drift:
+
+    python rollups.py
+
+Every table is rebuilt with one UPDATE that sums the rows of each task or
+project with a correlated subquery on the indexed foreign key columns. The
+database is taken from the DATABASE_URL environment variable or the
+default configuration in app.py.
+"""
+from sqlalchemy import func, select
+
+from app import create_app, db
+from models import *
+
+def _sum(column, key_column, key):
+    return select([func.coalesce(func.sum(column), 0)]).where(key_column == key).as_scalar()
+
+def rebuild_totals():
+    """
+    Recomputes the totals of all tasks and projects and then the summaries
+    of all projects in one transaction. Returns the number of updated
+    tasks and projects.
+    """
+    hours, costs = Hours.__table__, Costs.__table__
+    tasks, projects = Tasks.__table__, Project.__table__
+    updated_tasks = db.session.execute(tasks.update().values(
+        total_hours=_sum(hours.c.time, hours.c.task_id, tasks.c.id),
+        total_cost=_sum(hours.c.cost, hours.c.task_id, tasks.c.id),
+        )).rowcount
+    updated_projects = db.session.execute(projects.update().values(
+        total_hours=_sum(hours.c.time, hours.c.project_id, projects.c.id),
+        total_costs=(_sum(hours.c.cost, hours.c.project_id, projects.c.id)
+                     + _sum(costs.c.hourly_price * costs.c.quantity, costs.c.project_id, projects.c.id)),
+        )).rowcount
+    mark_tables_changed(db.session, [tasks.name, projects.name])
+    refresh_project_summaries(db.session)
+    db.session.commit()
+    return updated_tasks, updated_projects
+
+if __name__ == "__main__":
+    with create_app().app_context():
+        updated_tasks, updated_projects = rebuild_totals()
+        print(f"rebuilt the totals of {updated_tasks} tasks and {updated_projects} projects")
+        print("rebuilt the project summaries")
@@ -0,0 +1,27 @@
+from benchmark import import_times
+
+# seconds to import the app module in a new interpreter. It takes about
+# 0.35 s here, the rest is headroom for slower machines.
+STARTUP_BUDGET = 1.0
+
+# modules that are only imported by the first request that needs them
+LAZY_MODULES = ("jsonschema", "numpy")
+
+# modules that are only imported by create_app()
+FACTORY_MODULES = ("analytics", "bulk", "export", "hours", "portfolio", "timeline")
+
+# test that a cold import of the app stays within the startup budget
+def test_import_time():
+    best = min(import_times()["app"] for run in range(3))
+    assert best < STARTUP_BUDGET
+
+# test that importing the app and creating it does not load the lazy modules
+def test_lazy_imports():
+    times = import_times("import app")
+    for module in LAZY_MODULES + FACTORY_MODULES:
+        assert module not in times
+    times = import_times("import app; app.create_app()")
+    for module in LAZY_MODULES:
+        assert module not in times
+    for module in FACTORY_MODULES:
+        assert module in times
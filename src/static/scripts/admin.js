@@ -28,6 +28,19 @@ function getResource(href, renderer) {
     });
 }
 
+// calls the renderer with a control whose schema is loaded from its
+// schemaUrl, the browser caches the schema after the first request
+function withSchema(ctrl, renderer) {
+    if (ctrl.schema) {
+        renderer(ctrl);
+        return;
+    }
+    getResource(ctrl.schemaUrl, function (schema) {
+        ctrl.schema = schema;
+        renderer(ctrl);
+    });
+}
+
 function deleteResource(event, a) {
     event.preventDefault();
     let resource = $(a);
@@ -160,6 +173,17 @@ function appendProjectRow(body) {
     $(".resulttable tbody").append(projectRow(body));
 }
 
+// appends the projects of a page and follows the next control until the
+// last page
+function appendProjectPage(body) {
+    body.items.forEach(function (item) {
+        appendProjectRow(item);
+    });
+    if (body["@controls"].next) {
+        getResource(body["@controls"].next.href, appendProjectPage);
+    }
+}
+
 function appendMemberRow(body) {
     $(".membertable tbody").append(memberRow(body));
 }
@@ -351,12 +375,14 @@ function renderProject(body) {
         "</td><td>" + body.status +
         "</td></tr>");
 
-    renderProjectForm(body["@controls"].edit);
-    $("input[name='name']").val(body.name);
-    $("input[name='start']").val(body.start);
-    $("input[name='end']").val(body.end);
-    $("input[name='project_manager']").val(body.project_manager);
-    $("input[name='status']").val(body.status);
+    withSchema(body["@controls"].edit, function (ctrl) {
+        renderProjectForm(ctrl);
+        $("input[name='name']").val(body.name);
+        $("input[name='start']").val(body.start);
+        $("input[name='end']").val(body.end);
+        $("input[name='project_manager']").val(body.project_manager);
+        $("input[name='status']").val(body.status);
+    });
 }
 
 function renderPhase(body) {
@@ -378,10 +404,12 @@ function renderPhase(body) {
         "</td><td>" + body.status +
         "</td></tr>");
 
-    renderPhaseForm(body["@controls"].edit);
-    $("input[name='name2']").val(body.name);
-    $("input[name='deadline']").val(body.deadline);
-    $("input[name='status2']").val(body.status);
+    withSchema(body["@controls"].edit, function (ctrl) {
+        renderPhaseForm(ctrl);
+        $("input[name='name2']").val(body.name);
+        $("input[name='deadline']").val(body.deadline);
+        $("input[name='status2']").val(body.status);
+    });
 }
 
 function renderProjects(body) {
@@ -396,11 +424,9 @@ function renderProjects(body) {
     phase.hide();
     let tbody = $(".resulttable tbody");
     tbody.empty();
-    body.items.forEach(function (item) {
-        tbody.append(projectRow(item));
-    });
+    appendProjectPage(body);
     getResource("http://localhost:5000/api/members/", renderMembers);
-    renderProjectForm(body["@controls"]["promana:add-project"]);
+    withSchema(body["@controls"]["promana:add-project"], renderProjectForm);
 }
 
 function renderPhases(body) {
@@ -412,7 +438,7 @@ function renderPhases(body) {
     body.items.forEach(function (item) {
         tbody.append(phaseRow(item));
     });
-    renderPhaseForm(body["@controls"]["promana:add-phase"]);
+    withSchema(body["@controls"]["promana:add-phase"], renderPhaseForm);
 }
 
 function renderMembers(body) {
@@ -426,7 +452,7 @@ function renderMembers(body) {
     body.items.forEach(function (item) {
         tbody.append(memberRow(item));
     });
-    renderMemberForm(body["@controls"]["promana:add-member"]);
+    withSchema(body["@controls"]["promana:add-member"], renderMemberForm);
 }
 
 function renderProjectMembers(body) {
@@ -439,7 +465,7 @@ function renderProjectMembers(body) {
         tbody.append(memberRow(item));
     });
     console.log(body);
-    renderMemberForm(body["@controls"]["promana:add-member"]);
+    withSchema(body["@controls"]["promana:add-member"], renderMemberForm);
 }
 
 // from the Programmable Web Project example,
@@ -0,0 +1,118 @@
+"""
+Timeline of the tasks and phases in a date range at
+/api/timeline/?from=YYYY-MM-DD&to=YYYY-MM-DD, grouped by project.
+
+A task is on the timeline if its dates overlap the range, both ends
+included, and a phase if its deadline is in the range. A task without an
+end date is open-ended and on the timeline of every range after its start,
+a task without a start date is left out. The tasks are read on the
+(end, start) index, which scans only the open-ended tasks and the tasks
+that end after the start of the range and checks their start from the
+index, so the work done grows with the tasks that are still running or
+ahead of the range rather than with the whole history. The phases are read
+on the deadline index.
+"""
+from flask import Blueprint, request
+from flask_restful import Api, Resource
+from sqlalchemy import or_
+
+from app import (api, db, conditional, parse_controls_arg, parse_date_arg,
+                 ProjectBuilder, PhaseBuilder, TaskBuilder, ProjectCollection, TaskCollection)
+from models import *
+from utils import MasonBuilder, LINK_RELATIONS_URL, create_error_response, mason_response
+
+
+def _project_item(groups, row, controls):
+    """
+    Returns the timeline item of the project of a row, adding it to groups
+    when it is first seen.
+    """
+    item = groups.get(row.project)
+    if item is None:
+        item = groups[row.project] = ProjectBuilder(
+            name=row.project,
+            start=row.project_start,
+            end=row.project_end,
+            tasks=[],
+            phases=[],
+            )
+        if controls:
+            item.add_control_project(row.project)
+    return item
+
+def timeline(start, end, controls=True):
+    """
+    Returns the timeline items of the projects that have tasks or phases
+    in the range, ordered by project name.
+    """
+    project_columns = (Project.name.label("project"), Project.start.label("project_start"),
+                       Project.end.label("project_end"))
+    tasks = db.session.query(
+        *project_columns, *[column.label(field) for field, column in TaskCollection.FIELDS.items()]
+        ).select_from(Tasks).join(
+        Project, Project.id == Tasks.project_id
+        ).outerjoin(
+        Phase, Phase.id == Tasks.phase_id
+        ).filter(
+        or_(Tasks.end >= start, Tasks.end.is_(None)), Tasks.start <= end
+        ).order_by(Project.name, Tasks.start, Tasks.name)
+    phases = db.session.query(
+        *project_columns, Phase.name, Phase.deadline, Phase.status
+        ).join(
+        Project, Project.id == Phase.project_id
+        ).filter(
+        Phase.deadline >= start, Phase.deadline <= end
+        ).order_by(Project.name, Phase.deadline, Phase.name)
+
+    groups = {}
+    for row in tasks:
+        fields = {field: getattr(row, field) for field in TaskCollection.FIELDS}
+        # same format as in task_fields
+        fields["task_status"] = str(fields["task_status"])
+        task = TaskBuilder(fields)
+        if controls:
+            task.add_control_task(row.project, row.task_phase or "WHOLE_PROJECT", row.task_name)
+        _project_item(groups, row, controls)["tasks"].append(task)
+    for row in phases:
+        phase = PhaseBuilder(**PhaseBuilder.phase_fields(row))
+        if controls:
+            phase.add_control_phase(row.project, row.name)
+        _project_item(groups, row, controls)["phases"].append(phase)
+    return [groups[name] for name in sorted(groups)]
+
+
+class Timeline(Resource):
+    """
+    class for the timeline of all projects
+    """
+    @conditional(Project, Phase, Tasks, cached=True)
+    def get(self):
+        """
+        get the tasks and phases of every project in the range given with
+        the from and to query parameters. controls=none leaves out the
+        hypermedia controls of the items.
+        """
+        try:
+            start = parse_date_arg("from")
+            end = parse_date_arg("to")
+            controls = parse_controls_arg()
+        except ValueError as e:
+            return create_error_response(400, "Invalid query parameter", str(e))
+        if start is None or end is None:
+            return create_error_response(400, "Invalid query parameter",
+                                         "from and to are required")
+        if start > end:
+            return create_error_response(400, "Invalid query parameter",
+                                         "from must not be after to")
+
+        body = MasonBuilder(items=timeline(start, end, controls))
+        body["from"], body["to"] = start, end
+        body.add_namespace("promana", LINK_RELATIONS_URL)
+        body.add_control("self", timeline_api.url_for(Timeline, **request.args.to_dict(flat=False)))
+        body.add_control("collection", api.url_for(ProjectCollection))
+        return mason_response(body)
+
+
+timeline_blueprint = Blueprint("timeline", __name__)
+timeline_api = Api(timeline_blueprint)
+timeline_api.add_resource(Timeline, "/api/timeline/")
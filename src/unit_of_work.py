@@ -0,0 +1,35 @@
+"""
+Request scoped unit of work. Handlers only add, change and delete objects
+in db.session, and flush it where they need the generated ids or want to
+turn a constraint violation into an error response of their own. The
+transaction of a request is ended once, after the handler has returned:
+
+- a successful POST, PUT, PATCH or DELETE is committed
+- an error response, or any GET, HEAD or OPTIONS request, is rolled back
+
+The commit runs before the response is sent, so a client never gets a 201
+or 204 for changes that did not reach the database. The bulk import is the
+exception, it commits every batch on its own and leaves nothing to commit.
+"""
+from flask import request
+from sqlalchemy.exc import IntegrityError
+
+from models import db
+from utils import create_error_response
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+def end_transaction(response):
+    """
+    after_request function that commits or rolls back the transaction of
+    the request. A conflict that only shows up in the commit becomes a 409.
+    """
+    if request.method in SAFE_METHODS or response.status_code >= 400:
+        db.session.rollback()
+        return response
+    try:
+        db.session.commit()
+    except IntegrityError as e:
+        db.session.rollback()
+        return create_error_response(409, "Conflict", f"The changes were not saved: {e.orig}")
+    return response
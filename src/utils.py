@@ -1,6 +1,14 @@
 from flask import request, Response
+from urllib.parse import quote
+import datetime
+import enum
 import json
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 LINK_RELATIONS_URL = "/promana/link-relations/"
 MASON = "application/vnd.mason+json"
 
@@ -68,8 +76,161 @@ class MasonBuilder(dict):
         self["@controls"][ctrl_name] = kwargs
         self["@controls"][ctrl_name]["href"] = href
 
+    def add_control_template(self, template, **names):
+        """
+        Adds a control made from a ControlTemplate. Only the href is built
+        for this object, the other properties are shared with the template.
+
+        : param ControlTemplate template: the control template
+        : param names: values for the fields of the template href
+        """
+
+        if "@controls" not in self:
+            self["@controls"] = {}
+
+        self["@controls"][template.ctrl_name] = template.render(**names)
+
+class ImmutableDict(dict):
+    """
+    A dict that cannot be modified after it is created. Used for the parts
+    of responses that are built once and shared between all of them. It is
+    still serialized as a JSON object.
+    """
+
+    def _immutable(self, *args, **kwargs):
+        raise TypeError(f"{type(self).__name__} cannot be modified")
+
+    __setitem__ = __delitem__ = __ior__ = _immutable
+    clear = pop = popitem = setdefault = update = _immutable
+
+def freeze(value):
+    """
+    Returns an immutable copy of a JSON value, with dicts turned into
+    ImmutableDicts and lists into tuples.
+
+    : param value: the JSON value
+    """
+
+    if isinstance(value, dict):
+        return ImmutableDict((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+class ControlTemplate(object):
+    """
+    A Mason control that is the same for every resource of a type apart
+    from the resource names in its href. The properties are frozen once and
+    shared by all controls made from the template. The names are quoted the
+    same way as url_for quotes them, but without going through the URL map.
+
+    : param str ctrl_name: name of the control (including namespace if any)
+    : param str href: target URI with {field} placeholders for the names
+    """
+
+    def __init__(self, ctrl_name, href, **kwargs):
+        self.ctrl_name = ctrl_name
+        self.href = href
+        self.properties = freeze(kwargs)
+
+    def render(self, **names):
+        """
+        Returns the control for the given resource names.
+        """
+        control = dict(self.properties)
+        control["href"] = self.href.format(
+            **{field: quote(name, safe="/:") for field, name in names.items()}
+            )
+        return control
+
+class ValidationError(ValueError):
+    """
+    Raised when a document does not match its schema. str() gives the full
+    report of the best matching jsonschema error and message its message.
+    """
+
+    def __init__(self, error):
+        super().__init__(str(error))
+        self.message = error.message
+
+class SchemaValidator(object):
+    """
+    A JSON schema that is checked and compiled into a validator the first
+    time it is used and reused after that. Neither the schema nor jsonschema
+    itself are loaded before the first request that needs them, which keeps
+    them out of the startup time.
+
+    : param schema: the JSON schema, or a function that returns it
+    """
+
+    def __init__(self, schema):
+        self._schema = schema
+        self._validator = None
+        self._best_match = None
+
+    @property
+    def schema(self):
+        if callable(self._schema):
+            self._schema = self._schema()
+        return self._schema
+
+    def _compile(self):
+        from jsonschema.exceptions import best_match
+        from jsonschema.validators import validator_for
+
+        cls = validator_for(self.schema)
+        cls.check_schema(self.schema)
+        self._best_match = best_match
+        self._validator = cls(self.schema)
+
+    def validate(self, instance):
+        """
+        Validates the instance against the schema.
+
+        : param instance: the deserialized JSON document
+        : raises ValidationError: if the instance is not valid
+        """
+        if self._validator is None:
+            self._compile()
+        error = self._best_match(self._validator.iter_errors(instance))
+        if error is not None:
+            raise ValidationError(error)
+
+def _json_default(value):
+    """
+    Serializes the values that have no JSON type, dates as YYYY-MM-DD and
+    enums as their value.
+    """
+    if isinstance(value, datetime.date):
+        return value.strftime("%Y-%m-%d")
+    if isinstance(value, enum.Enum):
+        return value.value
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dump_json(value):
+    """
+    Serializes a JSON document, including MasonBuilder trees, dates and
+    enums, into compact UTF-8 bytes. Uses orjson when it is installed and
+    the json module otherwise.
+
+    : param value: the document
+    """
+    if orjson is not None:
+        return orjson.dumps(value, default=_json_default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+    return json.dumps(value, default=_json_default, separators=(",", ":")).encode()
+
+def mason_response(body, status_code=200, headers=None):
+    """
+    Returns a Mason response with the body serialized by dump_json.
+
+    : param dict body: the Mason document
+    : param int status_code: HTTP status of the response
+    : param dict headers: extra response headers
+    """
+    return Response(dump_json(body), status_code, headers=headers, mimetype=MASON)
+
 def create_error_response(status_code, title, message=None):
     resource_url = request.path
     body = MasonBuilder(resource_url=resource_url)
     body.add_error(title, message)
-    return Response(json.dumps(body), status_code, mimetype=MASON)
+    return mason_response(body, status_code)
@@ -0,0 +1,59 @@
+import datetime
+import enum
+import json
+import pytest
+
+import utils
+from utils import ControlTemplate, ImmutableDict, MasonBuilder, dump_json, freeze
+
+class _Status(enum.Enum):
+    STARTED = "started"
+
+SCHEMA = {"type": "object", "required": ["name"]}
+
+# test that frozen values cannot be changed but still serialize as JSON
+def test_freeze():
+    frozen = freeze({"schema": SCHEMA, "list": [1, {"a": 2}]})
+    assert isinstance(frozen["schema"], ImmutableDict)
+    assert frozen["list"] == (1, {"a": 2})
+    with pytest.raises(TypeError):
+        frozen["schema"]["type"] = "array"
+    with pytest.raises(TypeError):
+        frozen["list"][1].update(a=3)
+    assert json.loads(json.dumps(frozen)) == {"schema": SCHEMA, "list": [1, {"a": 2}]}
+
+# test that controls made from a template share the template properties
+def test_control_template():
+    template = ControlTemplate("edit", "/api/projects/{project}/", method="PUT", schema=SCHEMA)
+    first = MasonBuilder()
+    first.add_control_template(template, project="a b")
+    second = MasonBuilder()
+    second.add_control_template(template, project="c/d?")
+    assert first["@controls"]["edit"]["href"] == "/api/projects/a%20b/"
+    assert second["@controls"]["edit"]["href"] == "/api/projects/c/d%3F/"
+    assert first["@controls"]["edit"]["method"] == "PUT"
+    assert first["@controls"]["edit"]["schema"] is second["@controls"]["edit"]["schema"]
+    assert json.loads(json.dumps(first))["@controls"]["edit"]["schema"] == SCHEMA
+
+# test that dump_json serializes Mason trees, dates and enums the same way
+# with and without orjson
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_dump_json(monkeypatch, use_orjson):
+    if use_orjson:
+        pytest.importorskip("orjson")
+    else:
+        monkeypatch.setattr(utils, "orjson", None)
+    body = MasonBuilder(name="ä", start=datetime.datetime(2021, 1, 2, 3, 4),
+                        deadline=datetime.date(2021, 5, 6), status=_Status.STARTED)
+    body.add_control_template(ControlTemplate("edit", "/api/{name}/", schema=SCHEMA), name="x")
+    data = dump_json(body)
+    assert isinstance(data, bytes)
+    assert json.loads(data) == {
+        "name": "ä",
+        "start": "2021-01-02",
+        "deadline": "2021-05-06",
+        "status": "started",
+        "@controls": {"edit": {"href": "/api/x/", "schema": SCHEMA}},
+        }
+    with pytest.raises(TypeError):
+        dump_json({"value": object()})